@@ -0,0 +1,131 @@
+"""
+Дисковый кэш ответов API Wildberries
+
+Ответы хранятся по ключу sha256 от URL и нормализованных параметров:
+<каталог>/<первые 2 символа ключа>/<ключ>.json. Время записи берется из
+mtime файла, время последнего обращения - из atime, которое кэш обновляет
+сам, поэтому вытеснение по LRU не зависит от опций монтирования.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+class ResponseCache:
+    """
+    Кэш ответов на диске с TTL и вытеснением по размеру (LRU)
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ignore_params=()):
+        """
+        Args:
+            directory (str | Path): Каталог кэша
+            max_bytes (int): Максимальный суммарный размер ответов на диске
+            ignore_params (iterable): Параметры, не влияющие на ответ и не входящие в ключ
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ignore_params = frozenset(ignore_params)
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._size = sum(path.stat().st_size for path in self._entries())
+
+    def key(self, url, params=None):
+        """
+        Ключ ответа: URL и параметры без учета порядка, регистра имен
+        и пробелов по краям значений
+        """
+        normalized = sorted(
+            (str(name).lower(), str(value).strip())
+            for name, value in (params or {}).items()
+            if name not in self.ignore_params
+        )
+        payload = json.dumps([url, normalized], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, url, params=None, ttl=None):
+        """
+        Ответ из кэша
+
+        Args:
+            ttl (float): Максимальный возраст ответа в секундах,
+                None - отдавать ответ независимо от возраста
+
+        Returns:
+            bytes: Тело ответа или None, если его нет или он устарел
+        """
+        path = self._path(self.key(url, params))
+        try:
+            stat = path.stat()
+            if ttl is not None and time.time() - stat.st_mtime > ttl:
+                return None
+            content = path.read_bytes()
+            # Отмечаем обращение для LRU, сохраняя время записи
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        return content
+
+    def set(self, url, params, content):
+        """Сохраняет тело ответа и вытесняет старые записи, если кэш переполнен"""
+        path = self._path(self.key(url, params))
+        path.parent.mkdir(exist_ok=True)
+        temporary = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        temporary.write_bytes(content)
+        with self._lock:
+            try:
+                self._size -= path.stat().st_size
+            except FileNotFoundError:
+                pass
+            # Атомарная замена: параллельные читатели не увидят недописанный файл
+            os.replace(temporary, path)
+            self._size += len(content)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def delete(self, url, params=None):
+        """Удаляет ответ из кэша, например если он оказался некорректным"""
+        path = self._path(self.key(url, params))
+        with self._lock:
+            try:
+                size = path.stat().st_size
+                path.unlink()
+            except FileNotFoundError:
+                return
+            self._size -= size
+
+    def _evict(self):
+        # Удаляем давно не использованные записи, пока не освободим 10% запаса
+        target = self.max_bytes * 0.9
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, path))
+
+        for _, size, path in sorted(entries):
+            if self._size <= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            self._size -= size
+
+    def _entries(self):
+        return self.directory.glob('*/*.json')
+
+    def _path(self, key):
+        return self.directory / key[:2] / f'{key}.json'
+
+
+def default_cache():
+    """Кэш ответов с каталогом и размером из настроек проекта"""
+    return ResponseCache(settings.WB_CACHE_DIR, max_bytes=settings.WB_CACHE_MAX_BYTES)
@@ -0,0 +1,272 @@
+"""
+Общий HTTP-клиент для API Wildberries
+
+Используется и командой parse_wb_by, и WildberriesParser: одна сессия
+с пулом keep-alive соединений, таймаутами и повторами с экспоненциальной
+задержкой и случайным разбросом на 429/5xx и оборванные/некорректные
+тела ответов.
+"""
+import json
+import random
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .decode import extract_products
+from .fetcher import SearchPage
+from .normalize import PRODUCT_FIELDS
+from .throttle import AIMDController
+
+
+# Параметры поиска для wildberries.by
+SEARCH_PARAMS = {
+    'appType': '1',
+    'curr': 'byn',
+    'dest': '-59208',
+    'lang': 'ru',
+    'reg': '0',
+    'regions': '80,83,4,64,38,40,33,70,82,69,86,30,85,22,66,31,48,1,68',
+    'resultset': 'catalog',
+    'sort': 'popular',
+    'spp': '0',
+    'suppressSpellcheck': 'false',
+}
+
+CARD_PARAMS = {
+    'appType': '1',
+    'curr': 'byn',
+    'dest': '-59208',
+    'spp': '0',
+}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    # Объявляем только те сжатия, которые urllib3 умеет распаковать
+    # (br - только при установленном brotli)
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+    'Referer': 'https://www.wildberries.by/',
+    'Sec-Fetch-Dest': 'empty',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Site': 'same-site',
+}
+
+# Ответы, после которых запрос имеет смысл повторить
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Сколько секунд ответ эндпоинта считается свежим в дисковом кэше
+CACHE_TTLS = {
+    'search': 15 * 60,
+    'cards': 60 * 60,
+}
+
+
+class WildberriesAPIError(Exception):
+    """Запрос к API Wildberries не удался"""
+
+
+class CacheMiss(WildberriesAPIError):
+    """Ответа нет в кэше, а в режиме replay запросы в сеть не отправляются"""
+
+
+class WildberriesClient:
+    """
+    HTTP-клиент для API Wildberries с пулом соединений и повторами
+    """
+
+    def __init__(self, pool_size=10, timeout=(3.05, 10), retries=4, backoff=0.5, max_backoff=30,
+                 throttle=None, cache=None, replay=False, search_url=None, card_detail_url=None):
+        """
+        Args:
+            pool_size (int): Размер пула keep-alive соединений на хост,
+                должен быть не меньше числа одновременных запросов
+            throttle (AIMDController): Ограничитель нагрузки, по умолчанию
+                адаптивный с максимумом pool_size одновременных запросов
+            timeout (tuple): Таймауты (соединение, чтение) в секундах
+            retries (int): Количество повторов после первой неудачной попытки
+            backoff (float): Базовая задержка перед повтором в секундах
+            max_backoff (float): Максимальная задержка перед повтором
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.throttle = throttle or AIMDController(max_limit=pool_size)
+        self.cache = cache
+        self.replay = replay
+        self.search_url = search_url or settings.WB_SEARCH_URL
+        self.card_detail_url = card_detail_url or settings.WB_CARD_DETAIL_URL
+
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        # Повторы делаем сами, поэтому у адаптера они выключены.
+        # pool_block не дает открыть больше pool_size соединений на хост.
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, params=None, endpoint=None, decode=None):
+        """
+        GET-запрос с повторами на сетевые ошибки, ответы 429/5xx
+        и тела, которые не удалось разобрать
+
+        Args:
+            endpoint (str): Имя эндпоинта для выбора TTL кэша ('search', 'cards')
+            decode (callable): Разбор тела ответа; ValueError при разборе
+                повторяет запрос с той же задержкой, что и 5xx
+
+        Returns:
+            bytes: Тело ответа, уже распакованное из gzip/deflate/br,
+                или результат decode
+
+        Raises:
+            CacheMiss: Если в режиме replay ответа нет в кэше
+            WildberriesAPIError: Если запрос не удался после всех повторов
+        """
+        decode = decode or (lambda content: content)
+        if self.cache is not None:
+            ttl = None if self.replay else CACHE_TTLS.get(endpoint, 0)
+            content = self.cache.get(url, params, ttl=ttl)
+            if content is not None:
+                try:
+                    return decode(content)
+                except ValueError as e:
+                    # Испорченная запись кэша: удаляем и загружаем заново
+                    self.cache.delete(url, params)
+                    if self.replay:
+                        raise WildberriesAPIError(f"Некорректный JSON в кэше для {url}: {e}") from e
+            elif self.replay:
+                raise CacheMiss(f"Нет ответа в кэше для {url}")
+
+        content, result = self._request(url, params, decode)
+        if self.cache is not None:
+            self.cache.set(url, params, content)
+        return result
+
+    def _request(self, url, params, decode):
+        error = None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            try:
+                # Каждая попытка проходит через ограничитель и сообщает ему результат
+                with self.throttle.slot() as slot:
+                    response = self.session.get(url, params=params, timeout=self.timeout)
+                    slot.status = response.status_code
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    if response.status_code >= 400:
+                        raise WildberriesAPIError(f"HTTP {response.status_code} для {response.url}")
+                    try:
+                        return response.content, decode(response.content)
+                    except ValueError as e:
+                        # Оборванное или испорченное тело: следующая попытка обычно проходит
+                        error = WildberriesAPIError(f"Некорректный JSON в ответе {url}: {e}")
+                else:
+                    error = WildberriesAPIError(f"HTTP {response.status_code} для {response.url}")
+                    retry_after = self._parse_retry_after(response)
+
+            if attempt < self.retries:
+                time.sleep(self._backoff_delay(attempt, retry_after))
+
+        raise WildberriesAPIError(
+            f"Запрос к {url} не удался после {self.retries + 1} попыток: {error}"
+        ) from error
+
+    def get_json(self, url, params=None, endpoint=None):
+        """
+        GET-запрос с разбором JSON
+
+        Raises:
+            WildberriesAPIError: Если запрос не удался или ответ не является JSON
+        """
+        return self.get(url, params=params, endpoint=endpoint, decode=json.loads)
+
+    def get_products(self, url, params=None, endpoint=None, fields=PRODUCT_FIELDS):
+        """
+        GET-запрос с извлечением товаров из data.products (только полей fields)
+
+        Args:
+            fields (iterable): Поля, которые остаются у товаров; None - все поля
+
+        Returns:
+            list: Товары ответа
+
+        Raises:
+            WildberriesAPIError: Если запрос не удался, ответ не является JSON
+                или API вернуло ошибку
+        """
+        return self._get_page(url, params, endpoint, fields).products
+
+    def _get_page(self, url, params, endpoint, fields):
+        products, extra = self.get(
+            url, params=params, endpoint=endpoint, decode=lambda content: extract_products(content, fields)
+        )
+        if products is None and extra.keys() - {'total'}:
+            raise WildberriesAPIError(
+                f"Ошибка API: {extra.get('error')} (код {extra.get('code')})"
+            )
+        return SearchPage(products=products or [], total=extra.get('total'))
+
+    def search(self, query, page=1, category=None, fields=PRODUCT_FIELDS):
+        """
+        Страница поисковой выдачи
+
+        Args:
+            fields (iterable): Поля, которые остаются у товаров; None - все поля
+
+        Returns:
+            list: Товары страницы; пустой список означает конец выдачи
+
+        Raises:
+            WildberriesAPIError: Если запрос не удался или API вернуло ошибку
+        """
+        return self.search_page(query, page, category, fields).products
+
+    def search_page(self, query, page=1, category=None, fields=PRODUCT_FIELDS):
+        """
+        Страница поисковой выдачи вместе с общим числом товаров по запросу
+
+        Returns:
+            SearchPage: Товары страницы и data.total, если API его вернуло
+
+        Raises:
+            WildberriesAPIError: Если запрос не удался или API вернуло ошибку
+        """
+        params = dict(SEARCH_PARAMS, query=query, page=page)
+        if category:
+            params['cat'] = category
+        return self._get_page(self.search_url, params, 'search', fields)
+
+    def cards(self, nm_ids, fields=PRODUCT_FIELDS):
+        """
+        Карточки товаров по их ID
+
+        Args:
+            fields (iterable): Поля, которые остаются у карточек; None - все поля
+
+        Returns:
+            list: Карточки товаров
+        """
+        params = dict(CARD_PARAMS, nm=';'.join(str(nm_id) for nm_id in nm_ids))
+        return self.get_products(self.card_detail_url, params=params, endpoint='cards', fields=fields)
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        # Экспоненциальная задержка с полным случайным разбросом
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def _parse_retry_after(self, response):
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,67 @@
+"""
+Разбор ответов API Wildberries: товары только с нужными полями
+
+Ответ разбирается целиком через orjson: прямо из bytes, в несколько раз
+быстрее json и без копии тела в str. Затем товары из data.products сокращаются до полей, которые читает
+нормализация, так что на следующие стадии не уходят служебные поля
+выдачи. Память на разбор страницы это не уменьшает: в памяти на время
+разбора находится вся страница.
+"""
+import orjson
+
+
+_SIZE_FIELDS = ('price', 'stocks')
+
+
+def extract_products(content, fields=None, keep=('error', 'code')):
+    """
+    Товары из data.products ответа поиска или карточек
+
+    Args:
+        content (bytes | str): Тело ответа
+        fields (iterable): Поля, которые остаются у товара; None - все поля
+        keep (iterable): Ключи верхнего уровня, значения которых нужно вернуть
+            (например, описание ошибки API)
+
+    Returns:
+        tuple: (список товаров или None, если data.products нет в ответе,
+                словарь значений ключей keep и data.total под ключом total,
+                если API сообщило общее число товаров)
+
+    Raises:
+        ValueError: Если ответ не является корректным JSON-объектом
+    """
+    fields = frozenset(fields) if fields is not None else None
+    data = orjson.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError('Ожидался JSON-объект')
+    extra = {key: data[key] for key in keep if key in data}
+    body = data.get('data') if isinstance(data.get('data'), dict) else {}
+    if isinstance(body.get('total'), int):
+        extra['total'] = body['total']
+    products = body.get('products')
+    if not isinstance(products, list):
+        return None, extra
+    if fields is not None:
+        products = [_project(product, fields) for product in products]
+    return products, extra
+
+
+def _project(product, fields):
+    # Ключи берем из fields, а не из ответа: одни и те же строки на все товары
+    if not isinstance(product, dict):
+        return product
+    product = {key: product[key] for key in fields if key in product}
+    if 'sizes' in product:
+        product['sizes'] = _project_sizes(product['sizes'])
+    return product
+
+
+def _project_sizes(sizes):
+    # Из размеров нормализации нужны только цены и остатки на складах
+    if not isinstance(sizes, list):
+        return sizes
+    return [
+        {key: size[key] for key in _SIZE_FIELDS if key in size}
+        for size in sizes if isinstance(size, dict)
+    ]
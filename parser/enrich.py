@@ -0,0 +1,94 @@
+"""
+Пакетное дополнение товаров данными карточек card.wb.ru
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from .client import WildberriesAPIError
+from .normalize import extract_card_fields, product_fingerprint
+
+
+# Сколько nm передается в одном запросе cards/detail?nm=1;2;3
+CARD_CHUNK_SIZE = 100
+
+
+class CardEnricher:
+    """
+    Загружает карточки товаров пачками и дополняет ими нормализованные товары.
+
+    ID товаров упаковываются по chunk_size в один запрос, а сами запросы
+    выполняются параллельно, не больше concurrency одновременно.
+    """
+
+    def __init__(self, client, chunk_size=CARD_CHUNK_SIZE, concurrency=4, log=None):
+        """
+        Args:
+            client (WildberriesClient): HTTP-клиент
+            chunk_size (int): Количество товаров в одном запросе карточек
+            concurrency (int): Максимальное количество одновременных запросов
+            log (callable): Функция для вывода сообщений о ходе работы
+        """
+        self.client = client
+        self.chunk_size = chunk_size
+        self.concurrency = max(1, concurrency)
+        self.log = log or (lambda message: None)
+
+    def enrich(self, rows):
+        """
+        Дополняет товары полями из карточек на месте
+
+        Args:
+            rows (list[dict]): Нормализованные товары
+
+        Returns:
+            tuple: (количество дополненных товаров, количество неудачных запросов)
+        """
+        cards, failed_chunks = self.fetch_cards([row['wb_id'] for row in rows])
+        enriched = 0
+        for row in rows:
+            card = cards.get(row['wb_id'])
+            if card is not None:
+                row.update(extract_card_fields(card))
+                row['fingerprint'] = product_fingerprint(row)
+                enriched += 1
+        return enriched, failed_chunks
+
+    def fetch_cards(self, nm_ids):
+        """
+        Загружает карточки товаров
+
+        Returns:
+            tuple: (словарь wb_id -> карточка, количество неудачных запросов)
+        """
+        chunks = [
+            nm_ids[index:index + self.chunk_size]
+            for index in range(0, len(nm_ids), self.chunk_size)
+        ]
+        if not chunks:
+            return {}, 0
+        return asyncio.run(self._fetch_chunks(chunks))
+
+    async def _fetch_chunks(self, chunks):
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='wb-card')
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch_chunk(chunk):
+            async with semaphore:
+                try:
+                    return await asyncio.to_thread(self.client.cards, chunk)
+                except WildberriesAPIError as e:
+                    self.log(f"❌ Не удалось загрузить карточки ({len(chunk)} шт.): {e}")
+                    return None
+
+        cards = {}
+        failed_chunks = 0
+        for chunk_cards in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            if chunk_cards is None:
+                failed_chunks += 1
+                continue
+            for card in chunk_cards:
+                if card.get('id'):
+                    cards[int(card['id'])] = card
+        return cards, failed_chunks
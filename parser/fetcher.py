@@ -0,0 +1,174 @@
+"""
+Параллельная загрузка страниц поисковой выдачи Wildberries
+"""
+import asyncio
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+
+# Wildberries отдает не больше 100 товаров на страницу выдачи
+SEARCH_PAGE_SIZE = 100
+# Одновременных запросов страниц по умолчанию
+DEFAULT_CONCURRENCY = 8
+
+_DONE = object()
+
+
+@dataclass
+class SearchPage:
+    """Страница выдачи и общее число товаров по запросу, если API его сообщило"""
+    products: list
+    total: int = None
+
+
+@dataclass
+class PageResult:
+    """Результат загрузки одной страницы выдачи"""
+    page: int
+    products: list = field(default_factory=list)
+    error: Exception = None
+    total: int = None
+
+
+class PageFetcher:
+    """
+    Загружает страницы выдачи параллельно с ограничением числа одновременных запросов.
+
+    Страницы запрашиваются по возрастанию номера "окном" размером concurrency.
+    Если задан page_size, сначала загружается одна первая страница: когда
+    в ответе есть общее число товаров (SearchPage.total), последняя страница
+    известна заранее, и страницы за ней не запрашиваются вовсе. Иначе конец
+    выдачи - первая пустая (или неполная, если задан page_size) страница:
+    страницы за ней больше не запрашиваются, а еще не завершенные запросы
+    к ним отменяются.
+    """
+
+    def __init__(self, fetch_page, concurrency=DEFAULT_CONCURRENCY, page_size=None):
+        """
+        Args:
+            fetch_page (callable): Синхронная функция fetch_page(page) -> list товаров
+                или SearchPage. Ошибки загрузки должны выбрасываться исключением, а не пустым списком,
+                иначе сбой будет принят за конец выдачи.
+            concurrency (int): Максимальное число одновременных запросов
+            page_size (int): Полный размер страницы выдачи, если он точно известен;
+                None - конец выдачи определяется только по пустой странице,
+                общее число товаров из ответа не используется
+        """
+        self.fetch_page = fetch_page
+        self.concurrency = max(1, concurrency)
+        self.page_size = page_size
+
+    def iter_pages(self, start_page=1, max_pages=1, queue_size=None):
+        """
+        Загружает страницы в фоновом потоке и отдает их по мере готовности
+
+        Между загрузкой и потребителем стоит ограниченная очередь: если
+        потребитель не успевает, новые страницы не запрашиваются. Закрытие
+        генератора останавливает загрузку.
+
+        Args:
+            start_page (int): Номер первой страницы
+            max_pages (int): Максимальное количество страниц
+            queue_size (int): Размер очереди готовых страниц
+
+        Yields:
+            PageResult: Результаты в порядке завершения загрузки
+        """
+        results = queue.Queue(maxsize=queue_size or self.concurrency)
+        stop = threading.Event()
+
+        def emit(item):
+            # Кладем результат в очередь, пока потребитель не ушел
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                asyncio.run(self._crawl(start_page, start_page + max_pages - 1, emit, stop))
+            except Exception as e:
+                emit(e)
+            finally:
+                emit(_DONE)
+
+        producer = threading.Thread(target=produce, name='wb-page-fetcher', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = results.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    async def _crawl(self, first_page, last_page, emit, stop):
+        # Потоков должно хватать на все запросы окна и на передачу результата в очередь
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=self.concurrency + 1, thread_name_prefix='wb-page')
+        )
+        next_page = first_page
+        pending = {}
+        # Пока не пришел первый ответ, общее число товаров неизвестно:
+        # с известным page_size окно открывается только после него
+        window = 1 if self.page_size is not None else self.concurrency
+
+        def end_crawl(page):
+            # Запросы к страницам за концом выдачи больше не нужны
+            for other, other_page in list(pending.items()):
+                if other_page > page:
+                    other.cancel()
+                    del pending[other]
+            return page
+
+        while pending or next_page <= last_page:
+            if stop.is_set():
+                # Потребитель ушел: ответы уже отправленных запросов не нужны
+                for task in pending:
+                    task.cancel()
+                return
+
+            while next_page <= last_page and len(pending) < window:
+                task = asyncio.create_task(self._fetch_page(next_page))
+                pending[task] = next_page
+                next_page += 1
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            window = self.concurrency
+            for task in sorted(done, key=pending.get):
+                page = pending.pop(task, None)
+                if page is None or page > last_page:
+                    # Страница оказалась за концом выдачи, найденным в этом же шаге
+                    continue
+                result = task.result()
+
+                if result.error is None and result.total is not None and self.page_size is not None:
+                    # Последняя страница известна по общему числу товаров
+                    last_page = end_crawl(min(last_page, math.ceil(result.total / self.page_size)))
+                if result.error is None and (
+                    not result.products or (self.page_size is not None and len(result.products) < self.page_size)
+                ):
+                    # Выдача закончилась: пустая страница уже за концом, неполная - последняя
+                    last_page = end_crawl(min(last_page, page if result.products else page - 1))
+
+                if page <= last_page and (result.products or result.error is not None):
+                    # Пока очередь полна, новые страницы не запрашиваются
+                    await asyncio.to_thread(emit, result)
+
+    async def _fetch_page(self, page):
+        try:
+            data = await asyncio.to_thread(self.fetch_page, page)
+        except Exception as e:
+            return PageResult(page=page, error=e)
+        if isinstance(data, SearchPage):
+            return PageResult(page=page, products=data.products or [], total=data.total)
+        return PageResult(page=page, products=data or [])
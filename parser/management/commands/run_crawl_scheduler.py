@@ -0,0 +1,79 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from parser.client import WildberriesClient
+from parser.scheduler import CrawlScheduler
+from parser.throttle import RequestBudget
+from products.models import CrawlTarget
+
+
+class Command(BaseCommand):
+    help = 'Планировщик повторного обхода: поддерживает свежими самые востребованные страницы выдачи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget', type=float, default=600, help='Бюджет запросов к API в час')
+        parser.add_argument('--burst', type=float, help='Сколько неизрасходованных запросов может накопиться')
+        parser.add_argument('--concurrency', type=int, default=4, help='Сколько страниц загружать одновременно')
+        parser.add_argument('--tick', type=float, default=10, help='Пауза между циклами планирования, с')
+        parser.add_argument(
+            '--min-interval', type=int, default=15,
+            help='Не обновлять одну страницу чаще, чем раз в столько минут'
+        )
+        parser.add_argument(
+            '--min-priority', type=float, default=0.1,
+            help='Не обновлять страницы с меньшим приоритетом (вероятность изменения с учетом популярности)'
+        )
+        parser.add_argument(
+            '--sync-pages', type=int, default=0,
+            help='Добавить в план первые N страниц всех запросов, по которым есть товары'
+        )
+        parser.add_argument(
+            '--enrich', action='store_true',
+            help='Дополнять товары данными карточек (тратит бюджет: запрос на 100 товаров)'
+        )
+        parser.add_argument('--once', action='store_true', help='Выполнить один цикл и завершиться')
+
+    def handle(self, *args, **options):
+        if options['sync_pages']:
+            queries = CrawlTarget.objects.sync_from_products(options['sync_pages'])
+            self.stdout.write(f"🗂 В план обхода добавлено запросов: {queries}")
+
+        budget = RequestBudget(options['budget'], burst=options['burst'])
+        scheduler = CrawlScheduler(
+            client=WildberriesClient(pool_size=options['concurrency']),
+            budget=budget,
+            concurrency=options['concurrency'],
+            min_interval=options['min_interval'] * 60,
+            min_priority=options['min_priority'],
+            enrich=options['enrich'],
+            log=self.stdout.write,
+        )
+
+        self.stopping = False
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        self.stdout.write(
+            f"⏰ Планировщик запущен: бюджет {options['budget']:.0f} запросов в час, "
+            f"страниц в плане: {CrawlTarget.objects.filter(enabled=True).count()}"
+        )
+        try:
+            while not self.stopping:
+                close_old_connections()
+                scheduler.run_once()
+                if options['once']:
+                    break
+                # Спим до следующего цикла, но не меньше, чем нужно для накопления бюджета
+                pause = max(options['tick'], min(budget.wait_time(1), 3600))
+                deadline = time.monotonic() + pause
+                while not self.stopping and time.monotonic() < deadline:
+                    time.sleep(min(1.0, deadline - time.monotonic()))
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write("👋 Планировщик остановлен")
+
+    def stop(self, signum, frame):
+        self.stopping = True
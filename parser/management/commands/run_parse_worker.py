@@ -0,0 +1,97 @@
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+from parser.pipeline import IngestionPipeline
+from products.models import ParseJob
+
+
+class Command(BaseCommand):
+    help = 'Воркер очереди задач парсинга (ParseJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Максимальное количество одновременных запросов к API в одной задаче'
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза между проверками пустой очереди, с')
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Через сколько секунд без отчетов задача чужого воркера возвращается в очередь'
+        )
+        parser.add_argument('--once', action='store_true', help='Выполнить задачи из очереди и завершиться')
+
+    def handle(self, *args, **options):
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = False
+        # Завершаем текущую задачу и выходим, не бросая ее на середине
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        self.stdout.write(f"👷 Воркер {self.worker} запущен")
+        try:
+            self.work(options)
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write(f"👋 Воркер {self.worker} остановлен")
+
+    def work(self, options):
+        while not self.stopping:
+            close_old_connections()
+            requeued = ParseJob.objects.requeue_stale(options['stale_after'])
+            if requeued:
+                self.stdout.write(f"♻️ Возвращено в очередь зависших задач: {requeued}")
+
+            job = ParseJob.objects.claim(self.worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            self.run_job(job, options['concurrency'])
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run_job(self, job, concurrency):
+        self.stdout.write(f"🚀 Задача #{job.pk}: '{job.query}', страниц: {job.pages}")
+
+        def on_progress(report):
+            ParseJob.objects.filter(pk=job.pk, worker=job.worker).update(
+                pages_done=report.pages,
+                failed_pages=report.failed_pages,
+                products_found=report.products_found,
+                inserted=report.inserted,
+                updated=report.updated,
+                unchanged=report.unchanged,
+                heartbeat_at=timezone.now(),
+            )
+
+        pipeline = IngestionPipeline(
+            concurrency=concurrency,
+            log=self.stdout.write,
+            on_progress=on_progress,
+        )
+        try:
+            report = pipeline.run(job.query, pages=job.pages, category=job.category or None)
+        except Exception as e:
+            ParseJob.objects.filter(pk=job.pk, worker=job.worker).update(
+                status=ParseJob.STATUS_FAILED, error=str(e), finished_at=timezone.now()
+            )
+            self.stdout.write(f"❌ Задача #{job.pk} завершилась ошибкой: {e}")
+            return
+
+        on_progress(report)
+        ParseJob.objects.filter(pk=job.pk, worker=job.worker).update(
+            status=ParseJob.STATUS_DONE, finished_at=timezone.now()
+        )
+        self.stdout.write(
+            f"🎉 Задача #{job.pk} выполнена: найдено {report.products_found}, "
+            f"добавлено {report.inserted}, обновлено {report.updated}"
+        )
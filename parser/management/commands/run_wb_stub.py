@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from parser.stub_server import StubConfig, WBStubServer
+
+
+class Command(BaseCommand):
+    help = 'Локальный стенд API Wildberries с синтетическими товарами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='Адрес для прослушивания')
+        parser.add_argument('--port', type=int, default=8765, help='Порт')
+        parser.add_argument('--total', type=int, default=1000, help='Сколько товаров находится по запросу')
+        parser.add_argument('--page-size', type=int, default=100, help='Товаров на странице выдачи')
+        parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, мс')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Случайная добавка к задержке, мс')
+        parser.add_argument('--burst-every', type=int, default=0, help='Раз в сколько запросов начинается серия 429')
+        parser.add_argument('--burst-length', type=int, default=0, help='Длина серии ответов 429')
+        parser.add_argument('--malformed-rate', type=float, default=0.0, help='Доля некорректных ответов (0..1)')
+        parser.add_argument(
+            '--price-change-rate', type=float, default=0.0,
+            help='Доля товаров, цена которых меняется при каждом запросе (0..1)'
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Зерно генератора товаров')
+
+    def handle(self, *args, **options):
+        config = StubConfig(
+            total_products=options['total'],
+            page_size=options['page_size'],
+            latency=options['latency'] / 1000,
+            jitter=options['jitter'] / 1000,
+            burst_every=options['burst_every'],
+            burst_length=options['burst_length'],
+            malformed_rate=options['malformed_rate'],
+            price_change_rate=options['price_change_rate'],
+            seed=options['seed'],
+        )
+        server = WBStubServer((options['host'], options['port']), config)
+
+        self.stdout.write(f"🧪 Стенд API Wildberries запущен на {server.base_url}")
+        self.stdout.write(f"WB_SEARCH_URL={server.search_url}")
+        self.stdout.write(f"WB_CARD_DETAIL_URL={server.card_detail_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"📊 Статистика стенда: {server.state.stats()}")
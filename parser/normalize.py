@@ -0,0 +1,196 @@
+"""
+Приведение товаров из ответов API Wildberries к полям модели Product
+"""
+import hashlib
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+
+KOPECKS = Decimal('100')
+CENTS = Decimal('0.01')
+PERCENT_STEP = Decimal('0.1')
+MAX_RATING = Decimal('5')
+
+# Поля Product, изменение которых означает, что строку нужно перезаписать
+FINGERPRINT_FIELDS = (
+    'name', 'price', 'original_price', 'rating', 'review_count',
+    'brand', 'supplier', 'stock_quantity', 'search_query',
+)
+
+# Поля товара из ответов поиска и карточек, которые читает нормализация;
+# остальные поля клиент отбрасывает сразу при разборе ответа
+PRODUCT_FIELDS = frozenset({
+    'id', 'name', 'brand', 'supplier',
+    'salePriceU', 'priceU', 'sizes', 'totalQuantity',
+    'reviewRating', 'rating', 'reviewCount', 'feedbacks', 'nmFeedbacks',
+})
+
+
+def normalize_search_query(text):
+    """
+    Текст запроса без учета регистра и пробелов по краям
+
+    Под этим текстом сохраняются товары, задачи парсинга и страницы обхода:
+    API Wildberries регистр не различает, и "Ноутбук" с "ноутбук" - один запрос.
+    """
+    return text.strip().lower()
+
+
+def normalize_product(product_data, search_query):
+    """
+    Приводит товар из ответа API к полям модели Product
+
+    Args:
+        product_data (dict): Товар из ответа поиска или карточки
+        search_query (str): Поисковый запрос, по которому найден товар
+
+    Returns:
+        dict: Поля для Product или None, если у товара нет ID
+    """
+    wb_id = product_data.get('id')
+    if not wb_id:
+        return None
+
+    price, original_price = extract_prices(product_data)
+
+    row = {
+        'wb_id': int(wb_id),
+        'name': (product_data.get('name') or '')[:500],
+        'price': price,
+        'original_price': original_price,
+        'rating': extract_rating(product_data),
+        'review_count': int(
+            product_data.get('reviewCount') or
+            product_data.get('feedbacks') or
+            product_data.get('nmFeedbacks') or
+            0
+        ),
+        'brand': (product_data.get('brand') or '')[:200],
+        'supplier': (product_data.get('supplier') or '')[:200],
+        'stock_quantity': extract_stock_quantity(product_data),
+        'search_query': normalize_search_query(search_query)[:200],
+    }
+    row['fingerprint'] = product_fingerprint(row)
+    return row
+
+
+def product_fingerprint(values):
+    """
+    Отпечаток данных товара: 64-битный хэш полей FINGERPRINT_FIELDS
+
+    Если отпечаток новой версии товара совпадает с сохраненным,
+    строку в базе данных можно не перезаписывать.
+
+    Args:
+        values (dict): Поля товара
+
+    Returns:
+        int: Знаковое 64-битное число для BigIntegerField
+    """
+    parts = []
+    for name in FINGERPRINT_FIELDS:
+        value = values.get(name)
+        if value is None:
+            parts.append('')
+        elif name in ('price', 'original_price', 'rating'):
+            # 50, 50.0 и Decimal('50.00') - одна и та же цена
+            parts.append(str(to_money(value)))
+        else:
+            parts.append(str(value))
+    digest = hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def to_money(value):
+    """Денежное значение (число, строка или Decimal) с точностью до копеек"""
+    value = value if isinstance(value, Decimal) else Decimal(str(value))
+    return value.quantize(CENTS)
+
+
+def discount_percentage(price, original_price):
+    """
+    Скидка в процентах от оригинальной цены с точностью до десятой
+
+    Округление - как у round() в PostgreSQL, чтобы значение совпадало
+    с вычисленным в SQL (миграции, seed_products).
+
+    Returns:
+        Decimal: Процент скидки или 0, если скидки нет
+    """
+    price, original_price = to_money(price), to_money(original_price)
+    if original_price <= price:
+        return Decimal('0.0')
+    return ((original_price - price) * 100 / original_price).quantize(PERCENT_STEP, ROUND_HALF_UP)
+
+
+def extract_card_fields(card_data):
+    """
+    Поля товара из карточки (card.wb.ru), которыми дополняется результат поиска
+
+    Returns:
+        dict: Только те поля, которые в карточке заполнены
+    """
+    fields = {
+        'brand': (card_data.get('brand') or '')[:200],
+        'supplier': (card_data.get('supplier') or '')[:200],
+        'stock_quantity': extract_stock_quantity(card_data),
+        'rating': extract_rating(card_data),
+        'review_count': card_data.get('feedbacks') or card_data.get('nmFeedbacks'),
+    }
+    return {name: value for name, value in fields.items() if value not in (None, '')}
+
+
+def extract_prices(product_data):
+    """
+    Цена со скидкой и оригинальная цена товара
+
+    Старый формат API отдает salePriceU/priceU, новый - цены внутри sizes.
+    Все цены приходят в копейках.
+
+    Returns:
+        tuple: (price, original_price) в Decimal
+    """
+    sale_price = product_data.get('salePriceU')
+    base_price = product_data.get('priceU')
+
+    if sale_price is None and base_price is None:
+        for size in product_data.get('sizes') or []:
+            size_price = size.get('price') or {}
+            if size_price:
+                sale_price = size_price.get('product') or size_price.get('total')
+                base_price = size_price.get('basic')
+                break
+
+    price = _kopecks_to_money(sale_price or base_price)
+    original_price = _kopecks_to_money(base_price or sale_price)
+    return price, max(original_price, price)
+
+
+def extract_rating(product_data):
+    """Рейтинг товара от 0 до 5 или None, если оценок нет"""
+    rating = product_data.get('reviewRating') or product_data.get('rating')
+    if not rating:
+        return None
+    try:
+        rating = Decimal(str(rating)).quantize(CENTS)
+    except InvalidOperation:
+        return None
+    return min(max(rating, Decimal('0')), MAX_RATING)
+
+
+def extract_stock_quantity(product_data):
+    """Суммарный остаток по всем размерам и складам или None, если данных нет"""
+    if product_data.get('totalQuantity') is not None:
+        return int(product_data['totalQuantity'])
+
+    quantities = [
+        stock.get('qty') or 0
+        for size in product_data.get('sizes') or []
+        for stock in size.get('stocks') or []
+    ]
+    return sum(quantities) if quantities else None
+
+
+def _kopecks_to_money(value):
+    if not value:
+        return Decimal('0.00')
+    return (Decimal(str(value)) / KOPECKS).quantize(CENTS)
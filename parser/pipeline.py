@@ -0,0 +1,167 @@
+"""
+Потоковый конвейер загрузки товаров Wildberries в базу данных
+
+    загрузка и разбор страниц -> нормализация -> пачки -> карточки -> запись
+
+Загрузка идет в фоновом потоке и отдает страницы через ограниченную
+очередь, остальные стадии - генераторы, которые тянут данные по одному
+товару. В памяти одновременно находятся не больше queue_size страниц
+и одна пачка на запись, независимо от размера обхода.
+"""
+from dataclasses import dataclass
+from itertools import islice
+
+from products.models import Product
+
+from .client import WildberriesClient
+from .enrich import CardEnricher
+from .fetcher import DEFAULT_CONCURRENCY, SEARCH_PAGE_SIZE, PageFetcher
+from .normalize import normalize_product
+
+
+@dataclass
+class IngestionReport:
+    """Итоги одного прогона конвейера"""
+    pages: int = 0
+    failed_pages: int = 0
+    products_found: int = 0
+    inserted: int = 0
+    # Товары, данные которых изменились, и товары без изменений (строка не перезаписана)
+    updated: int = 0
+    unchanged: int = 0
+    enriched: int = 0
+    failed_card_requests: int = 0
+    # Состояние ограничителя нагрузки в конце прогона
+    throttle: dict = None
+
+
+class IngestionPipeline:
+    """
+    Конвейер загрузки товаров по поисковому запросу
+    """
+
+    def __init__(self, client=None, concurrency=None, batch_size=500, queue_size=None,
+                 enrich=False, log=None, on_progress=None):
+        """
+        Args:
+            client (WildberriesClient): HTTP-клиент, по умолчанию создается свой
+            concurrency (int): Максимальное количество одновременных запросов
+                (по умолчанию DEFAULT_CONCURRENCY), не больше пула соединений
+                клиента; фактическое число подбирает AIMD-ограничитель клиента
+            batch_size (int): Количество товаров в одной пачке записи
+            queue_size (int): Сколько загруженных страниц может ждать обработки
+            enrich (bool): Дополнять ли товары данными карточек card.wb.ru
+            log (callable): Функция для вывода сообщений о ходе работы
+            on_progress (callable): Вызывается с IngestionReport после каждой
+                страницы и каждой записанной пачки
+        """
+        concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.client = client or WildberriesClient(pool_size=concurrency)
+        self.concurrency = min(concurrency, self.client.pool_size)
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.log = log or (lambda message: None)
+        self.on_progress = on_progress or (lambda report: None)
+        self.enricher = CardEnricher(self.client, concurrency=self.concurrency, log=self.log) if enrich else None
+
+    def run(self, query, pages=1, category=None, limit=None, start_page=1):
+        """
+        Загружает выдачу по запросу и записывает товары в базу данных
+
+        Args:
+            query (str): Поисковый запрос
+            pages (int): Максимальное количество страниц
+            category (str): Категория товаров (опционально)
+            limit (int): Максимальное количество товаров (опционально)
+            start_page (int): Номер первой страницы
+
+        Returns:
+            IngestionReport: Итоги прогона
+        """
+        report = IngestionReport()
+        page_results = self.fetch(query, pages, category, start_page)
+        try:
+            products = self.decode(page_results, report)
+            if limit:
+                products = islice(products, limit)
+            rows = self.normalize(products, query)
+            for batch in self.batch(rows):
+                if self.enricher is not None:
+                    self.enrich(batch, report)
+                self.write(batch, report)
+        finally:
+            # Останавливаем фоновую загрузку, если дошли до лимита раньше конца выдачи
+            page_results.close()
+        report.throttle = self.client.throttle.snapshot()
+        return report
+
+    def fetch(self, query, pages, category=None, start_page=1):
+        """
+        Стадия загрузки: страницы выдачи из фонового потока
+
+        Последняя страница определяется по общему числу товаров из первого
+        ответа или по первой неполной странице.
+        """
+        fetcher = PageFetcher(
+            lambda page: self.client.search_page(query, page, category),
+            concurrency=self.concurrency,
+            page_size=SEARCH_PAGE_SIZE,
+        )
+        return fetcher.iter_pages(start_page, pages, queue_size=self.queue_size)
+
+    def decode(self, page_results, report):
+        """Стадия разбора: товары страниц по одному"""
+        for result in page_results:
+            if result.error is not None:
+                report.failed_pages += 1
+                self.log(f"❌ Ошибка при обработке страницы {result.page}: {result.error}")
+                self.on_progress(report)
+                continue
+
+            report.pages += 1
+            report.products_found += len(result.products)
+            throttle = self.client.throttle.snapshot()
+            self.log(
+                f"✅ Найдено {len(result.products)} товаров на странице {result.page} "
+                f"(лимит запросов: {throttle['limit']}, темп: {throttle['rate']}/с)"
+            )
+            self.on_progress(report)
+            yield from result.products
+
+    def normalize(self, products, search_query):
+        """Стадия нормализации: поля модели Product"""
+        for product_data in products:
+            try:
+                row = normalize_product(product_data, search_query)
+            except (TypeError, ValueError, ArithmeticError) as e:
+                self.log(f"❌ Ошибка обработки товара {product_data.get('id', 'unknown')}: {e}")
+                continue
+            if row is not None:
+                yield row
+
+    def batch(self, rows):
+        """Стадия пакетирования: товары пачками по batch_size"""
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def enrich(self, batch, report):
+        """Стадия карточек: дополнение пачки данными card.wb.ru"""
+        enriched, failed_requests = self.enricher.enrich(batch)
+        report.enriched += enriched
+        report.failed_card_requests += failed_requests
+
+    def write(self, batch, report):
+        """Стадия записи: upsert пачки по wb_id"""
+        inserted, updated, unchanged = Product.objects.bulk_upsert(
+            (Product(**row) for row in batch),
+            batch_size=len(batch),
+        )
+        report.inserted += inserted
+        report.updated += updated
+        report.unchanged += unchanged
+        self.log(f"💾 Добавлено {inserted}, обновлено {updated}, без изменений {unchanged} товаров")
+        self.on_progress(report)
@@ -0,0 +1,174 @@
+"""
+Планировщик повторного обхода страниц выдачи Wildberries
+
+Вместо обхода всех запросов по расписанию планировщик держит очередь
+страниц (CrawlTarget) с приоритетом: чем дольше страницу не обновляли,
+чем чаще она менялась раньше и чем популярнее запрос, тем раньше ее
+обновят. Обход идет в рамках бюджета запросов в час, поэтому популярная
+часть каталога остается свежей, а редкие запросы обновляются по остатку.
+"""
+import hashlib
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from operator import itemgetter
+
+from django.utils import timezone
+
+from products.models import CrawlTarget
+
+from .client import WildberriesAPIError, WildberriesClient
+from .enrich import CARD_CHUNK_SIZE
+from .pipeline import IngestionPipeline, IngestionReport
+from .throttle import RequestBudget
+
+
+# Вес нового наблюдения в экспоненциальном среднем частоты изменений
+CHANGE_RATE_ALPHA = 0.3
+
+
+def page_hash(rows):
+    """Хэш содержимого страницы: ID товаров и отпечатки их данных"""
+    digest = hashlib.blake2b(digest_size=16)
+    for row in sorted(rows, key=itemgetter('wb_id')):
+        digest.update(f"{row['wb_id']}:{row['fingerprint']};".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CrawlScheduler:
+    """
+    Выбирает самые нуждающиеся в обновлении страницы и обновляет их
+    в пределах бюджета запросов
+    """
+
+    def __init__(self, client=None, budget=None, concurrency=4, min_interval=900, min_priority=0.1,
+                 min_change_rate=0.02, popularity_half_life=72.0, enrich=False, log=None):
+        """
+        Args:
+            client (WildberriesClient): HTTP-клиент, по умолчанию создается свой
+            budget (RequestBudget): Бюджет запросов, по умолчанию 600 в час
+            concurrency (int): Сколько страниц загружать одновременно
+            min_interval (int): Не обновлять страницу чаще, чем раз в столько секунд
+            min_priority (float): Страницы с меньшим приоритетом не обновляются,
+                даже если бюджет остался
+            min_change_rate (float): Нижняя граница частоты изменений в час, чтобы
+                редко меняющиеся страницы все равно со временем обновлялись
+            popularity_half_life (float): Период полураспада популярности, ч
+            enrich (bool): Дополнять ли товары данными карточек
+            log (callable): Функция для вывода сообщений о ходе работы
+        """
+        self.client = client or WildberriesClient(pool_size=concurrency)
+        self.budget = budget or RequestBudget(per_hour=600)
+        self.concurrency = max(1, concurrency)
+        self.min_interval = timedelta(seconds=min_interval)
+        self.min_priority = min_priority
+        self.min_change_rate = min_change_rate
+        self.popularity_half_life = popularity_half_life
+        self.log = log or (lambda message: None)
+        self.pipeline = IngestionPipeline(
+            client=self.client, concurrency=concurrency, enrich=enrich, log=self.log
+        )
+
+    def select(self, limit, now=None):
+        """
+        Страницы с наибольшим приоритетом
+
+        Returns:
+            list[CrawlTarget]: Не больше limit страниц, по убыванию приоритета
+        """
+        if limit <= 0:
+            return []
+        now = now or timezone.now()
+        # Приоритет считается и сортируется в базе данных, в Python приходят только limit страниц
+        targets = (
+            CrawlTarget.objects.due(now, self.min_interval, self.min_change_rate, self.popularity_half_life)
+            .filter(score__gte=self.min_priority)
+            .select_related('query')
+            .order_by('-score', '-pk')
+        )
+        return list(targets[:limit])
+
+    def run_once(self, now=None):
+        """
+        Обновляет столько страниц, на сколько хватает бюджета
+
+        Returns:
+            IngestionReport: Итоги; pages - обновленные страницы
+        """
+        report = IngestionReport()
+        targets = self.select(self.budget.available(), now)
+        if not targets:
+            return report
+
+        # Бюджет списывается до отправки, чтобы параллельные запросы его не превысили
+        self.budget.spend(len(targets))
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='wb-recrawl') as pool:
+            results = list(pool.map(self.fetch, targets))
+
+        # Запись в базу данных - в текущем потоке
+        changed = 0
+        for target, products, error in results:
+            changed += self.apply(target, products, error, report)
+        report.throttle = self.client.throttle.snapshot()
+        self.log(
+            f"🔁 Обновлено страниц: {report.pages} (изменилось {changed}), "
+            f"ошибок: {report.failed_pages}, товаров: {report.products_found}, "
+            f"перезаписано: {report.inserted + report.updated}, без изменений: {report.unchanged}"
+        )
+        return report
+
+    def fetch(self, target):
+        """Загружает страницу выдачи; выполняется в пуле потоков"""
+        try:
+            return target, self.client.search(target.search_query, target.page), None
+        except WildberriesAPIError as e:
+            return target, None, e
+
+    def apply(self, target, products, error, report):
+        """
+        Записывает товары страницы и обновляет статистику ее изменений
+
+        Returns:
+            bool: Изменилось ли содержимое страницы с прошлого обхода
+        """
+        now = timezone.now()
+        target.last_attempt_at = now
+        if error is not None:
+            target.failures += 1
+            target.last_error = str(error)
+            target.save(update_fields=['last_attempt_at', 'failures', 'last_error'])
+            report.failed_pages += 1
+            self.log(f"❌ {target}: {error}")
+            return False
+
+        rows = list(self.pipeline.normalize(products, target.search_query))
+        for batch in self.pipeline.batch(rows):
+            if self.pipeline.enricher is not None:
+                self.pipeline.enrich(batch, report)
+                self.budget.spend(math.ceil(len(batch) / CARD_CHUNK_SIZE))
+            self.pipeline.write(batch, report)
+        report.pages += 1
+        report.products_found += len(products)
+
+        content_hash = page_hash(rows)
+        changed = bool(target.content_hash) and content_hash != target.content_hash
+        if target.content_hash and target.last_crawled_at is not None:
+            # Наблюдение частоты: одно изменение (или ни одного) за прошедшие часы
+            hours = max((now - target.last_crawled_at).total_seconds() / 3600, 1 / 60)
+            sample = (1.0 if changed else 0.0) / hours
+            target.change_rate = (1 - CHANGE_RATE_ALPHA) * target.change_rate + CHANGE_RATE_ALPHA * sample
+        if not rows and target.page > 1:
+            # Выдача стала короче: страница больше не существует
+            target.enabled = False
+            self.log(f"🛑 {target}: страница пуста, исключена из обхода")
+
+        target.content_hash = content_hash
+        target.last_crawled_at = now
+        target.crawl_count += 1
+        target.failures = 0
+        target.last_error = ''
+        target.save(update_fields=[
+            'last_attempt_at', 'last_crawled_at', 'content_hash', 'change_rate',
+            'crawl_count', 'failures', 'last_error', 'enabled',
+        ])
+        return changed
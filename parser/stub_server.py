@@ -0,0 +1,303 @@
+"""
+Локальный стенд API Wildberries для нагрузочных прогонов без сети
+
+Отдает синтетическую поисковую выдачу и карточки товаров в формате
+search.wb.ru и card.wb.ru. Товары детерминированы: выдача зависит только
+от запроса и номера страницы, а карточка - от nm, поэтому прогоны
+воспроизводимы. Стенд умеет добавлять задержку, серии ответов 429
+и некорректные ответы, чтобы проверять повторы и AIMD-ограничитель.
+
+Запуск: python manage.py run_wb_stub --port 8765, после чего
+WB_SEARCH_URL=http://127.0.0.1:8765/exactmatch/ru/common/v4/search
+WB_CARD_DETAIL_URL=http://127.0.0.1:8765/cards/detail
+"""
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+SEARCH_PATH = '/exactmatch/ru/common/v4/search'
+CARD_DETAIL_PATH = '/cards/detail'
+
+BRANDS = ['Acer', 'ASUS', 'Lenovo', 'HP', 'Xiaomi', 'Samsung', 'Apple', 'Huawei']
+NOUNS = ['Ноутбук', 'Смартфон', 'Наушники', 'Планшет', 'Монитор', 'Клавиатура']
+
+
+@dataclass
+class StubConfig:
+    """Параметры стенда"""
+    # Сколько товаров находится по любому запросу
+    total_products: int = 1000
+    page_size: int = 100
+    # Задержка ответа и ее случайный разброс, в секундах
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Каждые burst_every запросов следующие burst_length получают 429
+    burst_every: int = 0
+    burst_length: int = 0
+    # Доля ответов с некорректным телом
+    malformed_rate: float = 0.0
+    # Доля товаров, цена которых меняется при каждом новом запросе страницы
+    price_change_rate: float = 0.0
+    seed: int = 0
+
+
+def make_product(nm_id, seed=0, price_epoch=0):
+    """
+    Синтетический товар в формате ответа поиска и карточки
+
+    Args:
+        nm_id (int): ID товара, от него зависят все поля
+        seed (int): Зерно стенда
+        price_epoch (int): Номер "версии" цены для товаров с меняющейся ценой
+    """
+    rng = random.Random(nm_id * 7919 + seed)
+    brand = rng.choice(BRANDS)
+    base_price = rng.randint(50, 5000) * 100
+    discount = rng.choice([0, 0, 5, 10, 15, 25, 40])
+    if price_epoch:
+        base_price += random.Random(nm_id * 31 + price_epoch).randint(-20, 20) * 100
+        base_price = max(base_price, 1000)
+    sale_price = base_price * (100 - discount) // 100
+    stocks = [{'wh': warehouse, 'qty': rng.randint(0, 50)} for warehouse in range(rng.randint(1, 3))]
+    rating = rng.choice([0, 3, 4, 4.5, 4.7, 4.8, 4.9, 5])
+
+    # Кроме полей, которые читает парсер, товар содержит служебные поля
+    # настоящей выдачи, чтобы объем ответа был близок к реальному
+    return {
+        '__sort': rng.randint(1000, 100000),
+        'ksort': rng.randint(100, 10000),
+        'time1': 2,
+        'time2': rng.randint(20, 60),
+        'wh': 507,
+        'dtype': 4,
+        'dist': rng.randint(10, 500),
+        'id': nm_id,
+        'root': nm_id // 10,
+        'kindId': 0,
+        'brand': brand,
+        'brandId': BRANDS.index(brand) + 1,
+        'siteBrandId': 0,
+        'colors': [{'name': rng.choice(['черный', 'белый', 'серый']), 'id': rng.randint(1, 1000)}],
+        'subjectId': rng.randint(1, 9000),
+        'subjectParentId': rng.randint(1, 900),
+        'name': f"{rng.choice(NOUNS)} {brand} {rng.randint(100, 999)}",
+        'entity': '',
+        'matchId': rng.randint(1, 10 ** 6),
+        'supplier': f"ООО {brand} Трейд",
+        'supplierId': rng.randint(1000, 99999),
+        'supplierRating': rng.choice([4.5, 4.7, 4.9]),
+        'supplierFlags': 0,
+        'pics': rng.randint(1, 12),
+        'priceU': base_price,
+        'salePriceU': sale_price,
+        'rating': int(rating),
+        'reviewRating': rating,
+        'nmReviewRating': rating,
+        'feedbacks': rng.randint(0, 20000) if rating else 0,
+        'nmFeedbacks': 0,
+        'panelPromoId': 0,
+        'promoTextCard': '',
+        'volume': rng.randint(1, 50),
+        'viewFlags': rng.randint(0, 2 ** 20),
+        'sizes': [{
+            'name': '',
+            'origName': '0',
+            'rank': 0,
+            'optionId': nm_id * 10,
+            'wh': 507,
+            'time1': 2,
+            'time2': 40,
+            'dtype': 4,
+            'stocks': stocks,
+            'price': {
+                'basic': base_price,
+                'product': sale_price,
+                'total': sale_price,
+                'logistics': 0,
+                'return': 0,
+            },
+            'saleConditions': 0,
+            'payload': f'{nm_id:x}' * 8,
+        }],
+        'totalQuantity': sum(stock['qty'] for stock in stocks),
+        'meta': {'tokens': [], 'presetId': 0},
+        'logs': f'{nm_id:x}{seed:x}' * 12,
+    }
+
+
+class StubState:
+    """Счетчики стенда, общие для всех потоков обработки запросов"""
+
+    def __init__(self, config):
+        self.config = config
+        self.requests = 0
+        self.rate_limited = 0
+        self.malformed = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random(config.seed)
+
+    def next_request(self):
+        """
+        Регистрирует запрос
+
+        Returns:
+            tuple: (номер запроса, отвечать ли 429, портить ли ответ)
+        """
+        config = self.config
+        with self.lock:
+            self.requests += 1
+            number = self.requests
+            rate_limited = (
+                config.burst_every > 0 and config.burst_length > 0
+                and number % config.burst_every < config.burst_length
+                and number >= config.burst_every
+            )
+            malformed = not rate_limited and self.rng.random() < config.malformed_rate
+            self.rate_limited += rate_limited
+            self.malformed += malformed
+        return number, rate_limited, malformed
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'rate_limited': self.rate_limited,
+                'malformed': self.malformed,
+            }
+
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов стенда"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        config = state.config
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        number, rate_limited, malformed = state.next_request()
+        if config.latency or config.jitter:
+            time.sleep(config.latency + random.uniform(0, config.jitter))
+
+        if rate_limited:
+            self._send(429, b'{"error":"too many requests"}', extra_headers={'Retry-After': '0'})
+            return
+
+        if url.path == SEARCH_PATH:
+            payload = self._search(params, config, number)
+        elif url.path == CARD_DETAIL_PATH:
+            payload = self._cards(params, config, number)
+        else:
+            self._send(404, b'{"error":"not found"}')
+            return
+
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        if malformed:
+            # Обрываем JSON на середине, как при разорванном ответе
+            body = body[:len(body) // 2]
+        self._send(200, body)
+
+    def _search(self, params, config, number):
+        query = params.get('query', [''])[0]
+        page = max(1, int(params.get('page', ['1'])[0] or 1))
+        # Разные запросы находят разные, но воспроизводимые наборы товаров
+        first_id = 10_000_000 + (zlib.crc32(query.encode('utf-8')) % 10_000) * 1_000_000
+        start = (page - 1) * config.page_size
+        stop = min(start + config.page_size, config.total_products)
+        products = [
+            self._product(first_id + index, config, number)
+            for index in range(start, stop)
+        ]
+        return {
+            'metadata': {'name': query, 'catalog_type': 'preset', 'rmi': ''},
+            'state': 0,
+            'version': 2,
+            'params': {'version': 1, 'curr': 'byn', 'spp': 0},
+            'data': {'products': products, 'total': config.total_products},
+        }
+
+    def _cards(self, params, config, number):
+        nm_ids = [int(nm_id) for nm_id in params.get('nm', [''])[0].split(';') if nm_id.isdigit()]
+        return {
+            'state': 0,
+            'data': {'products': [self._product(nm_id, config, number) for nm_id in nm_ids]},
+        }
+
+    def _product(self, nm_id, config, number):
+        changes_price = (
+            config.price_change_rate
+            and random.Random(nm_id + config.seed).random() < config.price_change_rate
+        )
+        return make_product(nm_id, config.seed, price_epoch=number if changes_price else 0)
+
+    def _send(self, status, body, extra_headers=None):
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=1)
+            headers['Content-Encoding'] = 'gzip'
+        headers.update(extra_headers or {})
+        headers['Content-Length'] = str(len(body))
+
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class WBStubServer(ThreadingHTTPServer):
+    """
+    HTTP-сервер стенда
+
+    Пример:
+        server = WBStubServer(('127.0.0.1', 0), StubConfig(total_products=250))
+        server.start()
+        client = WildberriesClient(search_url=server.search_url,
+                                   card_detail_url=server.card_detail_url)
+        ...
+        server.stop()
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), config=None):
+        super().__init__(address, StubRequestHandler)
+        self.state = StubState(config or StubConfig())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def search_url(self):
+        return self.base_url + SEARCH_PATH
+
+    @property
+    def card_detail_url(self):
+        return self.base_url + CARD_DETAIL_PATH
+
+    def start(self):
+        """Запускает сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self.serve_forever, name='wb-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,193 @@
+"""
+Адаптивное ограничение нагрузки на API Wildberries (AIMD)
+
+Контроллер ограничивает и число одновременных запросов, и темп их отправки.
+Пока ответы быстрые и успешные, оба лимита растут на постоянный шаг
+(additive increase), а при 429/5xx, сетевых ошибках или слишком медленных
+ответах - уменьшаются в несколько раз (multiplicative decrease).
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Ответы, означающие, что upstream перегружен или ограничивает нас
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class _Slot:
+    """Один запрос, выполняемый под контролем AIMDController"""
+
+    def __init__(self, started_at):
+        self.started_at = started_at
+        self.status = None
+
+
+class AIMDController:
+    """
+    Потокобезопасный AIMD-ограничитель одновременных запросов и их темпа
+
+    Пока перегрузки не было, лимиты растут быстро (slow start, на шаг за каждый
+    успешный ответ), после первой перегрузки - на шаг за "окно" из limit
+    ответов. При перегрузке лимиты умножаются на decrease, но не чаще одного
+    раза на волну запросов: ответы на запросы, отправленные до предыдущего
+    снижения, повторно лимит не снижают.
+    """
+
+    def __init__(self, max_limit=8, min_limit=1, initial_limit=1, increase=1.0, decrease=0.5,
+                 target_latency=2.0, initial_rate=5.0, min_rate=0.5, max_rate=50.0,
+                 rate_increase=1.0):
+        """
+        Args:
+            max_limit (int): Максимальное число одновременных запросов
+            min_limit (int): Минимальное число одновременных запросов
+            initial_limit (int): Начальное число одновременных запросов
+            increase (float): Прирост лимита за окно успешных ответов
+            decrease (float): Множитель лимита при перегрузке
+            target_latency (float): Время ответа в секундах, выше которого
+                upstream считается перегруженным
+            initial_rate (float): Начальный темп, запросов в секунду
+            min_rate (float): Минимальный темп
+            max_rate (float): Максимальный темп
+            rate_increase (float): Прирост темпа за окно успешных ответов
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_increase = rate_increase
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._rate = float(min(max(initial_rate, min_rate), max_rate))
+        self._in_flight = 0
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._next_start = 0.0
+        self._successes = 0
+        self._overloads = 0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        """Текущее число разрешенных одновременных запросов"""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def rate(self):
+        """Текущий темп, запросов в секунду"""
+        return self._rate
+
+    def snapshot(self):
+        """Текущее состояние контроллера для мониторинга"""
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'rate': round(self._rate, 2),
+                'in_flight': self._in_flight,
+                'successes': self._successes,
+                'overloads': self._overloads,
+            }
+
+    @contextmanager
+    def slot(self):
+        """
+        Выполнение одного запроса: ждет свободного места и своей очереди по темпу,
+        а по завершении учитывает результат.
+
+        В блоке нужно записать код ответа в slot.status; исключение из блока
+        считается перегрузкой.
+        """
+        slot = self._acquire()
+        try:
+            yield slot
+        except Exception:
+            self._release(slot, overloaded=True)
+            raise
+        latency = time.monotonic() - slot.started_at
+        overloaded = slot.status in OVERLOAD_STATUSES or latency > self.target_latency
+        self._release(slot, overloaded=overloaded)
+
+    def _acquire(self):
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + 1 / self._rate
+
+        delay = start_at - now
+        if delay > 0:
+            time.sleep(delay)
+        return _Slot(time.monotonic())
+
+    def _release(self, slot, overloaded):
+        with self._condition:
+            self._in_flight -= 1
+            if overloaded:
+                self._overloads += 1
+                if slot.started_at >= self._last_decrease:
+                    self._slow_start = False
+                    self._last_decrease = time.monotonic()
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._rate = max(self.min_rate, self._rate * self.decrease)
+            else:
+                self._successes += 1
+                # В slow start лимиты растут за каждый ответ, потом - за окно из limit ответов
+                window = 1.0 if self._slow_start else self._limit
+                self._limit = min(self.max_limit, self._limit + self.increase / window)
+                self._rate = min(self.max_rate, self._rate + self.rate_increase / window)
+            self._condition.notify_all()
+
+
+class RequestBudget:
+    """
+    Бюджет запросов в час (token bucket)
+
+    Токены копятся равномерно со скоростью per_hour / 3600 в секунду,
+    но не больше burst, так что за любой час тратится не больше
+    per_hour + burst запросов.
+    """
+
+    def __init__(self, per_hour, burst=None):
+        """
+        Args:
+            per_hour (float): Сколько запросов можно отправить за час
+            burst (float): Сколько неизрасходованных запросов может накопиться,
+                по умолчанию - бюджет на минуту
+        """
+        self.per_second = per_hour / 3600
+        self.burst = max(1.0, burst if burst is not None else per_hour / 60)
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def available(self):
+        """Сколько запросов можно отправить прямо сейчас"""
+        with self._lock:
+            self._refill()
+            return int(self._tokens)
+
+    def spend(self, requests):
+        """Списывает отправленные запросы; баланс может уйти в минус"""
+        with self._lock:
+            self._refill()
+            self._tokens -= requests
+
+    def wait_time(self, requests=1):
+        """Через сколько секунд накопится бюджет на requests запросов"""
+        with self._lock:
+            self._refill()
+            missing = requests - self._tokens
+            if missing <= 0:
+                return 0.0
+            return missing / self.per_second if self.per_second else float('inf')
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.per_second)
+        self._updated_at = now
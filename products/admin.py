@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Product
+from .models import CrawlTarget, ParseJob, PriceObservation, Product, SearchTerm
+from .pagination import EstimatedCountPaginator
 
 
 @admin.register(Product)
@@ -11,25 +12,95 @@ class ProductAdmin(admin.ModelAdmin):
         'name', 'price', 'original_price', 'rating', 
         'review_count', 'search_query', 'created_at'
     ]
+    # Фильтр по запросу читает справочник запросов, а не таблицу товаров
     list_filter = [
-        'search_query', 'rating', 'created_at',
+        'query', 'rating', 'created_at',
     ]
-    search_fields = ['name', 'search_query']
+    list_select_related = ['query']
+    autocomplete_fields = ['query']
+    search_fields = ['name', 'query__text']
     readonly_fields = ['created_at', 'updated_at', 'has_discount', 'discount_percentage']
     list_per_page = 50
+    # На больших таблицах - оценка количества вместо COUNT(*), без второго подсчета всех товаров
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Основная информация', {
-            'fields': ('wb_id', 'name', 'search_query')
+            'fields': ('wb_id', 'name', 'brand', 'supplier', 'query')
         }),
         ('Цены', {
             'fields': ('price', 'original_price', 'has_discount', 'discount_percentage')
         }),
         ('Рейтинги', {
-            'fields': ('rating', 'review_count')
+            'fields': ('rating', 'review_count', 'stock_quantity')
         }),
         ('Метаданные', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(ParseJob)
+class ParseJobAdmin(admin.ModelAdmin):
+    """
+    Административная панель для очереди задач парсинга
+    """
+    list_display = [
+        'id', 'query', 'pages', 'status', 'pages_done',
+        'products_found', 'inserted', 'updated', 'created_at', 'finished_at'
+    ]
+    list_filter = ['status', 'created_at']
+    search_fields = ['query']
+    readonly_fields = [
+        'dedup_key', 'pages_done', 'failed_pages', 'products_found', 'inserted', 'updated',
+        'error', 'worker', 'created_at', 'started_at', 'heartbeat_at', 'finished_at'
+    ]
+    list_per_page = 50
+
+
+@admin.register(CrawlTarget)
+class CrawlTargetAdmin(admin.ModelAdmin):
+    """
+    Административная панель для плана повторного обхода
+    """
+    list_display = [
+        'query', 'page', 'enabled', 'change_rate', 'popularity',
+        'last_crawled_at', 'crawl_count', 'failures'
+    ]
+    list_filter = ['enabled', 'page']
+    list_select_related = ['query']
+    search_fields = ['query__text']
+    autocomplete_fields = ['query']
+    readonly_fields = [
+        'content_hash', 'last_requested_at', 'last_crawled_at', 'last_attempt_at',
+        'crawl_count', 'failures', 'last_error'
+    ]
+    list_per_page = 50
+
+
+@admin.register(PriceObservation)
+class PriceObservationAdmin(admin.ModelAdmin):
+    """
+    Административная панель для истории цен
+    """
+    list_display = ['wb_id', 'price', 'original_price', 'observed_at']
+    search_fields = ['=wb_id']
+    readonly_fields = ['wb_id', 'price', 'original_price', 'observed_at']
+    list_per_page = 50
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(SearchTerm)
+class SearchTermAdmin(admin.ModelAdmin):
+    """
+    Административная панель для справочника поисковых запросов
+    """
+    list_display = ['text', 'product_count', 'rating_count', 'discount_count', 'updated_at']
+    search_fields = ['text']
+    readonly_fields = [
+        'product_count', 'price_sum', 'rating_sum', 'rating_count', 'discount_count', 'updated_at'
+    ]
+    list_per_page = 50
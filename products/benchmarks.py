@@ -0,0 +1,229 @@
+"""
+Нагрузочные замеры: разбор и нормализация товаров, пакетная запись,
+задержки API /api/products/ на синтетических наборах данных.
+
+Все функции возвращают словари, которые команда benchmark собирает
+в один JSON-отчет. Метрики с суффиксом _ms - чем меньше, тем лучше,
+с суффиксом _per_sec - чем больше, тем лучше; по суффиксу их сравнивает
+compare_results.
+"""
+import json
+import statistics
+import time
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+
+from parser.normalize import PRODUCT_FIELDS, normalize_product
+from parser.decode import extract_products
+from parser.stub_server import make_product
+
+from .models import Product
+
+
+# Запросы к API, задержка которых замеряется на каждом размере набора данных
+API_CASES = {
+    'list': '/api/products/',
+    'list_ordered': '/api/products/?ordering=-price',
+    'list_deep_page': '/api/products/?page=500',
+    'filter': '/api/products/?min_price=1000&max_price=3000&min_rating=4.5&has_discount=true',
+    'search': '/api/products/?search=Lenovo',
+    'stats': '/api/products/stats/',
+    'stats_filtered': '/api/products/stats/?search_query=ноутбук&min_rating=4',
+}
+# Случаи, которые замеряются еще и с ответом из кэша (суффикс _cached)
+API_CACHED_CASES = ('list',)
+# Кэш, который ничего не хранит: запросы API из API_CASES доходят до базы
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def timings(function, repeat):
+    """
+    Замеряет время выполнения function
+
+    Returns:
+        dict: Статистика по repeat запускам в миллисекундах
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'min_ms': round(samples[0], 3),
+    }
+
+
+def benchmark_normalize(count=20000, page_size=100):
+    """
+    Скорость нормализации товаров, разбора страниц выдачи через json.loads
+    и через extract_products клиента
+
+    Args:
+        count (int): Количество синтетических товаров
+        page_size (int): Товаров на странице для замера разбора JSON
+    """
+    products = [make_product(10_000_000 + index) for index in range(count)]
+    pages = [
+        json.dumps({'data': {'products': products[start:start + page_size]}}).encode('utf-8')
+        for start in range(0, count, page_size)
+    ]
+
+    started = time.perf_counter()
+    for product_data in products:
+        normalize_product(product_data, 'ноутбук')
+    normalize_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for page in pages:
+        for product_data in json.loads(page)['data']['products']:
+            normalize_product(product_data, 'ноутбук')
+    decode_seconds = time.perf_counter() - started
+
+    # Путь клиента: извлечение только нужных полей из data.products
+    started = time.perf_counter()
+    for page in pages:
+        for product_data in extract_products(page, PRODUCT_FIELDS)[0]:
+            normalize_product(product_data, 'ноутбук')
+    extract_seconds = time.perf_counter() - started
+
+    return {
+        'products': count,
+        'normalize_per_sec': round(count / normalize_seconds),
+        'normalize_us_per_product': round(normalize_seconds / count * 1e6, 3),
+        'decode_normalize_per_sec': round(count / decode_seconds),
+        'decode_normalize_us_per_product': round(decode_seconds / count * 1e6, 3),
+        'extract_normalize_per_sec': round(count / extract_seconds),
+        'extract_normalize_us_per_product': round(extract_seconds / count * 1e6, 3),
+    }
+
+
+def benchmark_upsert(rows=20000, batch_sizes=(100, 500, 1000, 5000)):
+    """
+    Скорость пакетной записи: вставка новых товаров, обновление изменившихся
+    и повторная запись тех же данных (строки пропускаются по отпечатку)
+
+    Таблица товаров очищается перед каждым размером пачки.
+    """
+    products = [
+        normalize_product(make_product(10_000_000 + index), 'ноутбук')
+        for index in range(rows)
+    ]
+    changed_products = [
+        normalize_product(make_product(10_000_000 + index, price_epoch=1), 'ноутбук')
+        for index in range(rows)
+    ]
+    results = {}
+    for batch_size in batch_sizes:
+        call_command('seed_products', count=0, truncate=True, stdout=_NullWriter())
+        seconds = {}
+        for name, data in [('insert', products), ('update', changed_products), ('unchanged', changed_products)]:
+            started = time.perf_counter()
+            Product.objects.bulk_upsert((Product(**row) for row in data), batch_size=batch_size)
+            seconds[name] = time.perf_counter() - started
+
+        results[str(batch_size)] = {
+            'rows': rows,
+            **{f'{name}_per_sec': round(rows / elapsed) for name, elapsed in seconds.items()},
+        }
+    return results
+
+
+def benchmark_api(size, repeat=20, seed_batch_size=500000):
+    """
+    Задержки запросов к API на наборе из size синтетических товаров
+
+    Набор создается командой seed_products; если в таблице уже ровно
+    size товаров (например, база сохранена через --keepdb), он переиспользуется.
+    Запросы выполняются без кэша ответов, иначе все повторы, кроме первого,
+    замеряли бы чтение из кэша; попадание в кэш замеряется отдельными
+    случаями с суффиксом _cached.
+    """
+    if Product.objects.count() != size:
+        call_command(
+            'seed_products', count=size, truncate=True, first_id=1,
+            batch_size=seed_batch_size, stdout=_NullWriter(),
+        )
+
+    client = Client()
+    results = {}
+    with override_settings(CACHES=NO_CACHE):
+        for name, url in API_CASES.items():
+            results[name] = api_timings(client, url, repeat)
+    for name in API_CACHED_CASES:
+        results[f'{name}_cached'] = api_timings(client, API_CASES[name], repeat)
+    return results
+
+
+def api_timings(client, url, repeat):
+    """Задержки GET-запроса url; первый запрос не замеряется"""
+    response = client.get(url)
+    if response.status_code != 200:
+        return {'url': url, 'error': response.status_code}
+    return {'url': url, **timings(lambda: client.get(url), repeat)}
+
+
+def database_info():
+    """Описание СУБД для отчета"""
+    info = {'vendor': connection.vendor}
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW server_version')
+            info['version'] = cursor.fetchone()[0]
+    return info
+
+
+def flatten(results, prefix=''):
+    """Плоский словарь метрик {'api.10000.list.p50_ms': 1.2, ...}"""
+    metrics = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f'{name}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare_results(baseline, current, threshold=0.2):
+    """
+    Сравнивает отчеты и находит ухудшения больше threshold (доля)
+
+    Сравниваются только метрики задержки (p50_ms, p95_ms) и скорости (_per_sec),
+    присутствующие в обоих отчетах.
+
+    Returns:
+        list[dict]: Ухудшившиеся метрики
+    """
+    baseline_metrics = flatten(baseline.get('results', baseline))
+    current_metrics = flatten(current.get('results', current))
+    regressions = []
+    for name, value in current_metrics.items():
+        old = baseline_metrics.get(name)
+        if not old:
+            continue
+        if name.endswith(('.p50_ms', '.p95_ms')):
+            change = value / old - 1
+        elif name.endswith('_per_sec'):
+            change = old / value - 1 if value else float('inf')
+        else:
+            continue
+        if change > threshold:
+            regressions.append({'metric': name, 'baseline': old, 'current': value, 'change': round(change, 3)})
+    return regressions
+
+
+class _NullWriter:
+    """Поток вывода, отбрасывающий сообщения вложенных команд"""
+
+    def write(self, message):
+        pass
+
+    def flush(self):
+        pass
@@ -0,0 +1,101 @@
+"""
+Кэш ответов API товаров по поколению данных
+
+Ключ ответа - действие, его аргументы, нормализованные параметры запроса
+и номер поколения данных (DataGeneration), который растет при каждой
+записи товаров. Пока загрузок не было, повторный запрос отдается из кэша
+без обращения к таблице товаров; после загрузки ключ меняется, и старые
+ответы просто истекают по таймауту. Инвалидировать ничего не нужно.
+
+Ключ служит и ETag ответа, а время последней записи - Last-Modified,
+поэтому условный запрос (If-None-Match / If-Modified-Since) с неизменными
+данными получает 304 без тела.
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DataGeneration
+
+
+CACHE_KEY_PREFIX = 'products-api'
+
+
+def normalized_params(query_params, ignore=()):
+    """
+    Параметры запроса в порядке, не зависящем от их порядка в URL;
+    пустые параметры фильтров ничего не меняют и отбрасываются
+
+    Returns:
+        list: Пары (имя, отсортированный список значений)
+    """
+    return sorted(
+        (name, sorted(value for value in values if value))
+        for name, values in query_params.lists()
+        if name not in ignore and any(values)
+    )
+
+
+def response_key(request, action, kwargs, generation, ignore=()):
+    """Ключ ответа в кэше; он же ETag"""
+    payload = json.dumps(
+        [
+            generation,
+            action,
+            sorted((name, str(value)) for name, value in kwargs.items()),
+            request.get_host(),
+            request.accepted_media_type,
+            normalized_params(request.query_params, ignore),
+        ],
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cache_response(ignore=()):
+    """
+    Декоратор метода ViewSet, отдающего данные только для чтения
+
+    Args:
+        ignore (iterable): Параметры запроса, не влияющие на ответ
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(self, request, *args, **kwargs)
+
+            generation, changed_at = DataGeneration.objects.current()
+            digest = response_key(request, method.__name__, kwargs, generation, ignore)
+            etag = f'"{digest}"'
+            last_modified = changed_at.timestamp() if changed_at is not None else None
+
+            response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+            if response is None:
+                key = f'{CACHE_KEY_PREFIX}:{digest}'
+                data = cache.get(key)
+                if data is not None:
+                    response = Response(data)
+                else:
+                    response = method(self, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Браузер хранит ответ, но каждый раз сверяет его с сервером
+            patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,181 @@
+"""
+Потоковая выгрузка товаров в CSV, NDJSON и Parquet
+
+Товары читаются серверным курсором (QuerySet.iterator) пачками по
+EXPORT_CHUNK_SIZE строк, каждая пачка сразу кодируется и отдается клиенту,
+поэтому память сервера не зависит от размера выгрузки.
+
+Для Parquet нужен pyarrow (необязательная зависимость): каждая пачка
+записывается отдельной группой строк, а футер файла - в конце.
+"""
+import csv
+import io
+from decimal import Decimal
+from itertools import islice
+
+import orjson
+from django.db.models import F
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # необязательная зависимость
+    pyarrow = None
+
+
+EXPORT_CHUNK_SIZE = 2000
+# Колонки выгрузки в порядке вывода; search_query - текст поискового запроса
+EXPORT_COLUMNS = (
+    'id', 'wb_id', 'name', 'brand', 'supplier', 'price', 'original_price', 'rating',
+    'review_count', 'stock_quantity', 'search_query', 'has_discount', 'discount_percentage',
+    'created_at', 'updated_at',
+)
+# Формат -> (тип содержимого, расширение файла)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+_encoder = JSONEncoder()
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки товаров для выгрузки, читаемые серверным курсором
+
+    Returns:
+        iterator: Пачки (списки) словарей с колонками EXPORT_COLUMNS
+    """
+    fields = [name for name in EXPORT_COLUMNS if name != 'search_query']
+    rows = queryset.values(*fields, search_query=F('query__text')).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def text_value(value):
+    """Значение колонки в виде, как в ответах API: суммы строкой, даты в ISO 8601"""
+    if isinstance(value, Decimal):
+        return format(value, 'f')
+    if hasattr(value, 'isoformat'):
+        return _encoder.default(value)
+    return value
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return text_value(value)
+
+
+def iter_csv(chunks):
+    yield (','.join(EXPORT_COLUMNS) + '\r\n').encode('utf-8')
+    for chunk in chunks:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow([csv_value(row[name]) for name in EXPORT_COLUMNS])
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(chunks):
+    for chunk in chunks:
+        lines = ({name: text_value(row[name]) for name in EXPORT_COLUMNS} for row in chunk)
+        yield b''.join(orjson.dumps(line, option=orjson.OPT_APPEND_NEWLINE) for line in lines)
+
+
+class _ChunkSink:
+    """Файлоподобный приемник, из которого записанные байты забираются по частям"""
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_schema():
+    decimal = pyarrow.decimal128
+    timestamp = pyarrow.timestamp('us', tz='UTC')
+    return pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('wb_id', pyarrow.int64()),
+        ('name', pyarrow.string()),
+        ('brand', pyarrow.string()),
+        ('supplier', pyarrow.string()),
+        ('price', decimal(10, 2)),
+        ('original_price', decimal(10, 2)),
+        ('rating', decimal(3, 2)),
+        ('review_count', pyarrow.int32()),
+        ('stock_quantity', pyarrow.int32()),
+        ('search_query', pyarrow.string()),
+        ('has_discount', pyarrow.bool_()),
+        ('discount_percentage', decimal(4, 1)),
+        ('created_at', timestamp),
+        ('updated_at', timestamp),
+    ])
+
+
+def iter_parquet(chunks):
+    schema = parquet_schema()
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode='w'), schema)
+    try:
+        for chunk in chunks:
+            # Одна пачка - одна группа строк
+            writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def check_format(file_format):
+    """
+    Raises:
+        ValueError: Если формат неизвестен или для него не установлен пакет
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'Неизвестный формат {file_format}')
+    if file_format == 'parquet' and pyarrow is None:
+        raise ValueError('Для формата parquet нужен пакет pyarrow')
+
+
+def export_stream(queryset, file_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Содержимое выгрузки по частям
+
+    Args:
+        queryset (QuerySet): Отфильтрованные и отсортированные товары
+        file_format (str): Ключ EXPORT_FORMATS
+        chunk_size (int): Сколько строк читать из курсора и кодировать за раз
+
+    Returns:
+        iterator: bytes
+    """
+    writers = {'csv': iter_csv, 'ndjson': iter_ndjson, 'parquet': iter_parquet}
+    return writers[file_format](export_rows(queryset, chunk_size))
@@ -1,8 +1,30 @@
+import re
+from functools import lru_cache
+
 import django_filters
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
 from .models import Product
 
 
+# Конфигурация полнотекстового поиска - та же, что в триггере search_vector
+SEARCH_CONFIG = 'russian'
+SEARCH_MODES = ('fts', 'trigram', 'contains')
+WORD_RE = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=None)
+def trigram_available(alias='default'):
+    """Установлено ли в базе данных расширение pg_trgm"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
 class ProductFilter(django_filters.FilterSet):
     """
     Фильтр для товаров с поддержкой фильтрации по цене, рейтингу и количеству отзывов
@@ -24,7 +46,8 @@ class ProductFilter(django_filters.FilterSet):
     max_reviews = django_filters.NumberFilter(field_name='review_count', lookup_expr='lte')
     
     # Фильтрация по поисковому запросу
-    search_query = django_filters.CharFilter(field_name='search_query', lookup_expr='icontains')
+    search_query = django_filters.CharFilter(field_name='query__text', lookup_expr='icontains')
+    search_query__icontains = django_filters.CharFilter(field_name='query__text', lookup_expr='icontains')
     
     # Фильтрация по названию товара
     name = django_filters.CharFilter(field_name='name', lookup_expr='icontains')
@@ -39,7 +62,6 @@ class ProductFilter(django_filters.FilterSet):
             'original_price': ['exact', 'gte', 'lte'],
             'rating': ['exact', 'gte', 'lte'],
             'review_count': ['exact', 'gte', 'lte'],
-            'search_query': ['exact', 'icontains'],
             'name': ['exact', 'icontains'],
         }
     
@@ -48,5 +70,49 @@ class ProductFilter(django_filters.FilterSet):
         Фильтрует товары со скидкой
         """
         if value:
-            return queryset.filter(original_price__gt=models.F('price'))
-        return queryset 
\ No newline at end of file
+            return queryset.filter(has_discount=True)
+        return queryset
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    Поиск товаров по параметру search
+
+    Режим задается параметром search_mode:
+    - fts (по умолчанию) - полнотекстовый поиск по search_vector с учетом
+      морфологии, каждое слово ищется как начало слова;
+    - trigram - подстрока или похожее написание в названии (pg_trgm),
+      без расширения pg_trgm работает как contains;
+    - contains - подстрока в search_fields (ILIKE, без индекса).
+    Если параметр ordering не указан, результаты идут по релевантности.
+    """
+    mode_param = 'search_mode'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        mode = request.query_params.get(self.mode_param) or 'fts'
+        if mode not in SEARCH_MODES:
+            raise ValidationError({self.mode_param: f"Допустимые значения: {', '.join(SEARCH_MODES)}"})
+        ordered = bool(request.query_params.get(api_settings.ORDERING_PARAM))
+
+        if mode == 'fts':
+            words = WORD_RE.findall(text)
+            if not words:
+                return queryset.none()
+            query = SearchQuery(' & '.join(f'{word}:*' for word in words), search_type='raw', config=SEARCH_CONFIG)
+            queryset = queryset.filter(search_vector=query)
+            if not ordered:
+                queryset = queryset.annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank', '-id')
+            return queryset
+
+        if mode == 'trigram' and trigram_available(queryset.db):
+            queryset = queryset.filter(Q(name__icontains=text) | Q(name__trigram_word_similar=text))
+            if not ordered:
+                queryset = queryset.annotate(
+                    similarity=TrigramWordSimilarity(text, 'name')
+                ).order_by('-similarity', '-id')
+            return queryset
+
+        return super().filter_queryset(request, queryset, view)
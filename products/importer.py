@@ -0,0 +1,359 @@
+"""
+Загрузка выгрузок товаров (NDJSON/CSV) через COPY
+
+    чтение и проверка строк -> пачка -> COPY во временную таблицу -> слияние
+
+Строки проверяются и приводятся к полям Product в Python (отклоненные
+строки не попадают в базу и возвращаются с причиной), пачка передается
+в PostgreSQL одной командой COPY, а затем сливается с products_product
+одним INSERT ... ON CONFLICT (wb_id) DO UPDATE. В том же запросе
+добавляется история цен и считаются разницы итогов SearchTerm, поэтому
+после загрузки данные в том же состоянии, что после bulk_upsert.
+"""
+import csv
+import gzip
+import io
+import sys
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import orjson
+from django.db import connections, transaction
+from django.utils import timezone
+from parser.normalize import MAX_RATING, normalize_search_query, product_fingerprint, to_money
+
+from .models import DataGeneration, PriceObservation, Product, SearchTerm
+
+
+# Колонки выгрузки, которые читает загрузка; wb_id, name и price обязательны
+IMPORT_COLUMNS = (
+    'wb_id', 'name', 'price', 'original_price', 'rating', 'review_count',
+    'brand', 'supplier', 'stock_quantity', 'search_query',
+)
+MAX_PRICE = Decimal('99999999.99')
+MAX_INT = 2 ** 31 - 1
+STAGING_TABLE = 'products_import_staging'
+# Символы, которые в текстовом формате COPY записываются с обратной косой чертой
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+STAGING_SQL = f"""
+    CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} (
+        line bigint NOT NULL,
+        wb_id bigint NOT NULL,
+        name text NOT NULL,
+        price numeric(10, 2) NOT NULL,
+        original_price numeric(10, 2) NOT NULL,
+        rating numeric(3, 2),
+        review_count integer NOT NULL,
+        brand text NOT NULL,
+        supplier text NOT NULL,
+        stock_quantity integer,
+        search_query text NOT NULL,
+        fingerprint bigint NOT NULL
+    ) ON COMMIT DELETE ROWS
+"""
+
+# Слияние пачки: old - прежние версии товаров (заблокированы до конца транзакции),
+# upserted - записанные новые и изменившиеся товары. Все части запроса видят
+# таблицы в состоянии до него, поэтому old - именно версии до записи.
+# Результат - разницы итогов SearchTerm по запросам и количество записанных товаров.
+MERGE_SQL = """
+    WITH src AS (
+        SELECT DISTINCT ON (s.wb_id)
+            s.wb_id, s.name, s.price, s.original_price, s.rating, s.review_count,
+            s.brand, s.supplier, s.stock_quantity, t.id AS query_id, s.fingerprint
+        FROM {staging} s JOIN {terms} t ON t.text = s.search_query
+        ORDER BY s.wb_id, s.line DESC
+    ),
+    old AS (
+        SELECT p.wb_id, p.query_id, p.price, p.original_price, p.rating, p.has_discount, p.fingerprint
+        FROM {products} p JOIN src USING (wb_id)
+        ORDER BY p.wb_id
+        FOR UPDATE OF p
+    ),
+    upserted AS (
+        INSERT INTO {products} (
+            wb_id, name, price, original_price, rating, review_count, brand, supplier,
+            stock_quantity, query_id, fingerprint, has_discount, discount_percentage,
+            created_at, updated_at
+        )
+        SELECT
+            src.wb_id, src.name, src.price, src.original_price, src.rating, src.review_count,
+            src.brand, src.supplier, src.stock_quantity, src.query_id, src.fingerprint,
+            src.original_price > src.price,
+            CASE WHEN src.original_price > src.price
+                THEN round((src.original_price - src.price) * 100 / src.original_price, 1) ELSE 0 END,
+            %(now)s, %(now)s
+        FROM src LEFT JOIN old USING (wb_id)
+        WHERE old.fingerprint IS DISTINCT FROM src.fingerprint
+        ON CONFLICT (wb_id) DO UPDATE SET {updates}
+        RETURNING wb_id, query_id, price, original_price, rating, has_discount
+    ),
+    history AS (
+        INSERT INTO {observations} (wb_id, price, original_price, observed_at)
+        SELECT u.wb_id, u.price, u.original_price, %(now)s
+        FROM upserted u LEFT JOIN old o USING (wb_id)
+        WHERE (o.price, o.original_price) IS DISTINCT FROM (u.price, u.original_price)
+    )
+    SELECT
+        query_id,
+        sum(sign), sum(sign * price), sum(sign * coalesce(rating, 0)),
+        sum(sign * (rating IS NOT NULL)::int), sum(sign * has_discount::int),
+        count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE sign = 1)
+    FROM (
+        SELECT u.query_id, 1 AS sign, u.price, u.rating, u.has_discount, o.wb_id IS NULL AS inserted
+        FROM upserted u LEFT JOIN old o USING (wb_id)
+        UNION ALL
+        SELECT o.query_id, -1, o.price, o.rating, o.has_discount, false
+        FROM upserted u JOIN old o USING (wb_id)
+    ) AS changes
+    GROUP BY query_id
+"""
+MERGE_UPDATE_FIELDS = (
+    'name', 'price', 'original_price', 'rating', 'review_count', 'brand', 'supplier',
+    'stock_quantity', 'query_id', 'fingerprint', 'has_discount', 'discount_percentage', 'updated_at',
+)
+
+
+@dataclass
+class ImportReport:
+    """Итоги загрузки выгрузки"""
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rejected: int = 0
+    # Первые отклоненные строки: (номер строки, причина)
+    errors: list = field(default_factory=list)
+
+
+class ProductImporter:
+    """
+    Загрузка товаров из файла выгрузки пачками
+    """
+    max_errors = 20
+
+    def __init__(self, batch_size=50000, search_query=None, using='default', log=None, on_reject=None):
+        """
+        Args:
+            batch_size (int): Количество строк в одной пачке (одной транзакции)
+            search_query (str): Поисковый запрос для строк, где он не указан
+            using (str): Алиас базы данных
+            log (callable): Функция для вывода сообщений о ходе работы
+            on_reject (callable): Вызывается для каждой отклоненной строки
+                с аргументами (номер строки, причина, исходная строка)
+        """
+        self.batch_size = max(1, batch_size)
+        self.search_query = search_query
+        self.using = using
+        self.log = log or (lambda message: None)
+        self.on_reject = on_reject or (lambda line, error, raw: None)
+
+    def run(self, path, file_format=None):
+        """
+        Загружает товары из файла
+
+        Args:
+            path (str): Путь к файлу (.ndjson, .jsonl, .csv, можно .gz) или '-' для stdin
+            file_format (str): ndjson или csv; по умолчанию - по расширению файла
+
+        Returns:
+            ImportReport: Итоги загрузки
+        """
+        file_format = file_format or guess_format(path)
+        report = ImportReport()
+        with open_dump(path) as stream:
+            rows = self.clean(read_rows(stream, file_format), report)
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                self.write(batch, report)
+                self.log(
+                    f"📥 Прочитано строк: {report.rows}, добавлено: {report.inserted}, "
+                    f"обновлено: {report.updated}, без изменений: {report.unchanged}, "
+                    f"отклонено: {report.rejected}"
+                )
+
+        if connections[self.using].vendor == 'postgresql':
+            # Свежая статистика нужна планировщику сразу, не дожидаясь autovacuum
+            with connections[self.using].cursor() as cursor:
+                cursor.execute(f'ANALYZE {Product._meta.db_table}')
+        return report
+
+    def clean(self, rows, report):
+        """Стадия проверки: поля Product для корректных строк"""
+        for line, raw in rows:
+            report.rows += 1
+            try:
+                yield clean_row(raw, line, self.search_query)
+            except ValueError as e:
+                report.rejected += 1
+                if len(report.errors) < self.max_errors:
+                    report.errors.append((line, str(e)))
+                self.on_reject(line, str(e), raw)
+
+    def write(self, batch, report):
+        """Стадия записи: пачка одной транзакцией"""
+        if connections[self.using].vendor != 'postgresql':
+            products = [Product(**{name: row[name] for name in IMPORT_COLUMNS}) for row in batch]
+            inserted, updated, unchanged = Product.objects.using(self.using).bulk_upsert(products)
+        else:
+            inserted, updated = self.copy_and_merge(batch)
+            unchanged = len({row['wb_id'] for row in batch}) - inserted - updated
+        report.inserted += inserted
+        report.updated += updated
+        report.unchanged += unchanged
+
+    def copy_and_merge(self, batch):
+        """
+        Returns:
+            tuple: (количество добавленных, количество измененных товаров)
+        """
+        now = timezone.now()
+        SearchTerm.objects.using(self.using).resolve(row['search_query'] for row in batch)
+        sql = MERGE_SQL.format(
+            staging=STAGING_TABLE,
+            terms=SearchTerm._meta.db_table,
+            products=Product._meta.db_table,
+            observations=PriceObservation._meta.db_table,
+            updates=', '.join(f'{name} = EXCLUDED.{name}' for name in MERGE_UPDATE_FIELDS),
+        )
+        with transaction.atomic(using=self.using), connections[self.using].cursor() as cursor:
+            cursor.execute(STAGING_SQL)
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} (line, {', '.join(IMPORT_COLUMNS)}, fingerprint) FROM STDIN",
+                copy_buffer(batch),
+            )
+            # Та же очередность добавления новых товаров, что и у bulk_upsert
+            Product.objects.using(self.using).lock_inserts()
+            cursor.execute(sql, {'now': now})
+            deltas, inserted, changed = {}, 0, 0
+            for query_id, *totals, query_inserted, query_changed in cursor.fetchall():
+                deltas[query_id] = totals
+                inserted += query_inserted
+                changed += query_changed
+            if changed:
+                SearchTerm.objects.using(self.using).apply(deltas)
+                DataGeneration.objects.using(self.using).bump()
+        return inserted, changed - inserted
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    raise ValueError(f'Не удалось определить формат файла {path}, укажите его явно')
+
+
+def open_dump(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(stream, file_format):
+    """
+    Строки выгрузки
+
+    Returns:
+        iterator: Пары (номер строки, словарь полей или исходный текст, если
+            строка не разбирается)
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for line, row in enumerate(reader, start=2):
+            yield line, {name: value for name, value in row.items() if value != ''}
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            row = orjson.loads(text)
+        except ValueError:
+            row = text.rstrip('\r\n')
+        yield line, row
+
+
+def clean_row(raw, line, default_query=None):
+    """
+    Поля Product из строки выгрузки
+
+    Строки обрезаются, как при нормализации ответов API, остальные значения
+    должны укладываться в ограничения колонок.
+
+    Raises:
+        ValueError: Если строку нельзя загрузить; текст - причина
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('строка не является объектом JSON')
+    for name in ('wb_id', 'name', 'price'):
+        if raw.get(name) in (None, ''):
+            raise ValueError(f'не указано поле {name}')
+    search_query = normalize_search_query(str(raw.get('search_query') or default_query or ''))
+    if not search_query:
+        raise ValueError('не указан поисковый запрос')
+
+    row = {
+        'line': line,
+        'wb_id': _integer(raw, 'wb_id', 1, 2 ** 63 - 1),
+        'name': str(raw['name'])[:500],
+        'price': _money(raw, 'price'),
+        'original_price': _money(raw, 'original_price') if raw.get('original_price') not in (None, '') else None,
+        'rating': None,
+        'review_count': _integer(raw, 'review_count', 0, MAX_INT) if raw.get('review_count') not in (None, '') else 0,
+        'brand': str(raw.get('brand') or '')[:200],
+        'supplier': str(raw.get('supplier') or '')[:200],
+        'stock_quantity': None,
+        'search_query': search_query[:200],
+    }
+    if row['original_price'] is None:
+        row['original_price'] = row['price']
+    if raw.get('rating') not in (None, ''):
+        row['rating'] = _money(raw, 'rating', MAX_RATING)
+    if raw.get('stock_quantity') not in (None, ''):
+        row['stock_quantity'] = _integer(raw, 'stock_quantity', 0, MAX_INT)
+    row['fingerprint'] = product_fingerprint(row)
+    return row
+
+
+def copy_buffer(batch):
+    """Пачка в текстовом формате COPY"""
+    buffer = io.StringIO()
+    for row in batch:
+        values = [row['line'], *(row[name] for name in IMPORT_COLUMNS), row['fingerprint']]
+        buffer.write('\t'.join([
+            '\\N' if value is None else value.translate(_COPY_ESCAPES) if isinstance(value, str) else str(value)
+            for value in values
+        ]))
+        buffer.write('\n')
+    buffer.seek(0)
+    return buffer
+
+
+def _money(raw, name, maximum=MAX_PRICE):
+    try:
+        value = to_money(raw[name])
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError(f'некорректное значение {name}: {raw[name]!r}')
+    if not value.is_finite() or not 0 <= value <= maximum:
+        raise ValueError(f'значение {name} вне допустимого диапазона: {raw[name]!r}')
+    return value
+
+
+def _integer(raw, name, minimum, maximum):
+    value = raw[name]
+    try:
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        value = int(value)
+    except (ValueError, TypeError, OverflowError):
+        raise ValueError(f'некорректное значение {name}: {raw[name]!r}')
+    if not minimum <= value <= maximum:
+        raise ValueError(f'значение {name} вне допустимого диапазона: {raw[name]!r}')
+    return value
@@ -0,0 +1,94 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from products import benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочные замеры парсера, записи в БД и API с отчетом в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=str, default='10000',
+            help='Размеры набора товаров для замеров API через запятую, например 10000,1000000,5000000'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого запроса к API')
+        parser.add_argument('--normalize-count', type=int, default=20000, help='Товаров для замера нормализации')
+        parser.add_argument('--upsert-rows', type=int, default=20000, help='Товаров для замера записи')
+        parser.add_argument(
+            '--batch-sizes', type=str, default='100,500,1000,5000',
+            help='Размеры пачек для замера записи через запятую'
+        )
+        parser.add_argument(
+            '--only', type=str, default='normalize,upsert,api',
+            help='Какие группы замеров выполнять через запятую'
+        )
+        parser.add_argument('--output', type=str, help='Файл для JSON-отчета (по умолчанию stdout)')
+        parser.add_argument('--compare', type=str, help='JSON-отчет предыдущего прогона для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое ухудшение метрики относительно --compare (доля)'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять базу замеров, чтобы переиспользовать засеянные товары'
+        )
+
+    def handle(self, *args, **options):
+        groups = set(options['only'].split(','))
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+        batch_sizes = [int(size) for size in options['batch_sizes'].split(',') if size]
+
+        # Замеры идут в отдельной базе test_<имя БД>, рабочие данные не затрагиваются
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            results = {}
+            if 'normalize' in groups:
+                self.stderr.write('⏱ Нормализация товаров...')
+                results['normalize'] = benchmarks.benchmark_normalize(options['normalize_count'])
+            if 'upsert' in groups:
+                self.stderr.write('⏱ Пакетная запись...')
+                results['upsert'] = benchmarks.benchmark_upsert(options['upsert_rows'], batch_sizes)
+            if 'api' in groups:
+                results['api'] = {}
+                for size in sizes:
+                    self.stderr.write(f'⏱ API на {size} товарах...')
+                    results['api'][str(size)] = benchmarks.benchmark_api(size, options['repeat'])
+            database = benchmarks.database_info()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': database,
+            'results': results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+            self.stderr.write(f"💾 Отчет сохранен в {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            regressions = benchmarks.compare_results(baseline, report, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(
+                    f"⚠️ {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+                    f"({regression['change']:+.0%})"
+                )
+            if regressions:
+                raise CommandError(f'Ухудшилось метрик: {len(regressions)}')
+            self.stderr.write('✅ Ухудшений относительно базового отчета нет')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from products.models import PriceObservation
+
+
+class Command(BaseCommand):
+    help = 'Сжатие истории цен: удаление наблюдений, повторяющих предыдущую цену товара'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10_000_000,
+            help='Ширина диапазона wb_id, обрабатываемого одним запросом DELETE'
+        )
+
+    def handle(self, *args, **options):
+        bounds = PriceObservation.objects.aggregate(first=Min('wb_id'), last=Max('wb_id'))
+        if bounds['first'] is None:
+            self.stdout.write("История цен пуста")
+            return
+
+        # Диапазонами по wb_id, чтобы не держать долгую транзакцию и не
+        # сортировать всю таблицу в одном оконном запросе
+        deleted = 0
+        chunk_size = max(1, options['chunk_size'])
+        for start in range(bounds['first'], bounds['last'] + 1, chunk_size):
+            deleted += PriceObservation.objects.compact(start, start + chunk_size)
+        self.stdout.write(
+            f"🧹 Удалено повторяющихся наблюдений: {deleted}, "
+            f"осталось: {PriceObservation.objects.count()}"
+        )
@@ -0,0 +1,64 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from products.importer import ProductImporter
+
+
+class Command(BaseCommand):
+    help = 'Загрузка товаров из файла выгрузки (NDJSON или CSV) через COPY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Файл выгрузки (.ndjson, .jsonl, .csv, можно .gz) или - для stdin')
+        parser.add_argument(
+            '--format', dest='file_format', choices=['ndjson', 'csv'],
+            help='Формат файла (по умолчанию - по расширению)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50000,
+            help='Количество строк в одной пачке (одной транзакции)'
+        )
+        parser.add_argument('--search-query', type=str, help='Поисковый запрос для строк, где он не указан')
+        parser.add_argument(
+            '--rejects', type=str,
+            help='Файл, в который записываются отклоненные строки с причинами (NDJSON)'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if path == '-' and not options['file_format']:
+            raise CommandError('Для чтения из stdin укажите --format')
+
+        rejects = open(options['rejects'], 'w', encoding='utf-8') if options['rejects'] else None
+
+        def on_reject(line, error, raw):
+            if rejects is not None:
+                rejects.write(json.dumps({'line': line, 'error': error, 'row': raw}, ensure_ascii=False) + '\n')
+
+        importer = ProductImporter(
+            batch_size=options['batch_size'],
+            search_query=options['search_query'],
+            log=self.stdout.write,
+            on_reject=on_reject,
+        )
+        self.stdout.write(f"📦 Загружаем товары из {path}")
+        started = time.perf_counter()
+        try:
+            report = importer.run(path, options['file_format'])
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            if rejects is not None:
+                rejects.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"🎉 Загрузка завершена за {elapsed:.1f} с ({report.rows / elapsed if elapsed else 0:.0f} строк/с): "
+            f"добавлено {report.inserted}, обновлено {report.updated}, без изменений {report.unchanged}"
+        )
+        if report.rejected:
+            self.stdout.write(f"⚠️ Отклонено строк: {report.rejected}")
+            for line, error in report.errors:
+                self.stdout.write(f"   строка {line}: {error}")
+            if rejects is not None:
+                self.stdout.write(f"   все отклоненные строки - в {options['rejects']}")
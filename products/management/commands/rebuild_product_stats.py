@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from products.models import SearchTerm
+
+
+class Command(BaseCommand):
+    help = 'Пересчет итогов по поисковым запросам (SearchTerm) по всем товарам'
+
+    def handle(self, *args, **options):
+        queries = SearchTerm.objects.rebuild()
+        self.stdout.write(f"📊 Итоги пересчитаны, запросов: {queries}")
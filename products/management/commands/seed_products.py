@@ -0,0 +1,159 @@
+import time
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from products.models import Product, SearchTerm
+
+
+QUERIES = [
+    'ноутбук', 'смартфон', 'наушники', 'планшет', 'монитор',
+    'клавиатура', 'мышь', 'телевизор', 'часы', 'колонка',
+]
+NOUNS = ['Ноутбук', 'Смартфон', 'Наушники', 'Планшет', 'Монитор', 'Клавиатура']
+BRANDS = ['Acer', 'ASUS', 'Lenovo', 'HP', 'Xiaomi', 'Samsung', 'Apple', 'Huawei']
+DISCOUNTS = [0, 0, 5, 10, 15, 25, 40]
+CENTS = Decimal('0.01')
+
+# Все поля синтетического товара вычисляются из его порядкового номера n,
+# поэтому набор данных воспроизводим и не зависит от размера пачек.
+# Те же формулы для PostgreSQL (generate_series) и для остальных СУБД (Python).
+SEED_SQL = """
+    INSERT INTO products_product (
+        wb_id, name, price, original_price, rating, review_count,
+        brand, supplier, stock_quantity, query_id,
+        has_discount, discount_percentage, created_at, updated_at
+    )
+    SELECT
+        %(first_id)s + n,
+        (%(nouns)s::text[])[1 + n %% 6] || ' ' || (%(brands)s::text[])[1 + n / 6 %% 8]
+            || ' ' || (100 + n * 37 %% 900),
+        price,
+        original_price,
+        CASE WHEN n %% 10 = 0 THEN NULL ELSE round(3 + n * 13 %% 201 / 100.0, 2) END,
+        n * 104729 %% 20000,
+        (%(brands)s::text[])[1 + n / 6 %% 8],
+        'ООО ' || (%(brands)s::text[])[1 + n / 6 %% 8] || ' Трейд',
+        n * 17 %% 500,
+        (%(query_ids)s::bigint[])[1 + n %% %(query_count)s],
+        original_price > price,
+        CASE WHEN original_price > price
+            THEN round((original_price - price) * 100 / original_price, 1) ELSE 0 END,
+        %(now)s - make_interval(secs => n %% 2592000),
+        %(now)s
+    FROM (
+        SELECT
+            n,
+            50 + n * 7919 %% 4951 AS original_price,
+            round((50 + n * 7919 %% 4951) * (100 - (%(discounts)s::int[])[1 + n * 31 %% 7]) / 100.0, 2) AS price
+        FROM generate_series(%(start)s::bigint, %(stop)s::bigint - 1) AS n
+    ) AS seed
+"""
+
+
+def synthetic_product(n, first_id, queries, now):
+    """Синтетический товар с порядковым номером n (те же формулы, что в SEED_SQL)"""
+    brand = BRANDS[n // 6 % 8]
+    original_price = 50 + n * 7919 % 4951
+    discount = DISCOUNTS[n * 31 % 7]
+    product = Product(
+        wb_id=first_id + n,
+        name=f"{NOUNS[n % 6]} {brand} {100 + n * 37 % 900}",
+        price=(Decimal(original_price * (100 - discount)) / 100).quantize(CENTS, ROUND_HALF_UP),
+        original_price=original_price,
+        rating=None if n % 10 == 0 else 3 + Decimal(n * 13 % 201) / 100,
+        review_count=n * 104729 % 20000,
+        brand=brand,
+        supplier=f"ООО {brand} Трейд",
+        stock_quantity=n * 17 % 500,
+        search_query=queries[n % len(queries)],
+        created_at=now - timedelta(seconds=n % 2592000),
+        updated_at=now,
+    )
+    product.update_discount()
+    return product
+
+
+class Command(BaseCommand):
+    help = 'Быстрое заполнение базы синтетическими товарами для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Сколько товаров добавить')
+        parser.add_argument(
+            '--queries', type=int, default=len(QUERIES),
+            help='Количество различных поисковых запросов'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100000,
+            help='Количество товаров в одном запросе INSERT'
+        )
+        parser.add_argument(
+            '--first-id', type=int,
+            help='wb_id первого товара (по умолчанию - следующий после максимального)'
+        )
+        parser.add_argument('--truncate', action='store_true', help='Удалить все товары перед заполнением')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        batch_size = max(1, options['batch_size'])
+        queries = [
+            QUERIES[index % len(QUERIES)] + (f' {index // len(QUERIES)}' if index >= len(QUERIES) else '')
+            for index in range(max(1, options['queries']))
+        ]
+
+        if options['truncate']:
+            self.truncate()
+        first_id = options['first_id']
+        if first_id is None:
+            first_id = (Product.objects.aggregate(last=Max('wb_id'))['last'] or 0) + 1
+
+        started = time.perf_counter()
+        now = timezone.now()
+        query_ids = SearchTerm.objects.resolve(queries)
+        for start in range(0, count, batch_size):
+            stop = min(start + batch_size, count)
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    self.insert_sql(start, stop, first_id, [query_ids[query] for query in queries], now)
+                else:
+                    products = [synthetic_product(n, first_id, queries, now) for n in range(start, stop)]
+                    Product.objects.resolve_search_queries(products)
+                    Product.objects.bulk_create(products)
+            self.stdout.write(f"🌱 Добавлено {stop} из {count} товаров")
+
+        # Товары добавлены в обход bulk_upsert - итоги по запросам пересчитываются целиком
+        SearchTerm.objects.rebuild()
+        if connection.vendor == 'postgresql':
+            # Свежая статистика нужна планировщику сразу, не дожидаясь autovacuum
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"🎉 Готово: {count} товаров за {elapsed:.1f} с "
+            f"({count / elapsed if elapsed else 0:.0f} строк/с)"
+        )
+
+    def truncate(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {Product._meta.db_table}')
+        else:
+            Product.objects.all().delete()
+
+    def insert_sql(self, start, stop, first_id, query_ids, now):
+        with connection.cursor() as cursor:
+            cursor.execute(SEED_SQL, {
+                'first_id': first_id,
+                'start': start,
+                'stop': stop,
+                'nouns': NOUNS,
+                'brands': BRANDS,
+                'discounts': DISCOUNTS,
+                'query_ids': query_ids,
+                'query_count': len(query_ids),
+                'now': now,
+            })
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_rename_reviews_count_product_review_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='brand',
+            field=models.CharField(blank=True, default='', help_text='Бренд товара', max_length=200, verbose_name='Бренд'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='stock_quantity',
+            field=models.IntegerField(blank=True, help_text='Суммарный остаток товара на складах по данным карточки', null=True, verbose_name='Остаток'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='supplier',
+            field=models.CharField(blank=True, default='', help_text='Продавец товара на Wildberries', max_length=200, verbose_name='Продавец'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.23 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_product_card_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParseJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, verbose_name='Поисковый запрос')),
+                ('pages', models.PositiveIntegerField(default=1, verbose_name='Страниц')),
+                ('category', models.CharField(blank=True, default='', max_length=200, verbose_name='Категория')),
+                ('dedup_key', models.CharField(help_text='Хэш нормализованных параметров; одинаковые активные задачи объединяются', max_length=64, verbose_name='Ключ параметров')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Завершена'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('pages_done', models.IntegerField(default=0, verbose_name='Обработано страниц')),
+                ('failed_pages', models.IntegerField(default=0, verbose_name='Страниц с ошибкой')),
+                ('products_found', models.IntegerField(default=0, verbose_name='Найдено товаров')),
+                ('inserted', models.IntegerField(default=0, verbose_name='Добавлено товаров')),
+                ('updated', models.IntegerField(default=0, verbose_name='Обновлено товаров')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Ошибка')),
+                ('worker', models.CharField(blank=True, default='', max_length=200, verbose_name='Воркер')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний отчет воркера')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+            ],
+            options={
+                'verbose_name': 'Задача парсинга',
+                'verbose_name_plural': 'Задачи парсинга',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='parse_job_queue_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='parsejob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('dedup_key',), name='unique_active_parse_job'),
+        ),
+    ]
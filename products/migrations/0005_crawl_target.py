@@ -0,0 +1,41 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0004_parse_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlTarget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('search_query', models.CharField(max_length=200, verbose_name='Поисковый запрос')),
+                ('page', models.PositiveIntegerField(default=1, verbose_name='Страница')),
+                ('enabled', models.BooleanField(default=True, verbose_name='Обходить')),
+                ('content_hash', models.CharField(blank=True, default='', help_text='Хэш ID, цен, рейтингов и отзывов товаров страницы при последнем обходе', max_length=32, verbose_name='Хэш содержимого')),
+                ('change_rate', models.FloatField(default=0.1, help_text='Оценка числа изменений страницы в час (экспоненциальное среднее)', verbose_name='Частота изменений')),
+                ('popularity', models.FloatField(default=0, help_text='Число запросов пользователей; со временем затухает', verbose_name='Популярность')),
+                ('last_requested_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний запрос пользователя')),
+                ('last_crawled_at', models.DateTimeField(blank=True, null=True, verbose_name='Последний обход')),
+                ('last_attempt_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя попытка')),
+                ('crawl_count', models.IntegerField(default=0, verbose_name='Обходов')),
+                ('failures', models.IntegerField(default=0, verbose_name='Ошибок подряд')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Страница для обхода',
+                'verbose_name_plural': 'Страницы для обхода',
+                'ordering': ['search_query', 'page'],
+                'indexes': [models.Index(fields=['enabled', 'last_crawled_at'], name='crawl_target_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='crawltarget',
+            constraint=models.UniqueConstraint(fields=('search_query', 'page'), name='unique_crawl_target'),
+        ),
+    ]
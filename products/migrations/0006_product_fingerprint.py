@@ -0,0 +1,28 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_crawl_target'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='parsejob',
+            name='unchanged',
+            field=models.IntegerField(default=0, verbose_name='Товаров без изменений'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='fingerprint',
+            field=models.BigIntegerField(blank=True, editable=False, help_text='Хэш полей товара; если он не изменился, повторная загрузка строку не перезаписывает', null=True, verbose_name='Отпечаток данных'),
+        ),
+        migrations.AlterField(
+            model_name='crawltarget',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='Хэш ID и отпечатков данных товаров страницы при последнем обходе', max_length=32, verbose_name='Хэш содержимого'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:04
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_product_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceObservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wb_id', models.BigIntegerField(verbose_name='ID товара на Wildberries')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Цена со скидкой')),
+                ('original_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Оригинальная цена')),
+                ('observed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время наблюдения')),
+            ],
+            options={
+                'verbose_name': 'Наблюдение цены',
+                'verbose_name_plural': 'История цен',
+                'indexes': [models.Index(fields=['wb_id', 'observed_at'], name='price_obs_product_idx'), django.contrib.postgres.indexes.BrinIndex(fields=['observed_at'], name='price_obs_time_brin')],
+            },
+        ),
+        # Текущие цены уже загруженных товаров - первая точка их истории
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO products_priceobservation (wb_id, price, original_price, observed_at)
+                SELECT wb_id, price, original_price, updated_at FROM products_product
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_price_observation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percentage',
+            field=models.DecimalField(decimal_places=1, default=0, editable=False, help_text='Процент скидки от оригинальной цены; вычисляется при записи', max_digits=4, verbose_name='Скидка, %'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='has_discount',
+            field=models.BooleanField(default=False, editable=False, help_text='Оригинальная цена выше цены со скидкой; вычисляется при записи', verbose_name='Есть скидка'),
+        ),
+        # Заполнение для уже загруженных товаров - та же формула, что в parser.normalize
+        migrations.RunSQL(
+            sql="""
+                UPDATE products_product SET
+                    has_discount = TRUE,
+                    discount_percentage = round((original_price - price) * 100 / original_price, 1)
+                WHERE original_price > price
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['original_price', 'id'], name='product_original_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['rating', 'id'], name='product_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['review_count', 'id'], name='product_review_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created_at', 'id'], name='product_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['discount_percentage', 'id'], name='product_discount_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('has_discount', True)), fields=['created_at', 'id'], name='product_discounted_idx'),
+        ),
+    ]
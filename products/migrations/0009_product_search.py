@@ -0,0 +1,68 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+SEARCH_TRIGGER_SQL = """
+    CREATE FUNCTION products_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.brand, '')), 'B')
+            || setweight(to_tsvector('russian', coalesce(NEW.search_query, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER products_product_search_vector
+        BEFORE INSERT OR UPDATE OF name, brand, search_query ON products_product
+        FOR EACH ROW EXECUTE FUNCTION products_product_search_vector();
+
+    -- Заполнение для уже загруженных товаров через тот же триггер
+    UPDATE products_product SET name = name;
+"""
+
+DROP_SEARCH_TRIGGER_SQL = """
+    DROP TRIGGER IF EXISTS products_product_search_vector ON products_product;
+    DROP FUNCTION IF EXISTS products_product_search_vector();
+"""
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm входит в contrib и ставится не везде: без него поиск
+    # в режиме trigram выполняется как обычный ILIKE
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS product_name_trgm_idx ON products_product USING gin (name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0008_product_discount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Название, бренд и запрос для полнотекстового поиска; заполняется триггером', null=True, verbose_name='Поисковый индекс'),
+        ),
+        migrations.RunSQL(SEARCH_TRIGGER_SQL, DROP_SEARCH_TRIGGER_SQL),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
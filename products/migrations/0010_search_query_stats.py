@@ -0,0 +1,43 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('search_query', models.CharField(max_length=200, unique=True, verbose_name='Поисковый запрос')),
+                ('product_count', models.BigIntegerField(default=0, verbose_name='Товаров')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=20, verbose_name='Сумма цен')),
+                ('rating_sum', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма рейтингов')),
+                ('rating_count', models.BigIntegerField(default=0, verbose_name='Товаров с рейтингом')),
+                ('discount_count', models.BigIntegerField(default=0, verbose_name='Товаров со скидкой')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Итоги по запросу',
+                'verbose_name_plural': 'Итоги по запросам',
+                'ordering': ['search_query'],
+            },
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO products_searchquerystats (
+                    search_query, product_count, price_sum, rating_sum, rating_count, discount_count, updated_at
+                )
+                SELECT search_query, count(*), sum(price), coalesce(sum(rating), 0), count(rating),
+                       count(*) FILTER (WHERE has_discount), now()
+                FROM products_product
+                GROUP BY search_query
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
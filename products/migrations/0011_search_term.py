@@ -0,0 +1,102 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SEARCH_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION products_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.brand, '')), 'B')
+            || setweight(to_tsvector('russian', coalesce(
+                (SELECT text FROM products_searchterm WHERE id = NEW.query_id), ''
+            )), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER products_product_search_vector ON products_product;
+    CREATE TRIGGER products_product_search_vector
+        BEFORE INSERT OR UPDATE OF name, brand, query_id ON products_product
+        FOR EACH ROW EXECUTE FUNCTION products_product_search_vector();
+"""
+
+OLD_SEARCH_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION products_product_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.brand, '')), 'B')
+            || setweight(to_tsvector('russian', coalesce(NEW.search_query, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER products_product_search_vector ON products_product;
+    CREATE TRIGGER products_product_search_vector
+        BEFORE INSERT OR UPDATE OF name, brand, search_query ON products_product
+        FOR EACH ROW EXECUTE FUNCTION products_product_search_vector();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_search_query_stats'),
+    ]
+
+    operations = [
+        # Итоги по запросам становятся справочником запросов
+        migrations.RenameModel('SearchQueryStats', 'SearchTerm'),
+        migrations.RenameField('searchterm', 'search_query', 'text'),
+        migrations.AlterField(
+            model_name='searchterm',
+            name='text',
+            field=models.CharField(max_length=200, unique=True, verbose_name='Запрос'),
+        ),
+        migrations.AlterModelOptions(
+            name='searchterm',
+            options={'ordering': ['text'], 'verbose_name': 'Поисковый запрос', 'verbose_name_plural': 'Поисковые запросы'},
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='query',
+            field=models.ForeignKey(
+                help_text='Запрос, по которому был найден товар', null=True,
+                on_delete=django.db.models.deletion.PROTECT, related_name='products',
+                to='products.searchterm', verbose_name='Поисковый запрос',
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                INSERT INTO products_searchterm (
+                    text, product_count, price_sum, rating_sum, rating_count, discount_count, updated_at
+                )
+                SELECT DISTINCT search_query, 0, 0, 0, 0, 0, now() FROM products_product
+                ON CONFLICT (text) DO NOTHING;
+
+                UPDATE products_product SET query_id = products_searchterm.id
+                FROM products_searchterm
+                WHERE products_searchterm.text = products_product.search_query;
+            """,
+            reverse_sql="""
+                UPDATE products_product SET search_query = products_searchterm.text
+                FROM products_searchterm
+                WHERE products_searchterm.id = products_product.query_id;
+            """,
+        ),
+        migrations.RunSQL(SEARCH_FUNCTION_SQL, OLD_SEARCH_FUNCTION_SQL),
+        migrations.RemoveField(
+            model_name='product',
+            name='search_query',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='query',
+            field=models.ForeignKey(
+                help_text='Запрос, по которому был найден товар',
+                on_delete=django.db.models.deletion.PROTECT, related_name='products',
+                to='products.searchterm', verbose_name='Поисковый запрос',
+            ),
+        ),
+    ]
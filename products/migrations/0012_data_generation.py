@@ -0,0 +1,35 @@
+# Generated by Django 4.2.23 on 2026-10-18 09:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_search_term'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Поколение')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Данные изменены')),
+            ],
+            options={
+                'verbose_name': 'Поколение данных',
+                'verbose_name_plural': 'Поколения данных',
+            },
+        ),
+        # Единственная строка счетчика и последовательность номеров поколений
+        migrations.RunSQL(
+            sql="""
+                CREATE SEQUENCE products_datageneration_seq;
+                INSERT INTO products_datageneration (id, value, changed_at)
+                VALUES (1, nextval('products_datageneration_seq'), now());
+            """,
+            reverse_sql='DROP SEQUENCE products_datageneration_seq;',
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_search_terms(apps, schema_editor):
+    """
+    Страницы обхода ссылаются на нормализованный запрос; страницы, которые
+    отличались только регистром или пробелами, объединяются
+    """
+    CrawlTarget = apps.get_model('products', 'CrawlTarget')
+    SearchTerm = apps.get_model('products', 'SearchTerm')
+    kept = {}
+    # Остается последняя обойденная страница, остальные добавляют ей популярность
+    targets = CrawlTarget.objects.order_by(models.F('last_crawled_at').desc(nulls_last=True), 'pk')
+    for target in targets:
+        term, _ = SearchTerm.objects.get_or_create(text=target.search_query.strip().lower())
+        main = kept.get((term.pk, target.page))
+        if main is None:
+            target.query = term
+            kept[(term.pk, target.page)] = target
+            continue
+        main.popularity += target.popularity
+        main.enabled = main.enabled or target.enabled
+        if target.last_requested_at and (main.last_requested_at is None or target.last_requested_at > main.last_requested_at):
+            main.last_requested_at = target.last_requested_at
+        target.delete()
+    for target in kept.values():
+        target.save()
+
+
+def unlink_search_terms(apps, schema_editor):
+    CrawlTarget = apps.get_model('products', 'CrawlTarget')
+    for target in CrawlTarget.objects.select_related('query'):
+        target.search_query = target.query.text
+        target.save(update_fields=['search_query'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_data_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawltarget',
+            name='query',
+            field=models.ForeignKey(
+                help_text='Нормализованный запрос (без учета регистра и пробелов по краям)', null=True,
+                on_delete=django.db.models.deletion.CASCADE, related_name='crawl_targets',
+                to='products.searchterm', verbose_name='Поисковый запрос',
+            ),
+        ),
+        migrations.RemoveConstraint(
+            model_name='crawltarget',
+            name='unique_crawl_target',
+        ),
+        # Данные - отдельной миграцией от изменения схемы в 0014: иначе ALTER TABLE
+        # в той же транзакции упадет на отложенных проверках внешнего ключа
+        migrations.RunPython(link_search_terms, unlink_search_terms),
+    ]
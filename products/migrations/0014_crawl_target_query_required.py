@@ -0,0 +1,40 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_crawl_target_search_term'),
+    ]
+
+    operations = [
+        # Значение по умолчанию нужно только при откате: RemoveField вернет столбец
+        # пустым, а 0013 заполнит его из query
+        migrations.AlterField(
+            model_name='crawltarget',
+            name='search_query',
+            field=models.CharField(default='', max_length=200, verbose_name='Поисковый запрос'),
+        ),
+        migrations.RemoveField(
+            model_name='crawltarget',
+            name='search_query',
+        ),
+        migrations.AlterField(
+            model_name='crawltarget',
+            name='query',
+            field=models.ForeignKey(
+                help_text='Нормализованный запрос (без учета регистра и пробелов по краям)',
+                on_delete=django.db.models.deletion.CASCADE, related_name='crawl_targets',
+                to='products.searchterm', verbose_name='Поисковый запрос',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='crawltarget',
+            constraint=models.UniqueConstraint(fields=('query', 'page'), name='unique_crawl_target'),
+        ),
+        migrations.AlterModelOptions(
+            name='crawltarget',
+            options={'ordering': ['query__text', 'page'], 'verbose_name': 'Страница для обхода', 'verbose_name_plural': 'Страницы для обхода'},
+        ),
+    ]
@@ -19,8 +19,205 @@ Copyright (c) 2024 [Ваше имя]. Все права защищены.
 
 """
 
-from django.db import models
+import hashlib
+import json
+import math
+from datetime import timedelta, timezone as dt_timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models.functions import Coalesce, Exp, Extract, Greatest, Least, Ln, Power, Sqrt
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from parser.normalize import (
+    FINGERPRINT_FIELDS, discount_percentage, normalize_search_query, product_fingerprint, to_money,
+)
+
+
+# Поля, которые перезаписываются при повторной загрузке уже известного товара
+UPSERT_FIELDS = [
+    'name', 'price', 'original_price', 'rating', 'review_count',
+    'brand', 'supplier', 'stock_quantity', 'query', 'fingerprint',
+    'has_discount', 'discount_percentage', 'updated_at',
+]
+# Поля, которые хранятся для фильтрации и сортировки, но вычисляются из цен
+DISCOUNT_FIELDS = ('has_discount', 'discount_percentage')
+# Поля, от которых зависят итоги SearchTerm (query - ID запроса)
+STATS_FIELDS = ('query', 'price', 'rating', 'has_discount')
+# Ключ advisory-блокировки PostgreSQL, под которой добавляются новые товары
+PRODUCT_INSERT_LOCK = 0x77625F70726F64
+# Перцентили цены, которые отдает статистика по запросу
+PRICE_PERCENTILES = (0.25, 0.5, 0.75, 0.9)
+
+
+def round_average(value, field_name):
+    """
+    Среднее, округленное до точности поля Product, по которому оно считается
+
+    Статистика считается либо агрегатом по товарам, либо из итогов SearchTerm;
+    после округления оба способа отдают одинаковые значения.
+    """
+    if value is None:
+        return None
+    exponent = Decimal(1).scaleb(-Product._meta.get_field(field_name).decimal_places)
+    return Decimal(value).quantize(exponent, rounding=ROUND_HALF_UP)
+
+
+class PercentileCont(models.Aggregate):
+    """Непрерывный перцентиль PostgreSQL: percentile_cont(p) WITHIN GROUP (ORDER BY ...)"""
+    function = 'percentile_cont'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentile, **extra):
+        super().__init__(expression, percentile=float(percentile), output_field=models.FloatField(), **extra)
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    QuerySet товаров с пакетной записью
+    """
+
+    def bulk_upsert(self, products, batch_size=500):
+        """
+        Вставляет новые и обновляет изменившиеся товары по wb_id
+        через INSERT ... ON CONFLICT (wb_id) DO UPDATE
+
+        Товары, отпечаток данных (fingerprint) которых совпадает с сохраненным,
+        не перезаписываются: у них не меняется updated_at, а PostgreSQL
+        не создает новую версию строки и записи в WAL.
+
+        Для новых товаров и товаров с изменившейся ценой в той же транзакции
+        добавляются записи истории цен (PriceObservation) и обновляются
+        итоги по поисковым запросам (SearchTerm). Прежние версии товаров
+        читаются с блокировкой строк, поэтому параллельные загрузки одних и тех
+        же товаров не считают разницы от одной и той же версии.
+        
+        Args:
+            products (iterable): Несохраненные экземпляры Product, можно генератор
+            batch_size (int): Количество товаров в одном запросе
+            
+        Returns:
+            tuple: (количество добавленных, количество измененных, количество без изменений)
+        """
+        totals = [0, 0, 0]
+        batch = {}
+
+        for product in products:
+            # Повтор wb_id в одном INSERT ... ON CONFLICT недопустим, оставляем последний
+            batch[product.wb_id] = product
+            if len(batch) >= batch_size:
+                for index, count in enumerate(self._upsert_batch(list(batch.values()))):
+                    totals[index] += count
+                batch = {}
+
+        if batch:
+            for index, count in enumerate(self._upsert_batch(list(batch.values()))):
+                totals[index] += count
+
+        return tuple(totals)
+
+    def resolve_search_queries(self, products):
+        """
+        Проставляет товарам ID поисковых запросов, заданных текстом
+        (Product(search_query=...)), создавая недостающие запросы
+        """
+        pending = [product for product in products if product._search_query_text is not None]
+        if not pending:
+            return
+        ids = SearchTerm.objects.using(self.db).resolve(product._search_query_text for product in pending)
+        for product in pending:
+            text = product._search_query_text
+            product.query = SearchTerm(pk=ids[text], text=text)
+            product._search_query_text = None
+
+    def _upsert_batch(self, batch):
+        self.resolve_search_queries(batch)
+        for product in batch:
+            if product.fingerprint is None:
+                product.fingerprint = product.compute_fingerprint()
+            product.update_discount()
+
+        wb_ids = sorted(product.wb_id for product in batch)
+        with transaction.atomic(using=self.db):
+            if self.filter(wb_id__in=wb_ids).count() < len(wb_ids):
+                self.lock_inserts()
+            # Прежние версии блокируются до конца транзакции: параллельная запись
+            # тех же товаров подождет и посчитает разницы уже от новых версий.
+            # Порядок по wb_id одинаков во всех процессах и исключает взаимные блокировки
+            existing = {
+                row['wb_id']: row
+                for row in self.select_for_update().filter(wb_id__in=wb_ids).order_by('wb_id')
+                .values('wb_id', 'fingerprint', 'original_price', *STATS_FIELDS)
+            }
+            changed = [
+                product for product in batch
+                if product.wb_id not in existing or existing[product.wb_id]['fingerprint'] != product.fingerprint
+            ]
+            if changed:
+                self.bulk_create(
+                    changed,
+                    update_conflicts=True,
+                    unique_fields=['wb_id'],
+                    update_fields=UPSERT_FIELDS,
+                )
+                PriceObservation.objects.using(self.db).record(changed, existing)
+                SearchTerm.objects.using(self.db).record(
+                    (existing.get(product.wb_id), product.stats_values()) for product in changed
+                )
+                DataGeneration.objects.using(self.db).bump()
+        inserted = sum(1 for product in changed if product.wb_id not in existing)
+        return inserted, len(changed) - inserted, len(batch) - len(changed)
+
+    def lock_inserts(self):
+        """
+        Блокировка добавления новых товаров до конца транзакции
+
+        Строки, которых еще нет, заблокировать нельзя: два процесса, одновременно
+        добавляющие один товар, оба сочли бы его новым и учли бы в итогах дважды.
+        Поэтому пачки с новыми товарами записываются по очереди. Блокировка
+        берется до блокировок строк товаров, иначе возможна взаимная блокировка.
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [PRODUCT_INSERT_LOCK])
+
+    def delete(self):
+        """Удаляет товары и вычитает их из итогов SearchTerm"""
+        with transaction.atomic(using=self.db):
+            removed = self.order_by().values('query').annotate(**SearchTerm.totals_aggregates())
+            deltas = {row['query']: [-row[name] for name in SearchTerm.TOTAL_FIELDS] for row in removed}
+            result = super().delete()
+            SearchTerm.objects.using(self.db).apply(deltas)
+            if result[0]:
+                DataGeneration.objects.using(self.db).bump()
+        return result
+
+    def stats(self, percentiles=()):
+        """
+        Статистика по товарам одним агрегирующим запросом
+
+        Args:
+            percentiles (iterable): Доли от 0 до 1, для которых нужны перцентили цены
+
+        Returns:
+            dict: total_products, avg_price, avg_rating, products_with_discount
+                и, если заданы percentiles, price_percentiles
+        """
+        aggregates = {
+            'total_products': models.Count('id'),
+            'avg_price': models.Avg('price'),
+            'avg_rating': models.Avg('rating'),
+            'products_with_discount': models.Count('id', filter=models.Q(has_discount=True)),
+        }
+        names = {f'p{round(p * 100)}': p for p in percentiles}
+        aggregates.update({name: PercentileCont('price', p) for name, p in names.items()})
+        stats = self.order_by().aggregate(**aggregates)
+        stats['avg_price'] = round_average(stats['avg_price'], 'price')
+        stats['avg_rating'] = round_average(stats['avg_rating'], 'rating')
+        if names:
+            stats['price_percentiles'] = {name: stats.pop(name) for name in names}
+        return stats
 
 
 class Product(models.Model):
@@ -65,11 +262,60 @@ class Product(models.Model):
         default=0,
         help_text="Количество отзывов на товар"
     )
-    search_query = models.CharField(
-        max_length=200, 
+    brand = models.CharField(
+        max_length=200,
+        verbose_name="Бренд",
+        blank=True,
+        default='',
+        help_text="Бренд товара"
+    )
+    supplier = models.CharField(
+        max_length=200,
+        verbose_name="Продавец",
+        blank=True,
+        default='',
+        help_text="Продавец товара на Wildberries"
+    )
+    stock_quantity = models.IntegerField(
+        verbose_name="Остаток",
+        null=True,
+        blank=True,
+        help_text="Суммарный остаток товара на складах по данным карточки"
+    )
+    query = models.ForeignKey(
+        'SearchTerm',
+        on_delete=models.PROTECT,
+        related_name='products',
         verbose_name="Поисковый запрос",
         help_text="Запрос, по которому был найден товар"
     )
+    has_discount = models.BooleanField(
+        verbose_name="Есть скидка",
+        default=False,
+        editable=False,
+        help_text="Оригинальная цена выше цены со скидкой; вычисляется при записи"
+    )
+    discount_percentage = models.DecimalField(
+        max_digits=4,
+        decimal_places=1,
+        verbose_name="Скидка, %",
+        default=0,
+        editable=False,
+        help_text="Процент скидки от оригинальной цены; вычисляется при записи"
+    )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый индекс",
+        null=True,
+        editable=False,
+        help_text="Название, бренд и запрос для полнотекстового поиска; заполняется триггером"
+    )
+    fingerprint = models.BigIntegerField(
+        verbose_name="Отпечаток данных",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Хэш полей товара; если он не изменился, повторная загрузка строку не перезаписывает"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True, 
         verbose_name="Дата создания записи"
@@ -79,27 +325,769 @@ class Product(models.Model):
         verbose_name="Дата обновления записи"
     )
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
         ordering = ['-created_at']
+        # Под сортировки и диапазонные фильтры API (ProductFilter);
+        # id - для однозначного порядка товаров с одинаковым значением
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['original_price', 'id'], name='product_original_price_idx'),
+            models.Index(fields=['rating', 'id'], name='product_rating_idx'),
+            models.Index(fields=['review_count', 'id'], name='product_review_count_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_at_idx'),
+            models.Index(fields=['discount_percentage', 'id'], name='product_discount_idx'),
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(has_discount=True),
+                name='product_discounted_idx',
+            ),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name[:50]} - {self.price}₽"
 
-    @property
-    def has_discount(self):
-        """Проверяет, есть ли скидка на товар"""
-        return self.original_price > self.price
+    # Текст запроса, заданный через search_query и еще не сопоставленный с SearchTerm
+    _search_query_text = None
 
     @property
-    def discount_percentage(self):
-        """Вычисляет процент скидки"""
-        if self.has_discount:
-            return round(((self.original_price - self.price) / self.original_price) * 100, 1)
-        return 0
+    def search_query(self):
+        """Текст поискового запроса, по которому найден товар"""
+        if self._search_query_text is not None:
+            return self._search_query_text
+        return self.query.text if self.query_id is not None else ''
+
+    @search_query.setter
+    def search_query(self, text):
+        # ID запроса проставляется при записи (save, bulk_upsert)
+        self._search_query_text = text
+
+    def save(self, *args, **kwargs):
+        Product.objects.resolve_search_queries([self])
+        # Отпечаток должен соответствовать данным, иначе правка из админки
+        # могла бы помешать следующей загрузке обновить строку
+        self.fingerprint = self.compute_fingerprint()
+        self.update_discount()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = set()
+            if set(update_fields) & set(FINGERPRINT_FIELDS):
+                derived.add('fingerprint')
+            if set(update_fields) & {'price', 'original_price'}:
+                derived.update(DISCOUNT_FIELDS)
+            # search_query - свойство, в таблице хранится query
+            fields = {'query' if name == 'search_query' else name for name in update_fields}
+            kwargs['update_fields'] = fields | derived
+            if not kwargs['update_fields'] & set(STATS_FIELDS):
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                    DataGeneration.objects.bump()
+                return
+
+        # Итоги по запросам меняются на разницу между старой и новой версией товара
+        with transaction.atomic():
+            old = None
+            if not self._state.adding:
+                old = Product.objects.select_for_update().filter(pk=self.pk).values(*STATS_FIELDS).first()
+            super().save(*args, **kwargs)
+            new = self.stats_values()
+            if old is not None and kwargs.get('update_fields') is not None:
+                new = {name: new[name] if name in kwargs['update_fields'] else old[name] for name in STATS_FIELDS}
+            SearchTerm.objects.record([(old, new)])
+            DataGeneration.objects.bump()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            old = Product.objects.select_for_update().filter(pk=self.pk).values(*STATS_FIELDS).first()
+            result = super().delete(*args, **kwargs)
+            SearchTerm.objects.record([(old, None)])
+            DataGeneration.objects.bump()
+        return result
+
+    def stats_values(self):
+        """Поля STATS_FIELDS товара в том виде, в каком их отдает values()"""
+        return {
+            'query': self.query_id,
+            'price': self.price,
+            'rating': self.rating,
+            'has_discount': self.has_discount,
+        }
+
+    def compute_fingerprint(self):
+        """Отпечаток текущих данных товара"""
+        return product_fingerprint({name: getattr(self, name) for name in FINGERPRINT_FIELDS})
+
+    def update_discount(self):
+        """Пересчитывает сохраняемые поля скидки по текущим ценам"""
+        self.discount_percentage = discount_percentage(self.price, self.original_price)
+        self.has_discount = to_money(self.original_price) > to_money(self.price)
 
     @property
     def discount_price(self):
         """Возвращает цену со скидкой (для совместимости)"""
         return self.price
+
+
+class PriceObservationQuerySet(models.QuerySet):
+    """
+    QuerySet истории цен: запись наблюдений и сжатие повторов
+    """
+
+    def record(self, products, existing=None, observed_at=None):
+        """
+        Добавляет наблюдения цен товаров одним INSERT
+
+        Args:
+            products (list): Записанные экземпляры Product
+            existing (dict): wb_id -> поля price и original_price до записи;
+                товары, цены которых не изменились, пропускаются
+            observed_at (datetime): Время наблюдения, по умолчанию текущее
+
+        Returns:
+            int: Количество добавленных наблюдений
+        """
+        existing = existing or {}
+        observed_at = observed_at or timezone.now()
+        observations = []
+        for product in products:
+            prices = [to_money(product.price), to_money(product.original_price)]
+            previous = existing.get(product.wb_id)
+            if previous is not None and [previous['price'], previous['original_price']] == prices:
+                continue
+            observations.append(PriceObservation(
+                wb_id=product.wb_id, price=prices[0], original_price=prices[1], observed_at=observed_at
+            ))
+        self.bulk_create(observations)
+        return len(observations)
+
+    def compact(self, wb_id_from=None, wb_id_to=None):
+        """
+        Удаляет наблюдения, повторяющие предыдущее наблюдение того же товара
+
+        Повторы появляются, если товар записывали несколько процессов
+        одновременно или история была заполнена из старых выгрузок.
+        Первое наблюдение каждой цены остается, поэтому история изменений
+        цены не теряется.
+
+        Args:
+            wb_id_from (int): Начало диапазона wb_id (включительно), опционально
+            wb_id_to (int): Конец диапазона wb_id (не включительно), опционально
+
+        Returns:
+            int: Количество удаленных наблюдений
+        """
+        table = self.model._meta.db_table
+        conditions, params = [], []
+        if wb_id_from is not None:
+            conditions.append('wb_id >= %s')
+            params.append(wb_id_from)
+        if wb_id_to is not None:
+            conditions.append('wb_id < %s')
+            params.append(wb_id_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        sql = f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, price, original_price,
+                           LAG(price) OVER w AS previous_price,
+                           LAG(original_price) OVER w AS previous_original_price
+                    FROM {table}
+                    {where}
+                    WINDOW w AS (PARTITION BY wb_id ORDER BY observed_at, id)
+                ) AS observations
+                WHERE price = previous_price AND original_price = previous_original_price
+            )
+        """
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+class PriceObservation(models.Model):
+    """
+    Наблюдение цены товара: история, которая только дополняется
+
+    Товар связан по wb_id, а не внешним ключом: история не мешает удалять
+    товары и не требует проверки ссылок при массовой вставке. Записи
+    добавляются в порядке времени, поэтому по observed_at используется
+    компактный BRIN-индекс, а выборка истории одного товара идет по btree
+    (wb_id, observed_at).
+    """
+    wb_id = models.BigIntegerField(verbose_name="ID товара на Wildberries")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Цена со скидкой")
+    original_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Оригинальная цена")
+    observed_at = models.DateTimeField(default=timezone.now, verbose_name="Время наблюдения")
+
+    objects = PriceObservationQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Наблюдение цены"
+        verbose_name_plural = "История цен"
+        indexes = [
+            models.Index(fields=['wb_id', 'observed_at'], name='price_obs_product_idx'),
+            BrinIndex(fields=['observed_at'], name='price_obs_time_brin'),
+        ]
+
+    def __str__(self):
+        return f"{self.wb_id}: {self.price}₽ ({self.observed_at:%Y-%m-%d %H:%M})"
+
+
+class SearchTermQuerySet(models.QuerySet):
+    """
+    QuerySet поисковых запросов: сопоставление текста с ID и итоги по товарам
+    """
+
+    def resolve(self, texts):
+        """
+        ID поисковых запросов по тексту; недостающие запросы создаются
+
+        Returns:
+            dict: текст -> ID
+        """
+        texts = set(texts)
+        ids = dict(self.filter(text__in=texts).values_list('text', 'id'))
+        missing = texts - ids.keys()
+        if missing:
+            # Запрос могли одновременно создать в другой транзакции
+            self.bulk_create([SearchTerm(text=text) for text in missing], ignore_conflicts=True)
+            ids.update(self.filter(text__in=missing).values_list('text', 'id'))
+        return ids
+
+    def record(self, changes):
+        """
+        Учитывает изменения товаров в итогах
+
+        Args:
+            changes (iterable): Пары (старые значения, новые значения) полей
+                STATS_FIELDS; None - товара до или после изменения нет
+
+        Returns:
+            int: Количество затронутых запросов
+        """
+        deltas = {}
+        for old, new in changes:
+            for values, sign in ((old, -1), (new, 1)):
+                if values is None:
+                    continue
+                delta = deltas.setdefault(values['query'], [0, Decimal(0), Decimal(0), 0, 0])
+                delta[0] += sign
+                delta[1] += sign * to_money(values['price'])
+                if values['rating'] is not None:
+                    delta[2] += sign * to_money(values['rating'])
+                    delta[3] += sign
+                if values['has_discount']:
+                    delta[4] += sign
+        return self.apply(deltas)
+
+    def apply(self, deltas):
+        """
+        Прибавляет разницы к итогам запросов
+
+        Args:
+            deltas (dict): ID запроса -> разницы полей TOTAL_FIELDS
+
+        Returns:
+            int: Количество затронутых запросов
+        """
+        deltas = {query: delta for query, delta in deltas.items() if any(delta)}
+        if not deltas:
+            return 0
+        table = self.model._meta.db_table
+        updates = ', '.join(f'{name} = {name} + %s' for name in self.model.TOTAL_FIELDS)
+        now = timezone.now()
+        with connections[self.db].cursor() as cursor:
+            # Одинаковый порядок строк во всех транзакциях исключает взаимные блокировки
+            cursor.executemany(
+                f'UPDATE {table} SET {updates}, updated_at = %s WHERE id = %s',
+                [[*deltas[query], now, query] for query in sorted(deltas)],
+            )
+        return len(deltas)
+
+    def rebuild(self):
+        """
+        Пересчитывает итоги по всем товарам
+
+        Нужен после изменений товаров в обход bulk_upsert и методов модели
+        (QuerySet.update, SQL). Таблица блокируется на время пересчета:
+        параллельная загрузка подождет и применит свои разницы к новым итогам.
+
+        Returns:
+            int: Количество запросов, по которым есть товары
+        """
+        table = self.model._meta.db_table
+        zeros = ', '.join(f'{name} = 0' for name in self.model.TOTAL_FIELDS)
+        totals = ', '.join(f'{name} = totals.{name}' for name in self.model.TOTAL_FIELDS)
+        with transaction.atomic(using=self.db), connections[self.db].cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+            cursor.execute(f'UPDATE {table} SET {zeros}, updated_at = now() WHERE product_count <> 0')
+            cursor.execute(
+                f"""
+                UPDATE {table} SET {totals}, updated_at = now()
+                FROM (
+                    SELECT query_id, count(*) AS product_count, sum(price) AS price_sum,
+                           coalesce(sum(rating), 0) AS rating_sum, count(rating) AS rating_count,
+                           count(*) FILTER (WHERE has_discount) AS discount_count
+                    FROM {Product._meta.db_table}
+                    GROUP BY query_id
+                ) AS totals
+                WHERE {table}.id = totals.query_id
+                """
+            )
+            rebuilt = cursor.rowcount
+            DataGeneration.objects.using(self.db).bump()
+        return rebuilt
+
+    def summary(self, search_query=None):
+        """
+        Статистика в формате ProductQuerySet.stats из итогов
+
+        Args:
+            search_query (str): Только запросы, содержащие эту строку (как фильтр search_query)
+        """
+        rows = self.filter(text__icontains=search_query) if search_query else self
+        totals = rows.aggregate(**{name: models.Sum(name) for name in self.model.TOTAL_FIELDS})
+        count = totals['product_count'] or 0
+        return {
+            'total_products': count,
+            'avg_price': round_average(totals['price_sum'] / count, 'price') if count else None,
+            'avg_rating': (
+                round_average(totals['rating_sum'] / totals['rating_count'], 'rating')
+                if totals['rating_count'] else None
+            ),
+            'products_with_discount': totals['discount_count'] or 0,
+        }
+
+
+class SearchTerm(models.Model):
+    """
+    Поисковый запрос, по которому загружались товары
+
+    Товары ссылаются на запрос по ID, а не хранят его текст. Для каждого
+    запроса хранятся итоги по его товарам, которые поддерживаются разницами
+    при каждой записи товаров, поэтому список запросов и статистика без
+    фильтров не требуют просмотра таблицы товаров. Пересчет итогов с нуля -
+    manage.py rebuild_product_stats.
+    """
+    TOTAL_FIELDS = ('product_count', 'price_sum', 'rating_sum', 'rating_count', 'discount_count')
+
+    text = models.CharField(max_length=200, unique=True, verbose_name="Запрос")
+    product_count = models.BigIntegerField(default=0, verbose_name="Товаров")
+    price_sum = models.DecimalField(max_digits=20, decimal_places=2, default=0, verbose_name="Сумма цен")
+    rating_sum = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Сумма рейтингов")
+    rating_count = models.BigIntegerField(default=0, verbose_name="Товаров с рейтингом")
+    discount_count = models.BigIntegerField(default=0, verbose_name="Товаров со скидкой")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлено")
+
+    objects = SearchTermQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Поисковый запрос"
+        verbose_name_plural = "Поисковые запросы"
+        ordering = ['text']
+
+    def __str__(self):
+        return self.text
+
+    @staticmethod
+    def totals_aggregates():
+        """Агрегаты по товарам для полей TOTAL_FIELDS"""
+        return {
+            'product_count': models.Count('id'),
+            'price_sum': models.Sum('price'),
+            'rating_sum': Coalesce(models.Sum('rating'), models.Value(Decimal(0)), output_field=models.DecimalField()),
+            'rating_count': models.Count('rating'),
+            'discount_count': models.Count('id', filter=models.Q(has_discount=True)),
+        }
+
+
+class DataGenerationQuerySet(models.QuerySet):
+    """
+    QuerySet счетчика поколений данных
+    """
+
+    def current(self):
+        """
+        Returns:
+            tuple: (номер поколения, время последнего изменения товаров);
+                (0, None), пока товары ни разу не записывались
+        """
+        return self.filter(pk=DataGeneration.SINGLETON_ID).values_list('value', 'changed_at').first() or (0, None)
+
+    def bump(self):
+        """
+        Переводит данные в новое поколение
+
+        Вызывается в транзакции записи товаров последним запросом: читатели
+        видят новый номер одновременно с новыми данными. Номер берется из
+        последовательности, которая не откатывается вместе с транзакцией,
+        поэтому номер, однажды выданный, больше не повторяется.
+        """
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            # Строку могли удалить (например, flush), тогда она создается заново
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (id, value, changed_at)
+                VALUES (%s, nextval('{DataGeneration.SEQUENCE}'), now())
+                ON CONFLICT (id) DO UPDATE SET value = EXCLUDED.value, changed_at = EXCLUDED.changed_at
+                """,
+                [DataGeneration.SINGLETON_ID],
+            )
+
+
+class DataGeneration(models.Model):
+    """
+    Поколение данных о товарах: единственная строка с номером, который
+    растет при каждой записи товаров
+
+    Номер входит в ключ кэша ответов API (products.caching), поэтому после
+    загрузки товаров закэшированные ответы просто перестают использоваться.
+    """
+    SINGLETON_ID = 1
+    SEQUENCE = 'products_datageneration_seq'
+
+    value = models.BigIntegerField(default=0, verbose_name="Поколение")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Данные изменены")
+
+    objects = DataGenerationQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Поколение данных"
+        verbose_name_plural = "Поколения данных"
+
+    def __str__(self):
+        return f"#{self.value} ({self.changed_at:%Y-%m-%d %H:%M})"
+
+
+class ParseJobQuerySet(models.QuerySet):
+    """
+    QuerySet задач парсинга: постановка в очередь и захват воркером
+    """
+
+    def enqueue(self, query, pages=1, category=''):
+        """
+        Ставит задачу в очередь или возвращает уже ожидающую или выполняемую
+        задачу с теми же параметрами
+
+        Запрос сохраняется нормализованным (normalize_search_query), под тем же
+        текстом, что и найденные по нему товары и страницы обхода.
+
+        Returns:
+            tuple: (задача, создана ли новая)
+        """
+        query = normalize_search_query(query)
+        dedup_key = ParseJob.make_dedup_key(query, pages, category)
+        # Запрошенный пользователями запрос планировщик будет поддерживать свежим
+        CrawlTarget.objects.register(query, pages)
+        for _ in range(3):
+            active = self.filter(dedup_key=dedup_key, status__in=ParseJob.ACTIVE_STATUSES).first()
+            if active is not None:
+                return active, False
+            try:
+                # Частичный уникальный индекс не даст создать вторую активную
+                # задачу, даже если запросы пришли одновременно
+                with transaction.atomic(using=self.db):
+                    return self.create(
+                        query=query, pages=pages, category=category, dedup_key=dedup_key
+                    ), True
+            except IntegrityError:
+                continue
+        raise IntegrityError(f"Не удалось поставить в очередь задачу {dedup_key}")
+
+    def claim(self, worker):
+        """
+        Захватывает самую старую ожидающую задачу
+
+        SELECT ... FOR UPDATE SKIP LOCKED позволяет нескольким воркерам
+        разбирать очередь, не блокируя друг друга и не беря одну задачу дважды.
+
+        Returns:
+            ParseJob: Задача в статусе running или None, если очередь пуста
+        """
+        with transaction.atomic(using=self.db):
+            job = (
+                self.select_for_update(skip_locked=True)
+                .filter(status=ParseJob.STATUS_PENDING)
+                .order_by('created_at')
+                .first()
+            )
+            if job is None:
+                return None
+            now = timezone.now()
+            job.status = ParseJob.STATUS_RUNNING
+            job.worker = worker
+            job.started_at = now
+            job.heartbeat_at = now
+            job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at'])
+            return job
+
+    def requeue_stale(self, timeout):
+        """
+        Возвращает в очередь задачи, воркер которых не подавал признаков жизни
+        дольше timeout секунд (например, был убит)
+
+        Returns:
+            int: Количество возвращенных задач
+        """
+        deadline = timezone.now() - timedelta(seconds=timeout)
+        return self.filter(status=ParseJob.STATUS_RUNNING, heartbeat_at__lt=deadline).update(
+            status=ParseJob.STATUS_PENDING, worker='', started_at=None
+        )
+
+
+class ParseJob(models.Model):
+    """
+    Задача парсинга товаров, выполняемая воркером (manage.py run_parse_worker)
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'В очереди'),
+        (STATUS_RUNNING, 'Выполняется'),
+        (STATUS_DONE, 'Завершена'),
+        (STATUS_FAILED, 'Ошибка'),
+    ]
+    ACTIVE_STATUSES = [STATUS_PENDING, STATUS_RUNNING]
+
+    query = models.CharField(max_length=200, verbose_name="Поисковый запрос")
+    pages = models.PositiveIntegerField(default=1, verbose_name="Страниц")
+    category = models.CharField(max_length=200, blank=True, default='', verbose_name="Категория")
+    dedup_key = models.CharField(
+        max_length=64,
+        verbose_name="Ключ параметров",
+        help_text="Хэш нормализованных параметров; одинаковые активные задачи объединяются"
+    )
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="Статус"
+    )
+    pages_done = models.IntegerField(default=0, verbose_name="Обработано страниц")
+    failed_pages = models.IntegerField(default=0, verbose_name="Страниц с ошибкой")
+    products_found = models.IntegerField(default=0, verbose_name="Найдено товаров")
+    inserted = models.IntegerField(default=0, verbose_name="Добавлено товаров")
+    updated = models.IntegerField(default=0, verbose_name="Обновлено товаров")
+    unchanged = models.IntegerField(default=0, verbose_name="Товаров без изменений")
+    error = models.TextField(blank=True, default='', verbose_name="Ошибка")
+    worker = models.CharField(max_length=200, blank=True, default='', verbose_name="Воркер")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начата")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Последний отчет воркера")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Завершена")
+
+    objects = ParseJobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Задача парсинга"
+        verbose_name_plural = "Задачи парсинга"
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_parse_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='parse_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.query} ({self.get_status_display()})"
+
+    @staticmethod
+    def make_dedup_key(query, pages, category=''):
+        """Ключ параметров задачи без учета регистра и пробелов по краям"""
+        payload = json.dumps([normalize_search_query(query), int(pages), (category or '').strip().lower()])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def as_dict(self):
+        """Состояние задачи для API"""
+        return {
+            'id': self.pk,
+            'query': self.query,
+            'pages': self.pages,
+            'category': self.category,
+            'status': self.status,
+            'pages_done': self.pages_done,
+            'failed_pages': self.failed_pages,
+            'products_found': self.products_found,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class CrawlTargetQuerySet(models.QuerySet):
+    """
+    QuerySet страниц выдачи, которые планировщик поддерживает свежими
+    """
+
+    def register(self, search_query, pages=1, requested=True):
+        """
+        Добавляет страницы 1..pages запроса в план обхода
+
+        Запрос сравнивается так же, как в ключе задач парсинга (без учета
+        регистра и пробелов по краям), и хранится ссылкой на SearchTerm.
+
+        Args:
+            requested (bool): Запрос пришел от пользователя - повышает популярность
+        """
+        now = timezone.now()
+        text = normalize_search_query(search_query)
+        query_id = SearchTerm.objects.using(self.db).resolve([text])[text]
+        self.bulk_create(
+            [CrawlTarget(query_id=query_id, page=page) for page in range(1, pages + 1)],
+            ignore_conflicts=True,
+        )
+        if requested:
+            self.filter(query_id=query_id, page__lte=pages).update(
+                popularity=models.F('popularity') + 1, last_requested_at=now, enabled=True
+            )
+
+    def due(self, now, min_interval, min_change_rate=0.02, popularity_half_life=72.0):
+        """
+        Включенные страницы, которые можно обходить, с приоритетом в аннотации score
+
+        Изменения страницы считаются пуассоновским потоком с частотой
+        change_rate в час, так что 1 - exp(-rate * t) - вероятность, что
+        за t часов с последнего обхода страница изменилась. Она умножается
+        на вес популярности запроса (затухающей с периодом полураспада
+        popularity_half_life часов) и убывает с номером страницы; никогда
+        не обходившиеся страницы получают бесконечный приоритет.
+
+        Страницы, обойденные позже чем min_interval назад, и страницы, которые
+        после ошибок еще ждут повтора (1, 2, 4... минут, не дольше
+        CrawlTarget.MAX_FAILURE_BACKOFF), не попадают в выборку.
+
+        Args:
+            now (datetime): Текущее время
+            min_interval (timedelta): Минимальный интервал между обходами страницы
+        """
+        def hours_since(field):
+            epoch = Extract(field, 'epoch', tzinfo=dt_timezone.utc, output_field=models.FloatField())
+            return (models.Value(now.timestamp()) - epoch) / models.Value(3600.0)
+
+        # Показатели степени ограничены: exp и power PostgreSQL при исчезающе
+        # малом результате дают ошибку, а не 0
+        rate = Greatest('change_rate', models.Value(min_change_rate))
+        changed_probability = models.Value(1.0) - Exp(-Least(rate * hours_since('last_crawled_at'), models.Value(700.0)))
+        popularity = models.Case(
+            models.When(
+                popularity__gt=0, last_requested_at__isnull=False,
+                then=models.F('popularity') * Power(
+                    models.Value(0.5), Least(hours_since('last_requested_at') / popularity_half_life, models.Value(1000.0))
+                ),
+            ),
+            default=models.F('popularity'),
+        )
+        weight = (models.Value(1.0) + Ln(models.Value(1.0) + popularity)) / Sqrt('page')
+        backoff_minutes = Least(
+            Power(models.Value(2.0), Least('failures', models.Value(30)) - 1),
+            models.Value(CrawlTarget.MAX_FAILURE_BACKOFF.total_seconds() / 60),
+        )
+        return (
+            self.filter(enabled=True)
+            .filter(models.Q(last_crawled_at__isnull=True) | models.Q(last_crawled_at__lt=now - min_interval))
+            .annotate(
+                score=models.Case(
+                    models.When(last_crawled_at__isnull=True, then=models.Value(math.inf)),
+                    default=changed_probability * weight,
+                    output_field=models.FloatField(),
+                ),
+                backoff_left=models.Case(
+                    models.When(
+                        failures__gt=0, last_attempt_at__isnull=False,
+                        then=backoff_minutes - hours_since('last_attempt_at') * 60,
+                    ),
+                    default=models.Value(0.0),
+                    output_field=models.FloatField(),
+                ),
+            )
+            .filter(backoff_left__lte=0)
+        )
+
+    def sync_from_products(self, pages=1):
+        """
+        Добавляет в план первые pages страниц всех запросов, по которым
+        в базе уже есть товары
+
+        Returns:
+            int: Количество запросов
+        """
+        queries = {
+            normalize_search_query(text)
+            for text in SearchTerm.objects.using(self.db).filter(product_count__gt=0).values_list('text', flat=True)
+        }
+        for search_query in queries:
+            self.register(search_query, pages, requested=False)
+        return len(queries)
+
+
+class CrawlTarget(models.Model):
+    """
+    Страница поисковой выдачи в плане повторного обхода (manage.py run_crawl_scheduler)
+
+    Для каждой страницы хранится хэш содержимого при последнем обходе и
+    оценка частоты его изменений, по которым планировщик решает, какую
+    страницу обновить следующей.
+    """
+    query = models.ForeignKey(
+        'SearchTerm',
+        on_delete=models.CASCADE,
+        related_name='crawl_targets',
+        verbose_name="Поисковый запрос",
+        help_text="Нормализованный запрос (без учета регистра и пробелов по краям)"
+    )
+    page = models.PositiveIntegerField(default=1, verbose_name="Страница")
+    enabled = models.BooleanField(default=True, verbose_name="Обходить")
+    content_hash = models.CharField(
+        max_length=32, blank=True, default='', verbose_name="Хэш содержимого",
+        help_text="Хэш ID и отпечатков данных товаров страницы при последнем обходе"
+    )
+    change_rate = models.FloatField(
+        default=0.1, verbose_name="Частота изменений",
+        help_text="Оценка числа изменений страницы в час (экспоненциальное среднее)"
+    )
+    popularity = models.FloatField(
+        default=0, verbose_name="Популярность",
+        help_text="Число запросов пользователей; со временем затухает"
+    )
+    last_requested_at = models.DateTimeField(null=True, blank=True, verbose_name="Последний запрос пользователя")
+    last_crawled_at = models.DateTimeField(null=True, blank=True, verbose_name="Последний обход")
+    last_attempt_at = models.DateTimeField(null=True, blank=True, verbose_name="Последняя попытка")
+    crawl_count = models.IntegerField(default=0, verbose_name="Обходов")
+    failures = models.IntegerField(default=0, verbose_name="Ошибок подряд")
+    last_error = models.TextField(blank=True, default='', verbose_name="Последняя ошибка")
+
+    # Максимальная пауза перед повтором страницы, обход которой завершился ошибкой
+    MAX_FAILURE_BACKOFF = timedelta(hours=6)
+
+    objects = CrawlTargetQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Страница для обхода"
+        verbose_name_plural = "Страницы для обхода"
+        ordering = ['query__text', 'page']
+        constraints = [
+            models.UniqueConstraint(fields=['query', 'page'], name='unique_crawl_target'),
+        ]
+        indexes = [
+            models.Index(fields=['enabled', 'last_crawled_at'], name='crawl_target_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.search_query}, стр. {self.page}"
+
+    @property
+    def search_query(self):
+        """Текст поискового запроса страницы"""
+        return self.query.text
@@ -0,0 +1,266 @@
+"""
+Пагинация больших таблиц
+
+Курсорная (keyset) пагинация: вместо OFFSET следующая страница выбирается
+условием по ключу (поле сортировки, id) последнего товара предыдущей
+страницы, поэтому глубокие страницы открываются так же быстро, как первая
+(по индексу (поле, id)), а COUNT(*) не нужен. Товары, добавленные во время
+обхода, не сдвигают уже полученные страницы.
+
+Постраничный вывод с оценкой количества: вместо точного COUNT(*) по
+миллионам строк берется оценка планировщика PostgreSQL, а точный подсчет
+выполняется, только если строк по оценке немного.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (поле сортировки, id)
+
+    Поле сортировки - первое поле из ordering, если оно есть в ordering_fields
+    представления, иначе первое поле ordering представления по умолчанию.
+    id сортируется в том же направлении и делает порядок однозначным.
+    NULL - как в PostgreSQL: последними по возрастанию, первыми по убыванию.
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.field, self.descending = self.get_ordering(queryset, view)
+        sign = '-' if self.descending else ''
+        queryset = queryset.order_by(f'{sign}{self.field}', f'{sign}id')
+
+        # Лишний товар показывает, есть ли следующая страница
+        rows = self.page_rows(queryset, self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.last = rows[-1] if rows else None
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        """
+        Returns:
+            tuple: (поле сортировки, по убыванию ли)
+        """
+        allowed = getattr(view, 'ordering_fields', None) or []
+        order_by = list(queryset.query.order_by)
+        if order_by and isinstance(order_by[0], str) and order_by[0].lstrip('-') in allowed:
+            term = order_by[0]
+        else:
+            # Сортировка по релевантности поиска и т.п. не подходит для ключа
+            term = (getattr(view, 'ordering', None) or ['id'])[0]
+        return term.lstrip('-'), term.startswith('-')
+
+    def page_rows(self, queryset, cursor, limit):
+        if cursor is None:
+            return list(queryset[:limit])
+
+        value, pk = cursor
+        field = self.field
+        after = 'lt' if self.descending else 'gt'
+        nullable = self.get_model_field().null
+        if value is None:
+            # Курсор внутри товаров с NULL: дочитываем их по id
+            rows = list(queryset.filter(**{f'{field}__isnull': True, f'id__{after}': pk})[:limit])
+            rest = queryset.filter(**{f'{field}__isnull': False}) if self.descending else None
+        else:
+            # Условие (field >= value) задает начало просмотра индекса (field, id),
+            # остальное отсекает уже показанные товары с тем же значением
+            bound = 'lte' if self.descending else 'gte'
+            rows = list(
+                queryset.filter(**{f'{field}__{bound}': value})
+                .filter(Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'id__{after}': pk}))[:limit]
+            )
+            rest = queryset.filter(**{f'{field}__isnull': True}) if nullable and not self.descending else None
+        if rest is not None and len(rows) < limit:
+            rows += list(rest[:limit - len(rows)])
+        return rows
+
+    def decode_cursor(self, request):
+        """
+        Returns:
+            tuple: (значение поля сортировки, id) или None для первой страницы
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            field = self.get_model_field()
+            return (None if value is None else field.to_python(value)), int(pk)
+        except (binascii.Error, UnicodeError, ValueError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, obj):
+        # Страница - товары или словари .values() (быстрый путь списка)
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        if value is not None:
+            value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        payload = json.dumps([value, pk], separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(payload).decode('ascii')
+
+    def get_model_field(self):
+        return self.model._meta.get_field(self.field)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества строк по статистике планировщика PostgreSQL
+
+    Без фильтров - reltuples таблицы (обновляется ANALYZE и autovacuum),
+    с фильтрами - оценка строк из EXPLAIN запроса.
+
+    Returns:
+        int: Оценка или None, если оценки нет (другая СУБД, таблица
+            еще не анализировалась)
+    """
+    if not isinstance(queryset, QuerySet):
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    with connection.cursor() as cursor:
+        if not queryset.query.has_filters() and not queryset.query.distinct:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+            return row[0] if row and row[0] > 0 else None
+
+        sql, params = queryset.values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedPage(Page):
+    """Страница EstimatedCountPaginator"""
+
+    def has_next(self):
+        if not self.paginator.estimated:
+            return super().has_next()
+        # Оценка может быть и больше, и меньше настоящего количества
+        return len(self.object_list) == self.paginator.per_page
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator, который для больших выборок отдает оценку количества
+
+    Если по оценке строк не меньше ESTIMATED_COUNT_THRESHOLD, оценка
+    проверяется подсчетом не более ESTIMATED_COUNT_THRESHOLD строк: планировщик
+    может сильно ошибаться на избирательных фильтрах. count - оценка
+    (estimated = True), только если строк действительно не меньше порога,
+    иначе - точное количество. При оценке страницы не обрезаются
+    по count: номер за пределами оценки дает пустую страницу, а не ошибку,
+    и следующая страница есть, пока текущая заполнена целиком.
+    Подходит и для DRF (EstimatedCountPagination), и для админки (ModelAdmin.paginator).
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < threshold:
+            return super().count
+        # COUNT(*) по подзапросу с LIMIT: не дороже чтения threshold строк
+        bounded = self.object_list[:threshold].count()
+        if bounded < threshold:
+            return bounded
+        self.estimated = True
+        return estimate
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.estimated and int(number) > 1:
+                return int(number)
+            raise
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def _get_page(self, *args, **kwargs):
+        return EstimatedPage(*args, **kwargs)
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Постраничный вывод DRF с оценкой количества для больших выборок
+
+    В ответе count_estimated показывает, что count - оценка.
+    """
+    django_paginator_class = EstimatedCountPaginator
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_estimated'] = self.page.paginator.estimated
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_estimated'] = {'type': 'boolean'}
+        return response_schema
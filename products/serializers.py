@@ -2,19 +2,34 @@ from rest_framework import serializers
 from .models import Product
 
 
+class DiscountPercentageField(serializers.ReadOnlyField):
+    """
+    Процент скидки числом; у товаров без скидки - 0, как до того, как он
+    стал храниться в таблице (колонка хранит 0.0)
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, product):
+        return product.discount_percentage if product.has_discount else 0
+
+
 class ProductSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели Product
     """
+    # Поля скидки хранятся в таблице, но отдаются числом, как раньше
     has_discount = serializers.ReadOnlyField()
-    discount_percentage = serializers.ReadOnlyField()
+    discount_percentage = DiscountPercentageField()
     discount_price = serializers.ReadOnlyField()
     
     class Meta:
         model = Product
         fields = [
-            'id', 'wb_id', 'name', 'price', 'original_price', 'discount_price',
-            'rating', 'review_count', 'search_query', 'created_at', 
+            'id', 'wb_id', 'name', 'brand', 'supplier', 'price', 'original_price',
+            'discount_price', 'rating', 'review_count', 'stock_quantity',
+            'search_query', 'created_at', 
             'updated_at', 'has_discount', 'discount_percentage'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -25,7 +40,7 @@ class ProductListSerializer(serializers.ModelSerializer):
     Упрощенный сериализатор для списка товаров
     """
     has_discount = serializers.ReadOnlyField()
-    discount_percentage = serializers.ReadOnlyField()
+    discount_percentage = DiscountPercentageField()
     discount_price = serializers.ReadOnlyField()
     
     class Meta:
@@ -33,4 +48,41 @@ class ProductListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'wb_id', 'name', 'price', 'original_price', 'discount_price',
             'rating', 'review_count', 'has_discount', 'discount_percentage'
-        ] 
\ No newline at end of file
+        ] 
+
+# Поля .values() для списка товаров: поля ProductListSerializer без вычисляемых
+# и created_at - поле сортировки по умолчанию, нужное курсорной пагинации
+LIST_VALUES_FIELDS = (
+    'id', 'wb_id', 'name', 'price', 'original_price', 'rating', 'review_count',
+    'has_discount', 'discount_percentage', 'created_at',
+)
+
+
+def product_list_rows(rows):
+    """
+    Строки .values(*LIST_VALUES_FIELDS) в формате ProductListSerializer
+
+    Не создает экземпляры Product и не проходит поля сериализатора: суммы
+    отдаются строкой, как DecimalField (в базе у них ровно два знака после
+    запятой), discount_price и discount_percentage - числом, как Decimal
+    в ReadOnlyField после кодировщика DRF (у товаров без скидки - 0,
+    как DiscountPercentageField).
+
+    Returns:
+        list: Словари с полями ProductListSerializer в том же порядке
+    """
+    return [
+        {
+            'id': row['id'],
+            'wb_id': row['wb_id'],
+            'name': row['name'],
+            'price': format(row['price'], 'f'),
+            'original_price': format(row['original_price'], 'f'),
+            'discount_price': float(row['price']),
+            'rating': None if row['rating'] is None else format(row['rating'], 'f'),
+            'review_count': row['review_count'],
+            'has_discount': row['has_discount'],
+            'discount_percentage': float(row['discount_percentage']) if row['has_discount'] else 0,
+        }
+        for row in rows
+    ]
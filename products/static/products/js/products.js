@@ -1,37 +1,79 @@
+// Параметры ProductFilter, которые заполняются из полей формы
+const FILTER_INPUTS = {
+    search: 'searchInput',
+    min_price: 'minPrice',
+    max_price: 'maxPrice',
+    min_rating: 'minRating',
+    min_reviews: 'minReviews'
+};
+const FILTER_DEBOUNCE_MS = 300;
+const PAGE_CACHE_SIZE = 50;
+
+// Недавно загруженные страницы: URL -> ответ API, самые старые вытесняются
+class PageCache {
+    constructor(limit = PAGE_CACHE_SIZE) {
+        this.limit = limit;
+        this.pages = new Map();
+    }
+    
+    get(url) {
+        const page = this.pages.get(url);
+        if (page !== undefined) {
+            // Перемещаем в конец - страница снова самая свежая
+            this.pages.delete(url);
+            this.pages.set(url, page);
+        }
+        return page;
+    }
+    
+    set(url, page) {
+        this.pages.delete(url);
+        this.pages.set(url, page);
+        while (this.pages.size > this.limit) {
+            this.pages.delete(this.pages.keys().next().value);
+        }
+    }
+    
+    clear() {
+        this.pages.clear();
+    }
+}
+
 // Основной класс для управления таблицей товаров
+// Фильтрация, сортировка и пагинация выполняются на сервере (ProductFilter),
+// браузер загружает только показываемую страницу
 class ProductsTable {
     constructor() {
         this.products = [];
-        this.filteredProducts = [];
+        this.totalCount = 0;
+        // Количество на больших выборках - оценка планировщика (count_estimated)
+        this.countEstimated = false;
+        this.hasNext = false;
+        this.hasPrevious = false;
         this.currentPage = 1;
         this.itemsPerPage = 20;
         this.sortField = null;
         this.sortDirection = 'asc';
-        this.filters = {
-            minPrice: '',
-            maxPrice: '',
-            minRating: '',
-            minReviews: '',
-            search: ''
-        };
+        this.filters = {};
+        this.cache = new PageCache();
+        this.controller = null;
+        this.debounceTimer = null;
         
         this.init();
     }
     
     init() {
         this.bindEvents();
+        this.updateFilters();
         this.loadProducts();
-        this.updatePriceRange();
     }
     
     // Привязка событий к элементам
     bindEvents() {
-        // Фильтры
-        document.getElementById('minPrice').addEventListener('input', () => this.applyFilters());
-        document.getElementById('maxPrice').addEventListener('input', () => this.applyFilters());
-        document.getElementById('minRating').addEventListener('input', () => this.applyFilters());
-        document.getElementById('minReviews').addEventListener('input', () => this.applyFilters());
-        document.getElementById('searchInput').addEventListener('input', () => this.applyFilters());
+        // Фильтры: запрос уходит, когда пользователь перестал вводить
+        Object.values(FILTER_INPUTS).forEach(id => {
+            document.getElementById(id).addEventListener('input', () => this.scheduleFilters());
+        });
         
         // Сортировка
         document.querySelectorAll('th[data-sort]').forEach(th => {
@@ -40,7 +82,7 @@ class ProductsTable {
         
         // Кнопки
         document.getElementById('clearFilters').addEventListener('click', () => this.clearFilters());
-        document.getElementById('refreshData').addEventListener('click', () => this.loadProducts());
+        document.getElementById('refreshData').addEventListener('click', () => this.refresh());
         document.getElementById('parseProducts').addEventListener('click', () => this.parseProducts());
         
         // Пагинация
@@ -48,87 +90,112 @@ class ProductsTable {
         document.getElementById('nextPage').addEventListener('click', () => this.nextPage());
     }
     
-    // Загрузка товаров с сервера
+    // Адрес страницы списка с текущими фильтрами, сортировкой и номером страницы
+    buildUrl() {
+        const params = new URLSearchParams();
+        Object.entries(this.filters).forEach(([name, value]) => {
+            if (value !== '') params.set(name, value);
+        });
+        if (this.sortField) {
+            params.set('ordering', (this.sortDirection === 'desc' ? '-' : '') + this.sortField);
+        }
+        params.set('page', this.currentPage);
+        params.set('page_size', this.itemsPerPage);
+        return `/api/products/?${params}`;
+    }
+    
+    // Загрузка текущей страницы с сервера
     async loadProducts() {
+        const url = this.buildUrl();
+        // Ответ на устаревший запрос больше не нужен
+        if (this.controller) {
+            this.controller.abort();
+            this.controller = null;
+            this.hideLoading();
+        }
+        
+        const cached = this.cache.get(url);
+        if (cached) {
+            this.showPage(cached);
+            return;
+        }
+        
+        const controller = new AbortController();
+        this.controller = controller;
         this.showLoading();
         
         try {
-            const response = await fetch('/api/products/');
+            const response = await fetch(url, { signal: controller.signal });
+            if (response.status === 404 && this.currentPage > 1) {
+                // Страницы больше нет (товаров стало меньше) - переходим на первую
+                this.currentPage = 1;
+                this.controller = null;
+                this.hideLoading();
+                this.loadProducts();
+                return;
+            }
             if (!response.ok) {
                 throw new Error('Ошибка загрузки данных');
             }
             
             const data = await response.json();
-            this.products = data.results || data;
-            this.applyFilters();
-            this.hideLoading();
-            this.showNotification('Данные успешно загружены', 'success');
+            this.cache.set(url, data);
+            this.showPage(data);
         } catch (error) {
+            if (error.name === 'AbortError') return;
             console.error('Ошибка загрузки товаров:', error);
-            this.hideLoading();
             this.showNotification('Ошибка загрузки данных', 'error');
+        } finally {
+            if (this.controller === controller) {
+                this.controller = null;
+                this.hideLoading();
+            }
         }
     }
     
+    showPage(data) {
+        this.products = data.results || [];
+        this.totalCount = data.count || 0;
+        this.countEstimated = Boolean(data.count_estimated);
+        // Соседние страницы - по ссылкам API, а не по количеству: оценка может ошибаться
+        this.hasNext = Boolean(data.next);
+        this.hasPrevious = Boolean(data.previous);
+        this.renderTable();
+    }
+    
+    // Повторная загрузка без кэша страниц (после парсинга или по кнопке)
+    refresh() {
+        this.cache.clear();
+        this.loadProducts();
+    }
+    
+    // Фильтры применяются с задержкой, чтобы не отправлять запрос на каждый символ
+    scheduleFilters() {
+        clearTimeout(this.debounceTimer);
+        this.debounceTimer = setTimeout(() => this.applyFilters(), FILTER_DEBOUNCE_MS);
+    }
+    
     // Применение фильтров
     applyFilters() {
+        clearTimeout(this.debounceTimer);
         this.updateFilters();
-        
-        this.filteredProducts = this.products.filter(product => {
-            // Фильтр по цене
-            if (this.filters.minPrice && product.price < parseFloat(this.filters.minPrice)) {
-                return false;
-            }
-            if (this.filters.maxPrice && product.price > parseFloat(this.filters.maxPrice)) {
-                return false;
-            }
-            
-            // Фильтр по рейтингу
-            if (this.filters.minRating && product.rating < parseFloat(this.filters.minRating)) {
-                return false;
-            }
-            
-            // Фильтр по количеству отзывов
-            if (this.filters.minReviews && product.review_count < parseInt(this.filters.minReviews)) {
-                return false;
-            }
-            
-            // Поиск по названию
-            if (this.filters.search && !product.name.toLowerCase().includes(this.filters.search.toLowerCase())) {
-                return false;
-            }
-            
-            return true;
-        });
-        
         this.currentPage = 1;
-        this.renderTable();
+        this.loadProducts();
     }
     
     // Обновление фильтров из формы
     updateFilters() {
-        this.filters.minPrice = document.getElementById('minPrice').value;
-        this.filters.maxPrice = document.getElementById('maxPrice').value;
-        this.filters.minRating = document.getElementById('minRating').value;
-        this.filters.minReviews = document.getElementById('minReviews').value;
-        this.filters.search = document.getElementById('searchInput').value;
+        this.filters = {};
+        Object.entries(FILTER_INPUTS).forEach(([name, id]) => {
+            this.filters[name] = document.getElementById(id).value.trim();
+        });
     }
     
     // Очистка фильтров
     clearFilters() {
-        document.getElementById('minPrice').value = '';
-        document.getElementById('maxPrice').value = '';
-        document.getElementById('minRating').value = '';
-        document.getElementById('minReviews').value = '';
-        document.getElementById('searchInput').value = '';
-        
-        this.filters = {
-            minPrice: '',
-            maxPrice: '',
-            minRating: '',
-            minReviews: '',
-            search: ''
-        };
+        Object.values(FILTER_INPUTS).forEach(id => {
+            document.getElementById(id).value = '';
+        });
         
         this.applyFilters();
         this.showNotification('Фильтры очищены', 'info');
@@ -151,7 +218,8 @@ class ProductsTable {
         const currentTh = document.querySelector(`th[data-sort="${field}"]`);
         currentTh.classList.add(`sort-${this.sortDirection}`);
         
-        this.renderTable();
+        this.currentPage = 1;
+        this.loadProducts();
     }
     
     // Рендеринг таблицы
@@ -159,52 +227,25 @@ class ProductsTable {
         const tbody = document.getElementById('productsTableBody');
         const statsElement = document.getElementById('tableStats');
         
-        // Сортировка
-        let sortedProducts = [...this.filteredProducts];
-        if (this.sortField) {
-            sortedProducts.sort((a, b) => {
-                let aVal = a[this.sortField];
-                let bVal = b[this.sortField];
-                
-                // Обработка null значений
-                if (aVal === null || aVal === undefined) aVal = 0;
-                if (bVal === null || bVal === undefined) bVal = 0;
-                
-                // Строковое сравнение для названий
-                if (typeof aVal === 'string') {
-                    aVal = aVal.toLowerCase();
-                    bVal = bVal.toLowerCase();
-                }
-                
-                if (aVal < bVal) return this.sortDirection === 'asc' ? -1 : 1;
-                if (aVal > bVal) return this.sortDirection === 'asc' ? 1 : -1;
-                return 0;
-            });
-        }
-        
-        // Пагинация
-        const startIndex = (this.currentPage - 1) * this.itemsPerPage;
-        const endIndex = startIndex + this.itemsPerPage;
-        const paginatedProducts = sortedProducts.slice(startIndex, endIndex);
-        
         // Обновление статистики
-        statsElement.textContent = `Показано ${paginatedProducts.length} из ${this.filteredProducts.length} товаров`;
+        statsElement.textContent = `Показано ${this.products.length} из ${this.formatCount(this.totalCount)} товаров`;
         
         // Очистка таблицы
         tbody.innerHTML = '';
         
         // Заполнение таблицы
-        paginatedProducts.forEach(product => {
+        this.products.forEach(product => {
+            const name = this.escapeHtml(product.name);
             const row = document.createElement('tr');
             row.innerHTML = `
                 <td>
-                    <div class="product-name" title="${product.name}">
-                        <a href="${product.product_url}" target="_blank">${product.name}</a>
+                    <div class="product-name" title="${name}">
+                        <a href="${this.productUrl(product)}" target="_blank" rel="noopener">${name}</a>
                     </div>
                 </td>
                 <td>
                     <span class="price">${this.formatPrice(product.price)} ₽</span>
-                    ${product.discount_price ? `<br><span class="discount-price">${this.formatPrice(product.discount_price)} ₽</span>` : ''}
+                    ${product.has_discount ? `<br><span class="discount-price">${this.formatPrice(product.original_price)} ₽</span>` : ''}
                 </td>
                 <td>
                     ${product.rating ? `
@@ -226,55 +267,39 @@ class ProductsTable {
     
     // Обновление пагинации
     updatePagination() {
-        const totalPages = Math.ceil(this.filteredProducts.length / this.itemsPerPage);
+        // Заниженная оценка не должна давать "страница 60 из 50"
+        const totalPages = Math.max(this.currentPage, Math.ceil(this.totalCount / this.itemsPerPage));
         const paginationInfo = document.getElementById('paginationInfo');
         const prevBtn = document.getElementById('prevPage');
         const nextBtn = document.getElementById('nextPage');
         
-        paginationInfo.textContent = `Страница ${this.currentPage} из ${totalPages}`;
+        paginationInfo.textContent = `Страница ${this.currentPage} из ${this.formatCount(totalPages)}`;
         
-        prevBtn.disabled = this.currentPage === 1;
-        nextBtn.disabled = this.currentPage === totalPages;
+        prevBtn.disabled = !this.hasPrevious;
+        nextBtn.disabled = !this.hasNext;
     }
     
     // Переход на предыдущую страницу
     prevPage() {
-        if (this.currentPage > 1) {
+        if (this.hasPrevious) {
             this.currentPage--;
-            this.renderTable();
+            this.loadProducts();
         }
     }
     
     // Переход на следующую страницу
     nextPage() {
-        const totalPages = Math.ceil(this.filteredProducts.length / this.itemsPerPage);
-        if (this.currentPage < totalPages) {
+        if (this.hasNext) {
             this.currentPage++;
-            this.renderTable();
-        }
-    }
-    
-    // Обновление диапазона цен
-    updatePriceRange() {
-        if (this.products.length > 0) {
-            const prices = this.products.map(p => p.price).filter(p => p !== null);
-            if (prices.length > 0) {
-                const minPrice = Math.min(...prices);
-                const maxPrice = Math.max(...prices);
-                
-                document.getElementById('minPrice').placeholder = `От ${this.formatPrice(minPrice)}`;
-                document.getElementById('maxPrice').placeholder = `До ${this.formatPrice(maxPrice)}`;
-            }
+            this.loadProducts();
         }
     }
     
-    // Парсинг новых товаров
+    // Парсинг новых товаров: задача ставится в очередь, ее выполняет воркер
     async parseProducts() {
         const query = prompt('Введите поисковый запрос для парсинга:');
         if (!query) return;
         
-        this.showLoading();
-        
         try {
             const response = await fetch('/parse-products/', {
                 method: 'POST',
@@ -285,18 +310,50 @@ class ProductsTable {
                 body: JSON.stringify({ query: query })
             });
             
+            const job = await response.json();
             if (!response.ok) {
-                throw new Error('Ошибка парсинга');
+                throw new Error(job.error || 'Ошибка парсинга');
             }
             
-            const result = await response.json();
-            this.showNotification(`Парсинг завершен. Добавлено ${result.saved_count} товаров`, 'success');
-            this.loadProducts(); // Перезагружаем данные
+            this.showNotification(
+                job.created ? `Задача #${job.job_id} поставлена в очередь` : `Такой запрос уже парсится (задача #${job.job_id})`,
+                'info'
+            );
+            this.pollParseJob(job.status_url);
         } catch (error) {
             console.error('Ошибка парсинга:', error);
             this.showNotification('Ошибка парсинга товаров', 'error');
-        } finally {
-            this.hideLoading();
+        }
+    }
+    
+    // Опрос состояния задачи парсинга до ее завершения
+    async pollParseJob(statusUrl, interval = 1500) {
+        try {
+            const response = await fetch(statusUrl);
+            if (!response.ok) {
+                throw new Error('Ошибка получения состояния задачи');
+            }
+            
+            const job = await response.json();
+            if (job.status === 'done') {
+                this.showNotification(
+                    `Парсинг завершен. Добавлено ${job.inserted}, обновлено ${job.updated}, без изменений ${job.unchanged} товаров`,
+                    'success'
+                );
+                this.refresh(); // Перезагружаем данные
+                return;
+            }
+            if (job.status === 'failed') {
+                this.showNotification(`Ошибка парсинга: ${job.error}`, 'error');
+                return;
+            }
+            
+            document.getElementById('tableStats').textContent =
+                `Парсинг "${job.query}": страниц ${job.pages_done} из ${job.pages}, найдено ${job.products_found}`;
+            setTimeout(() => this.pollParseJob(statusUrl, interval), interval);
+        } catch (error) {
+            console.error('Ошибка опроса задачи:', error);
+            this.showNotification('Не удалось получить состояние парсинга', 'error');
         }
     }
     
@@ -306,6 +363,12 @@ class ProductsTable {
         return new Intl.NumberFormat('ru-RU').format(price);
     }
     
+    // Оценочное количество показывается приблизительным
+    formatCount(count) {
+        const formatted = new Intl.NumberFormat('ru-RU').format(count);
+        return this.countEstimated ? `≈${formatted}` : formatted;
+    }
+    
     getStars(rating) {
         const fullStars = Math.floor(rating);
         const hasHalfStar = rating % 1 >= 0.5;
@@ -314,6 +377,16 @@ class ProductsTable {
         return '★'.repeat(fullStars) + (hasHalfStar ? '☆' : '') + '☆'.repeat(emptyStars);
     }
     
+    productUrl(product) {
+        return `https://www.wildberries.by/catalog/${product.wb_id}/detail.aspx`;
+    }
+    
+    escapeHtml(text) {
+        const element = document.createElement('div');
+        element.textContent = text ?? '';
+        return element.innerHTML.replace(/"/g, '&quot;');
+    }
+    
     getCSRFToken() {
         return document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
     }
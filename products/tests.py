@@ -1,3 +1,1002 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, models, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from parser.cache import ResponseCache
+from parser.client import WildberriesClient
+from parser.decode import extract_products
+from parser.fetcher import PageFetcher, SearchPage
+from parser.normalize import PRODUCT_FIELDS, normalize_product
+from parser.pipeline import IngestionPipeline
+from parser.scheduler import CrawlScheduler
+from parser.stub_server import StubConfig, WBStubServer, make_product
+from parser.throttle import AIMDController, RequestBudget
+
+from .benchmarks import compare_results
+from .export import EXPORT_COLUMNS, export_stream
+from .management.commands.seed_products import QUERIES, synthetic_product
+from .models import CrawlTarget, DataGeneration, ParseJob, PriceObservation, Product, SearchTerm
+from .pagination import EstimatedCountPaginator, estimate_count
+from .renderers import FastJSONRenderer
+from .serializers import ProductListSerializer
+
+
+class ProductFactoryMixin:
+    """
+    Товары для тестов записи: поля по умолчанию класс тестов дополняет
+    или переопределяет в product_defaults
+    """
+    product_defaults = {}
+
+    def make_product(self, wb_id, price, **fields):
+        fields = {
+            'name': f'Товар {wb_id}', 'original_price': 200, 'search_query': 'ноутбук',
+            **self.product_defaults, **fields,
+        }
+        return Product(wb_id=wb_id, price=price, **fields)
+
+
+class ProductBulkUpsertTests(ProductFactoryMixin, TestCase):
+    """
+    Тесты пакетной записи товаров по wb_id
+    """
+    product_defaults = {'rating': Decimal('4.5'), 'review_count': 10}
+
+    def test_inserts_new_and_updates_existing(self):
+        Product.objects.bulk_upsert([self.make_product(1, 100), self.make_product(2, 200)])
+
+        inserted, updated, unchanged = Product.objects.bulk_upsert(
+            [self.make_product(2, 150), self.make_product(3, 300)],
+            batch_size=1,
+        )
+
+        self.assertEqual((inserted, updated, unchanged), (1, 1, 0))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(Product.objects.get(wb_id=2).price, Decimal('150'))
+
+    def test_duplicate_wb_id_in_batch_keeps_last(self):
+        inserted, updated, unchanged = Product.objects.bulk_upsert(
+            [self.make_product(1, 100), self.make_product(1, 120)]
+        )
+
+        self.assertEqual((inserted, updated, unchanged), (1, 0, 0))
+        self.assertEqual(Product.objects.get(wb_id=1).price, Decimal('120'))
+
+    def test_unchanged_products_are_not_rewritten(self):
+        Product.objects.bulk_upsert([self.make_product(1, 100), self.make_product(2, 200)])
+        updated_at = Product.objects.get(wb_id=1).updated_at
+
+        inserted, updated, unchanged = Product.objects.bulk_upsert(
+            [self.make_product(1, Decimal('100.00')), self.make_product(2, 250)]
+        )
+
+        self.assertEqual((inserted, updated, unchanged), (0, 1, 1))
+        self.assertEqual(Product.objects.get(wb_id=1).updated_at, updated_at)
+        self.assertEqual(Product.objects.get(wb_id=2).price, Decimal('250'))
+
+    def test_save_keeps_fingerprint_in_sync(self):
+        Product.objects.bulk_upsert([self.make_product(1, 100)])
+        product = Product.objects.get(wb_id=1)
+        product.price = Decimal('90')
+        product.save(update_fields=['price'])
+
+        # Загрузка исходных данных должна вернуть цену, исправленную вручную
+        inserted, updated, unchanged = Product.objects.bulk_upsert([self.make_product(1, 100)])
+
+        self.assertEqual((inserted, updated, unchanged), (0, 1, 0))
+        self.assertEqual(Product.objects.get(wb_id=1).price, Decimal('100'))
+
+
+    def test_discount_columns_are_maintained_and_sortable(self):
+        products = [self.make_product(1, 100), self.make_product(2, 75), self.make_product(3, 90)]
+        for product in products:
+            product.original_price = 100
+        Product.objects.bulk_upsert(products)
+        product = Product.objects.get(wb_id=1)
+        product.price = Decimal('50')
+        product.save(update_fields=['price'])
+
+        response = self.client.get('/api/products/', {'ordering': '-discount_percentage', 'has_discount': 'true'})
+
+        results = response.data['results']
+        self.assertEqual([row['wb_id'] for row in results], [1, 2, 3])
+        self.assertEqual([row['discount_percentage'] for row in results], [Decimal('50.0'), Decimal('25.0'), Decimal('10.0')])
+        self.assertFalse(Product.objects.filter(has_discount=False).exists())
+
+
+class ProductSearchTests(TestCase):
+    """
+    Тесты поиска товаров через API
+    """
+
+    def setUp(self):
+        Product.objects.bulk_upsert([
+            Product(wb_id=1, name='Ноутбук игровой ASUS', price=100, brand='ASUS', search_query='ноутбук'),
+            Product(wb_id=2, name='Сумка для ноутбуков', price=50, search_query='сумка'),
+            Product(wb_id=3, name='Смартфон Xiaomi', price=300, brand='Xiaomi', search_query='смартфон'),
+            Product(wb_id=4, name='Чехол универсальный', price=20, brand='ASUS', search_query='чехол'),
+        ])
+
+    def search(self, **params):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['wb_id'] for row in response.data['results']]
+
+    def test_full_text_search_uses_morphology_and_ranks_by_name(self):
+        self.assertEqual(sorted(self.search(search='ноутбуки')), [1, 2])
+        # Совпадение в названии весит больше, чем в бренде
+        self.assertEqual(self.search(search='asus'), [1, 4])
+        self.assertEqual(self.search(search='asus', ordering='price'), [4, 1])
+        self.assertEqual(self.search(search='сумк ноутбук'), [2])
+
+    def test_other_modes_match_substrings(self):
+        self.assertEqual(self.search(search='утбу', search_mode='contains', ordering='-price'), [1, 2])
+        self.assertEqual(self.search(search='утбу', search_mode='trigram', ordering='price'), [2, 1])
+        response = self.client.get('/api/products/', {'search': 'x', 'search_mode': 'regex'})
+        self.assertEqual(response.status_code, 400)
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Тесты курсорной пагинации списка товаров
+    """
+
+    def setUp(self):
+        # Повторяющиеся цены и рейтинги, часть рейтингов - NULL
+        Product.objects.bulk_upsert(
+            Product(wb_id=n, name=f'Товар {n}', price=100 + n % 4, original_price=200,
+                    rating=None if n % 5 == 0 else Decimal(n % 3 + 3), search_query='ноутбук' if n % 2 else 'мышь')
+            for n in range(1, 24)
+        )
+
+    def walk(self, **params):
+        ids = []
+        response = self.client.get('/api/products/', {'pagination': 'cursor', 'page_size': 4, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_walks_every_ordering_without_gaps_or_duplicates(self):
+        for ordering, expected in [
+            ('price', Product.objects.order_by('price', 'id')),
+            ('-price', Product.objects.order_by('-price', '-id')),
+            ('rating', Product.objects.order_by(models.F('rating').asc(nulls_last=True), 'id')),
+            ('-rating', Product.objects.order_by(models.F('rating').desc(nulls_first=True), '-id')),
+        ]:
+            self.assertEqual(self.walk(ordering=ordering), list(expected.values_list('id', flat=True)), ordering)
+
+    def test_combines_with_filters_and_rejects_bad_cursor(self):
+        ids = self.walk(search_query='мышь', min_price=101)
+        expected = Product.objects.filter(query__text='мышь', price__gte=101).order_by('-created_at', '-id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+        self.assertEqual(self.client.get('/api/products/', {'cursor': 'bm9wZQ'}).status_code, 404)
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=30)
+class EstimatedCountPaginationTests(TestCase):
+    """
+    Тесты оценки количества товаров в постраничном выводе
+    """
+
+    def setUp(self):
+        Product.objects.bulk_upsert(
+            Product(wb_id=n, name=f'Товар {n}', price=n, search_query='ноутбук') for n in range(1, 51)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+    def test_large_sets_are_estimated_and_small_ones_counted(self):
+        response = self.client.get('/api/products/', {'ordering': 'price', 'page_size': 20, 'page': 3})
+        self.assertTrue(response.data['count_estimated'])
+        self.assertEqual(response.data['count'], estimate_count(Product.objects.all()))
+        self.assertEqual([row['wb_id'] for row in response.data['results']], list(range(41, 51)))
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/products/', {'max_price': 5})
+        self.assertEqual((response.data['count'], response.data['count_estimated']), (5, False))
+
+    def test_overestimated_filter_is_counted_exactly(self):
+        # Планировщик может сильно переоценить избирательный фильтр
+        with mock.patch('products.pagination.estimate_count', return_value=20000):
+            response = self.client.get('/api/products/', {'max_price': 5})
+        self.assertEqual((response.data['count'], response.data['count_estimated']), (5, False))
+        self.assertIsNone(response.data['next'])
+
+    def test_admin_changelist_uses_estimate(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/products/product/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.context['cl'].paginator, EstimatedCountPaginator)
+        self.assertTrue(response.context['cl'].paginator.estimated)
+
+
+class ProductStatsTests(ProductFactoryMixin, TestCase):
+    """
+    Тесты статистики по товарам и итогов по запросам
+    """
+    product_defaults = {'rating': Decimal('4.5')}
+
+    def assert_totals_match_products(self):
+        incremental = list(SearchTerm.objects.values_list('text', *SearchTerm.TOTAL_FIELDS))
+        SearchTerm.objects.rebuild()
+        rebuilt = list(SearchTerm.objects.values_list('text', *SearchTerm.TOTAL_FIELDS))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_totals_follow_writes_updates_and_deletes(self):
+        Product.objects.bulk_upsert([
+            self.make_product(1, 100),
+            self.make_product(2, 200, rating=None),
+            self.make_product(3, 150, search_query='мышь'),
+        ])
+        # Товар переехал в другой запрос, у другого изменилась цена
+        Product.objects.bulk_upsert([
+            self.make_product(1, 120, search_query='мышь'), self.make_product(3, 90, search_query='мышь'),
+        ])
+        product = Product.objects.get(wb_id=2)
+        product.price = Decimal('180')
+        product.save(update_fields=['price'])
+        self.assert_totals_match_products()
+
+        Product.objects.filter(wb_id=3).delete()
+        Product.objects.get(wb_id=2).delete()
+        self.assert_totals_match_products()
+        self.assertEqual(self.client.get('/api/products/categories/').data, ['мышь'])
+
+    def test_endpoint_answers_from_totals_and_filtered_aggregate(self):
+        Product.objects.bulk_upsert([
+            self.make_product(
+                n, 100 + n * 10, search_query='ноутбук' if n % 2 else 'мышь',
+                rating=None if n == 4 else Decimal(n % 5),
+            )
+            for n in range(1, 11)
+        ])
+
+        # Второй запрос - номер поколения данных для кэша ответов
+        for params in [{}, {'search_query': 'ноут'}]:
+            with self.assertNumQueries(2):
+                fast = self.client.get('/api/products/stats/', params).data
+            exact = Product.objects.filter(query__text__icontains=params.get('search_query', '')).stats()
+            # Оба способа должны давать одинаковые значения, а не только близкие
+            self.assertEqual(fast, exact)
+
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/products/stats/', {'min_price': 150, 'percentiles': 'true'})
+        self.assertEqual(response.data['total_products'], 6)
+        self.assertEqual(response.data['price_percentiles']['p50'], 175.0)
+
+
+class ApiResponseCacheTests(TestCase):
+    """
+    Тесты кэша ответов API по поколению данных
+    """
+
+    def upsert(self, price):
+        Product.objects.bulk_upsert([
+            Product(wb_id=1, name='Чайник', price=price, original_price=200, search_query='чайник'),
+        ])
+
+    def test_repeated_request_is_cached_until_products_change(self):
+        self.upsert(100)
+        first = self.client.get('/api/products/', {'ordering': 'price', 'min_price': ''})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'no-cache')
+        self.assertIn('Last-Modified', first)
+
+        # Тот же запрос с другим порядком параметров - из кэша, одним запросом поколения
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/products/', {'min_price': '', 'ordering': 'price'})
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(cached.json(), first.json())
+
+        with self.assertNumQueries(1):
+            not_modified = self.client.get('/api/products/?ordering=price', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        self.upsert(150)
+        changed = self.client.get('/api/products/?ordering=price', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(changed.json()['results'][0]['price'], '150.00')
+
+    def test_stats_and_detail_follow_generation(self):
+        self.upsert(100)
+        stats = self.client.get('/api/products/stats/', {'page': 2})
+        self.assertEqual(self.client.get('/api/products/stats/', HTTP_IF_NONE_MATCH=stats['ETag']).status_code, 304)
+
+        product = Product.objects.get(wb_id=1)
+        detail = self.client.get(f'/api/products/{product.pk}/')
+        product.name = 'Электрочайник'
+        product.save(update_fields=['name'])
+        response = self.client.get(f'/api/products/{product.pk}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Электрочайник')
+
+
+class ProductListFastPathTests(TestCase):
+    """
+    Тесты списка товаров без экземпляров Product и рендерера на orjson
+    """
+
+    def setUp(self):
+        Product.objects.bulk_upsert([
+            Product(wb_id=1, name='Чайник\u2028"стеклянный"', price=Decimal('999.9'), original_price=1500,
+                    rating=Decimal('4.5'), review_count=12, search_query='чайник'),
+            Product(wb_id=2, name='Кружка', price=100, original_price=100, rating=None, search_query='кружка'),
+            Product(wb_id=3, name='Ложка', price=Decimal('0.01'), original_price=Decimal('0.03'),
+                    rating=0, search_query='ложка'),
+        ])
+
+    def assert_matches_serializer(self, response, queryset):
+        expected = {**response.data, 'results': ProductListSerializer(queryset, many=True).data}
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_output_is_byte_compatible_with_serializer(self):
+        response = self.client.get('/api/products/', {'ordering': 'price'})
+        self.assertEqual(response.status_code, 200)
+        self.assert_matches_serializer(response, Product.objects.order_by('price', 'id'))
+        # У товара без скидки процент - 0, а не 0.0, в обоих путях
+        self.assertIn(b'"has_discount":false,"discount_percentage":0}', response.content)
+        detail = self.client.get(f"/api/products/{Product.objects.get(wb_id=2).pk}/")
+        self.assertEqual(detail.data['discount_percentage'], 0)
+
+        response = self.client.get('/api/products/', {'pagination': 'cursor', 'page_size': 2})
+        self.assert_matches_serializer(response, Product.objects.order_by('-created_at', '-id')[:2])
+        rest = self.client.get(response.data['next'])
+        self.assertEqual([row['wb_id'] for row in rest.data['results']], [1])
+
+    def test_renderer_falls_back_to_drf(self):
+        data = {'when': timezone.now(), 'value': Decimal('1.5'), 1: 'ключ не строка', 'big': 2 ** 70}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class ProductExportTests(TestCase):
+    """
+    Тесты потоковой выгрузки товаров
+    """
+
+    def setUp(self):
+        Product.objects.bulk_upsert(
+            Product(wb_id=n, name=f'Товар, "{n}"', price=100 + n, original_price=150, rating=None if n == 2 else 4,
+                    search_query='чайник' if n % 2 else 'кружка')
+            for n in range(1, 6)
+        )
+
+    def export(self, **params):
+        response = self.client.get('/api/products/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_applies_filters_and_ordering(self):
+        lines = self.export(search_query='чайник', ordering='-price').splitlines()
+        self.assertEqual(lines[0].split(','), list(EXPORT_COLUMNS))
+        self.assertEqual(len(lines), 4)
+        pk = Product.objects.get(wb_id=5).pk
+        self.assertTrue(lines[1].startswith(f'{pk},5,"Товар, ""5""",,,105.00,150.00,4.00,0,,чайник,true,30.0,'))
+
+        # Пачки курсора склеиваются в тот же файл
+        chunks = list(export_stream(Product.objects.order_by('-price'), 'csv', chunk_size=2))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b''.join(chunks).decode('utf-8'), self.export(ordering='-price'))
+
+    def test_ndjson_and_errors(self):
+        rows = [json.loads(line) for line in self.export(file_format='ndjson', ordering='price').splitlines()]
+        self.assertEqual([row['wb_id'] for row in rows], [1, 2, 3, 4, 5])
+        self.assertEqual(list(rows[1]), list(EXPORT_COLUMNS))
+        self.assertIsNone(rows[1]['rating'])
+        self.assertEqual(rows[1]['price'], '102.00')
+        self.assertTrue(rows[1]['created_at'].endswith('Z'))
+
+        self.assertEqual(self.client.get('/api/products/export/', {'file_format': 'xml'}).status_code, 400)
+        with mock.patch('products.export.pyarrow', None):
+            self.assertEqual(self.client.get('/api/products/export/', {'file_format': 'parquet'}).status_code, 400)
+
+
+class PriceHistoryTests(ProductFactoryMixin, TestCase):
+    """
+    Тесты истории цен
+    """
+    product_defaults = {'review_count': 10}
+
+    def test_upsert_records_only_price_changes(self):
+        Product.objects.bulk_upsert([self.make_product(1, 100), self.make_product(2, 150)])
+        # Изменились отзывы, но не цена - наблюдение не нужно
+        Product.objects.bulk_upsert([self.make_product(1, 100, review_count=11), self.make_product(2, 140)])
+
+        history = PriceObservation.objects.order_by('wb_id', 'observed_at', 'id')
+        self.assertEqual(
+            [(o.wb_id, o.price) for o in history],
+            [(1, Decimal('100')), (2, Decimal('150')), (2, Decimal('140'))],
+        )
+
+    def test_compaction_drops_consecutive_duplicates(self):
+        start = timezone.now() - timedelta(days=10)
+        for day, price in enumerate([100, 100, 90, 90, 100]):
+            PriceObservation.objects.create(
+                wb_id=1, price=price, original_price=200, observed_at=start + timedelta(days=day)
+            )
+        call_command('compact_price_history', stdout=StringIO())
+
+        prices = PriceObservation.objects.order_by('observed_at').values_list('price', flat=True)
+        self.assertEqual(list(prices), [Decimal('100'), Decimal('90'), Decimal('100')])
+
+    def test_history_endpoint_downsamples(self):
+        Product.objects.bulk_upsert([self.make_product(1, 100)])
+        product = Product.objects.get(wb_id=1)
+        start = timezone.now() - timedelta(days=3)
+        PriceObservation.objects.bulk_create(
+            PriceObservation(wb_id=1, price=100 + hour % 24, original_price=200,
+                             observed_at=start + timedelta(hours=hour))
+            for hour in range(72)
+        )
+
+        response = self.client.get(f'/api/products/{product.pk}/history/', {'points': 10})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['interval'], 'day')
+        self.assertLessEqual(len(response.data['points']), 10)
+        self.assertEqual(sum(point['observations'] for point in response.data['points']), 73)
+        raw = self.client.get(f'/api/products/{product.pk}/history/', {'interval': 'raw'})
+        self.assertEqual(len(raw.data['points']), 73)
+
+
+class ConcurrentUpsertTests(ProductFactoryMixin, TransactionTestCase):
+    """
+    Тесты параллельной записи одних и тех же товаров
+    """
+
+    def test_overlapping_upserts_keep_history_and_totals(self):
+        Product.objects.bulk_upsert([self.make_product(1, 100)])
+        started, release = threading.Event(), threading.Event()
+
+        def first():
+            try:
+                with transaction.atomic():
+                    Product.objects.bulk_upsert([self.make_product(1, 90), self.make_product(2, 50)])
+                    started.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        def second():
+            try:
+                Product.objects.bulk_upsert([self.make_product(1, 80), self.make_product(2, 60)])
+            finally:
+                connection.close()
+
+        writers = [threading.Thread(target=first), threading.Thread(target=second)]
+        writers[0].start()
+        self.assertTrue(started.wait(5))
+        writers[1].start()
+        # Вторая запись должна дождаться первой
+        time.sleep(0.3)
+        release.set()
+        for writer in writers:
+            writer.join(10)
+
+        history = PriceObservation.objects.order_by('wb_id', 'observed_at', 'id').values_list('wb_id', 'price')
+        self.assertEqual(
+            list(history),
+            [(1, Decimal('100')), (1, Decimal('90')), (1, Decimal('80')), (2, Decimal('50')), (2, Decimal('60'))],
+        )
+        term = SearchTerm.objects.get(text='ноутбук')
+        self.assertEqual((term.product_count, term.price_sum), (2, Decimal('140')))
+        self.assertEqual(SearchTerm.objects.summary()['total_products'], Product.objects.stats()['total_products'])
+
+
+class PageFetcherTests(SimpleTestCase):
+    """
+    Тесты параллельной загрузки страниц выдачи
+    """
+
+    def make_fetch(self, sizes):
+        requested = []
+        lock = threading.Lock()
+
+        def fetch_page(page):
+            with lock:
+                requested.append(page)
+            return [{'id': page * 1000 + index} for index in range(sizes.get(page, 0))]
+
+        return fetch_page, requested
+
+    def test_stops_at_first_empty_page_for_any_page_size(self):
+        fetch_page, requested = self.make_fetch({1: 30, 2: 30, 3: 12})
+        fetcher = PageFetcher(fetch_page, concurrency=4)
+
+        pages = sorted(result.page for result in fetcher.iter_pages(1, max_pages=100))
+
+        self.assertEqual(pages, [1, 2, 3])
+        # Запросы за концом выдачи - не больше одного окна
+        self.assertLessEqual(max(requested), 4 + 4)
+
+    def test_short_page_ends_crawl_when_page_size_is_known(self):
+        fetch_page, requested = self.make_fetch({1: 10, 2: 5, 3: 10, 4: 10})
+        fetcher = PageFetcher(fetch_page, concurrency=1, page_size=10)
+
+        pages = [result.page for result in fetcher.iter_pages(1, max_pages=10)]
+
+        self.assertEqual((pages, requested), ([1, 2], [1, 2]))
+
+    def test_total_from_first_page_bounds_the_crawl(self):
+        def fetch_page(page):
+            requested.append(page)
+            return SearchPage(products=[{'id': page}] * 10, total=25)
+
+        requested = []
+        fetcher = PageFetcher(fetch_page, concurrency=8, page_size=10)
+
+        pages = sorted(result.page for result in fetcher.iter_pages(1, max_pages=50))
+
+        self.assertEqual((pages, sorted(requested)), ([1, 2, 3], [1, 2, 3]))
+
+    def test_closing_iterator_stops_fetching(self):
+        fetch_page, requested = self.make_fetch({page: 10 for page in range(1, 1001)})
+        results = PageFetcher(fetch_page, concurrency=2).iter_pages(1, max_pages=1000, queue_size=1)
+
+        next(results)
+        results.close()
+        fetched = len(requested)
+        time.sleep(0.1)
+
+        self.assertLess(fetched, 20)
+        self.assertEqual(len(requested), fetched)
+
+
+class AIMDControllerTests(SimpleTestCase):
+    """
+    Тесты адаптивного ограничителя запросов
+    """
+
+    def make_controller(self):
+        return AIMDController(max_limit=8, initial_limit=4, initial_rate=1000, max_rate=1000)
+
+    def test_overload_halves_limit_once_per_wave(self):
+        controller = self.make_controller()
+        first = controller._acquire()
+        second = controller._acquire()
+
+        controller._release(first, overloaded=True)
+        controller._release(second, overloaded=True)
+
+        self.assertEqual(controller.limit, 2)
+        self.assertEqual(controller.snapshot()['overloads'], 2)
+
+    def test_success_increases_limit_up_to_max(self):
+        controller = self.make_controller()
+        for _ in range(20):
+            with controller.slot() as slot:
+                slot.status = 200
+
+        self.assertEqual(controller.limit, 8)
+
+    def test_rate_limited_response_counts_as_overload(self):
+        controller = self.make_controller()
+        with controller.slot() as slot:
+            slot.status = 429
+
+        self.assertEqual(controller.limit, 2)
+
+
+class ResponseCacheTests(SimpleTestCase):
+    """
+    Тесты дискового кэша ответов API
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_key_ignores_param_order(self):
+        cache = ResponseCache(self.directory.name)
+        cache.set('https://search', {'query': 'ноутбук', 'page': 1}, b'{}')
+
+        self.assertEqual(cache.get('https://search', {'page': '1', 'query': 'ноутбук'}), b'{}')
+        self.assertIsNone(cache.get('https://search', {'page': 2, 'query': 'ноутбук'}))
+
+    def test_expired_response_is_served_only_without_ttl(self):
+        cache = ResponseCache(self.directory.name)
+        cache.set('https://search', {'page': 1}, b'{}')
+        path = cache._path(cache.key('https://search', {'page': 1}))
+        os.utime(path, (time.time() - 120, time.time() - 120))
+
+        self.assertIsNone(cache.get('https://search', {'page': 1}, ttl=60))
+        self.assertEqual(cache.get('https://search', {'page': 1}), b'{}')
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(self.directory.name, max_bytes=25)
+        cache.set('https://search', {'page': 1}, b'x' * 10)
+        cache.set('https://search', {'page': 2}, b'x' * 10)
+        old = time.time() - 60
+        os.utime(cache._path(cache.key('https://search', {'page': 2})), (old, old))
+
+        cache.set('https://search', {'page': 3}, b'x' * 10)
+
+        self.assertIsNotNone(cache.get('https://search', {'page': 1}))
+        self.assertIsNone(cache.get('https://search', {'page': 2}))
+        self.assertIsNotNone(cache.get('https://search', {'page': 3}))
+
+
+class ExtractProductsTests(SimpleTestCase):
+    """
+    Тесты извлечения товаров из ответа API
+    """
+
+    def test_projected_products_normalize_like_full_ones(self):
+        products = [make_product(10_000_000 + index) for index in range(5)]
+        content = json.dumps(
+            {'metadata': {'name': 'ноутбук'}, 'data': {'total': 5, 'products': products}},
+            ensure_ascii=False, indent=1,
+        ).encode('utf-8')
+
+        extracted, extra = extract_products(content, fields=PRODUCT_FIELDS)
+
+        self.assertEqual(extra, {'total': 5})
+        self.assertNotIn('logs', extracted[0])
+        self.assertEqual(
+            [normalize_product(product, 'ноутбук') for product in extracted],
+            [normalize_product(product, 'ноутбук') for product in products],
+        )
+
+    def test_error_payload_and_missing_products(self):
+        self.assertEqual(extract_products(b'{"error": "bad", "code": 5}'), (None, {'error': 'bad', 'code': 5}))
+        self.assertEqual(extract_products(b'{"data": {"products": []}}'), ([], {}))
+
+    def test_malformed_payload_raises_value_error(self):
+        content = json.dumps({'data': {'products': [make_product(1)]}}).encode('utf-8')
+        for payload in [content[:len(content) // 2], b'[]', content + b'x']:
+            with self.assertRaises(ValueError):
+                extract_products(payload)
+
+
+class WildberriesClientRetryTests(SimpleTestCase):
+    """
+    Тесты повторов запросов клиента API
+    """
+
+    def test_truncated_body_is_retried(self):
+        body = json.dumps({'data': {'products': [make_product(1)]}}).encode('utf-8')
+        responses = [
+            mock.Mock(status_code=200, content=body[:len(body) // 2], url='https://search'),
+            mock.Mock(status_code=200, content=body, url='https://search'),
+        ]
+        client = WildberriesClient(retries=2, backoff=0, search_url='https://search')
+
+        with mock.patch.object(client.session, 'get', side_effect=responses) as get:
+            products = client.search('ноутбук')
+
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual([product['id'] for product in products], [1])
+
+
+class IngestionPipelineStubTests(TestCase):
+    """
+    Тесты сбора товаров через локальный стенд API Wildberries
+    """
+
+    def run_pipeline(self, pages=5, enrich=True, **config):
+        server = WBStubServer(config=StubConfig(**config)).start()
+        self.addCleanup(server.stop)
+        client = WildberriesClient(
+            pool_size=4,
+            retries=2,
+            backoff=0,
+            search_url=server.search_url,
+            card_detail_url=server.card_detail_url,
+        )
+        pipeline = IngestionPipeline(client=client, concurrency=4, enrich=enrich)
+        return pipeline.run('ноутбук', pages=pages), server
+
+    def test_stops_after_last_page(self):
+        report, _ = self.run_pipeline(pages=5, total_products=250)
+        repeat_report, _ = self.run_pipeline(pages=5, total_products=250)
+
+        self.assertEqual(report.products_found, 250)
+        self.assertEqual(report.inserted, 250)
+        self.assertEqual((repeat_report.updated, repeat_report.unchanged), (0, 250))
+        self.assertEqual(report.enriched, 250)
+        self.assertEqual(report.failed_pages, 0)
+        self.assertEqual(Product.objects.exclude(brand='').count(), 250)
+
+    def test_requests_no_pages_past_reported_total(self):
+        report, server = self.run_pipeline(pages=50, enrich=False, total_products=250)
+
+        self.assertEqual(report.pages, 3)
+        self.assertEqual(server.state.stats()['requests'], 3)
+
+    def test_rate_limited_bursts_are_retried(self):
+        report, server = self.run_pipeline(pages=3, total_products=300, burst_every=3, burst_length=1)
+
+        self.assertEqual(report.products_found, 300)
+        self.assertEqual(report.failed_pages, 0)
+        self.assertGreater(server.state.stats()['rate_limited'], 0)
+        self.assertGreater(report.throttle['overloads'], 0)
+
+    def test_malformed_pages_are_reported(self):
+        report, _ = self.run_pipeline(pages=3, total_products=300, malformed_rate=1.0)
+
+        self.assertEqual(report.products_found, 0)
+        self.assertEqual(report.failed_pages, 3)
+
+
+class SeedProductsTests(TestCase):
+    """
+    Тесты заполнения базы синтетическими товарами
+    """
+
+    def test_seeds_reproducible_products(self):
+        call_command('seed_products', count=250, batch_size=100, first_id=1, stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 250)
+        product = Product.objects.get(wb_id=43)
+        expected = synthetic_product(42, 1, QUERIES, product.updated_at)
+        for field in ['name', 'price', 'original_price', 'rating', 'review_count', 'brand', 'search_query',
+                      'has_discount', 'discount_percentage']:
+            self.assertEqual(getattr(product, field), getattr(expected, field), field)
+
+
+class ImportProductsTests(TestCase):
+    """
+    Тесты загрузки выгрузок товаров через COPY
+    """
+
+    def import_file(self, content, suffix, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, f'dump{suffix}')
+            with open(path, 'w', encoding='utf-8') as dump:
+                dump.write(content)
+            rejects = os.path.join(directory, 'rejects.ndjson')
+            out = StringIO()
+            call_command('import_products', path, rejects=rejects, stdout=out, **options)
+            with open(rejects, encoding='utf-8') as file:
+                return out.getvalue(), [json.loads(line) for line in file]
+
+    def test_ndjson_merge_keeps_derived_data_in_sync(self):
+        Product.objects.bulk_upsert([
+            Product(wb_id=1, name='Чайник', price=100, original_price=100, search_query='чайник'),
+            Product(wb_id=2, name='Кружка', price=50, original_price=50, search_query='кружка'),
+        ])
+        generation = DataGeneration.objects.current()[0]
+        rows = [
+            {'wb_id': 1, 'name': 'Чайник', 'price': 100, 'original_price': 100, 'search_query': 'чайник'},
+            {'wb_id': 2, 'name': 'Кружка\tбольшая', 'price': '40.5', 'original_price': 50, 'rating': 4.7,
+             'search_query': 'чайник'},
+            {'wb_id': 3, 'name': 'Ложка', 'price': 10, 'review_count': 3},
+            {'wb_id': 3, 'name': 'Ложка чайная', 'price': 12, 'stock_quantity': 7},
+            {'wb_id': 4, 'name': 'Вилка', 'price': -1},
+            {'wb_id': 'x', 'name': 'Нож', 'price': 1},
+        ]
+        content = '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows) + '\n{broken\n'
+
+        out, rejects = self.import_file(content, '.ndjson', batch_size=3, search_query='посуда')
+
+        # Вторая версия wb_id=3 пришла в следующей пачке и обновила первую
+        self.assertIn('добавлено 1, обновлено 2, без изменений 1', out)
+        self.assertEqual([(row['line'], row['row']) for row in rejects][2], (7, '{broken'))
+        self.assertEqual(len(rejects), 3)
+        kruzhka = Product.objects.get(wb_id=2)
+        self.assertEqual((kruzhka.name, kruzhka.search_query), ('Кружка\tбольшая', 'чайник'))
+        self.assertEqual((kruzhka.has_discount, kruzhka.discount_percentage), (True, Decimal('19.0')))
+        self.assertEqual(kruzhka.fingerprint, kruzhka.compute_fingerprint())
+        self.assertEqual(Product.objects.get(wb_id=3).name, 'Ложка чайная')
+        self.assertFalse(Product.objects.filter(search_vector__isnull=True).exists())
+        self.assertEqual(
+            list(PriceObservation.objects.filter(wb_id__in=[1, 2, 3]).values_list('wb_id', 'price').order_by('wb_id', 'id')),
+            [(1, Decimal('100.00')), (2, Decimal('50.00')), (2, Decimal('40.50')), (3, Decimal('10.00')),
+             (3, Decimal('12.00'))],
+        )
+        self.assertGreater(DataGeneration.objects.current()[0], generation)
+
+        incremental = list(SearchTerm.objects.values_list('text', *SearchTerm.TOTAL_FIELDS))
+        SearchTerm.objects.rebuild()
+        self.assertEqual(incremental, list(SearchTerm.objects.values_list('text', *SearchTerm.TOTAL_FIELDS)))
+
+    def test_csv_reimport_is_unchanged(self):
+        content = 'wb_id,name,price,original_price,rating,search_query\n1,"Чайник, белый",90,100,,чайник\n'
+        self.import_file(content, '.csv')
+        out, rejects = self.import_file(content, '.csv')
+
+        self.assertIn('добавлено 0, обновлено 0, без изменений 1', out)
+        self.assertEqual(rejects, [])
+        product = Product.objects.get(wb_id=1)
+        self.assertEqual((product.name, product.rating, product.discount_percentage), ('Чайник, белый', None, Decimal('10.0')))
+
+
+class CompareBenchmarkResultsTests(SimpleTestCase):
+    """
+    Тесты сравнения отчетов нагрузочных замеров
+    """
+
+    def test_reports_only_regressions_above_threshold(self):
+        baseline = {'results': {
+            'api': {'10000': {'list': {'p50_ms': 10.0, 'runs': 20}}},
+            'upsert': {'500': {'insert_per_sec': 5000}},
+            'normalize': {'normalize_per_sec': 100000},
+        }}
+        current = {'results': {
+            'api': {'10000': {'list': {'p50_ms': 15.0, 'runs': 5}}},
+            'upsert': {'500': {'insert_per_sec': 4500}},
+            'normalize': {'normalize_per_sec': 50000},
+        }}
+
+        regressions = compare_results(baseline, current, threshold=0.2)
+
+        self.assertEqual(
+            sorted(regression['metric'] for regression in regressions),
+            ['api.10000.list.p50_ms', 'normalize.normalize_per_sec'],
+        )
+
+
+class ParseJobQueueTests(TestCase):
+    """
+    Тесты очереди задач парсинга
+    """
+
+    def test_identical_requests_are_merged_into_active_job(self):
+        job, created = ParseJob.objects.enqueue('Ноутбук ', pages=2)
+        same_job, same_created = ParseJob.objects.enqueue('ноутбук', pages=2)
+        other_job, other_created = ParseJob.objects.enqueue('ноутбук', pages=3)
+
+        self.assertTrue(created)
+        self.assertEqual((same_job.pk, same_created), (job.pk, False))
+        self.assertTrue(other_created)
+
+        ParseJob.objects.filter(pk=job.pk).update(status=ParseJob.STATUS_DONE)
+        new_job, new_created = ParseJob.objects.enqueue('ноутбук', pages=2)
+        self.assertTrue(new_created)
+        self.assertNotEqual(new_job.pk, job.pk)
+
+    def test_claim_takes_oldest_pending_job_once(self):
+        first, _ = ParseJob.objects.enqueue('ноутбук')
+        ParseJob.objects.enqueue('смартфон')
+
+        claimed = ParseJob.objects.claim('worker-1')
+        second = ParseJob.objects.claim('worker-2')
+
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual(claimed.status, ParseJob.STATUS_RUNNING)
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertIsNone(ParseJob.objects.claim('worker-3'))
+
+    def test_view_returns_job_and_status_endpoint_reports_progress(self):
+        response = self.client.post(
+            '/parse-products/', data={'query': 'ноутбук', 'pages': 2}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+
+        duplicate = self.client.post(
+            '/parse-products/', data={'query': 'ноутбук', 'pages': 2}, content_type='application/json'
+        )
+        self.assertEqual(duplicate.json()['job_id'], job_id)
+        self.assertFalse(duplicate.json()['created'])
+
+        ParseJob.objects.filter(pk=job_id).update(pages_done=1, products_found=100)
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual((status['status'], status['pages_done'], status['products_found']), ('pending', 1, 100))
+
+    def test_worker_runs_job_against_stub(self):
+        server = WBStubServer(config=StubConfig(total_products=150)).start()
+        self.addCleanup(server.stop)
+        job, _ = ParseJob.objects.enqueue('ноутбук', pages=3)
+
+        # Закрытие соединений между задачами оборвало бы транзакцию теста
+        with self.settings(WB_SEARCH_URL=server.search_url, WB_CARD_DETAIL_URL=server.card_detail_url), \
+                mock.patch('parser.management.commands.run_parse_worker.close_old_connections'):
+            call_command('run_parse_worker', once=True, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ParseJob.STATUS_DONE)
+        self.assertEqual((job.pages_done, job.products_found, job.inserted), (2, 150, 150))
+
+
+class CrawlSchedulerTests(TestCase):
+    """
+    Тесты планировщика повторного обхода
+    """
+
+    def make_scheduler(self, server, budget):
+        client = WildberriesClient(
+            retries=0, search_url=server.search_url, card_detail_url=server.card_detail_url
+        )
+        return CrawlScheduler(client=client, budget=budget, min_interval=0, min_priority=0)
+
+    def test_due_prefers_new_stale_and_popular_pages(self):
+        now = timezone.now()
+        hour_ago = now - timedelta(hours=1)
+
+        def target(text, page=1, **fields):
+            return CrawlTarget.objects.create(query=SearchTerm.objects.create(text=text), page=page, **fields)
+
+        expected = [
+            target('новый'),
+            target('популярный', last_crawled_at=hour_ago, popularity=10, last_requested_at=now),
+            target('устаревший', last_crawled_at=hour_ago),
+            target('глубокий', page=9, last_crawled_at=hour_ago),
+            target('свежий', last_crawled_at=now - timedelta(minutes=1)),
+        ]
+        target('выключенный', last_crawled_at=hour_ago, enabled=False)
+
+        due = CrawlTarget.objects.due(now, timedelta(0)).order_by('-score')
+
+        self.assertEqual(list(due), expected)
+
+    def test_register_normalizes_query(self):
+        CrawlTarget.objects.register('Ноутбук ', pages=2)
+        CrawlTarget.objects.register('ноутбук', pages=2)
+
+        targets = CrawlTarget.objects.all()
+        self.assertEqual(targets.count(), 2)
+        self.assertEqual({target.search_query for target in targets}, {'ноутбук'})
+        self.assertEqual([target.popularity for target in targets], [2, 2])
+        self.assertEqual(SearchTerm.objects.filter(text__iexact='ноутбук').count(), 1)
+
+    def test_select_skips_backing_off_pages_and_respects_limit(self):
+        now = timezone.now()
+        hour_ago = now - timedelta(hours=1)
+        CrawlTarget.objects.register('ноутбук', pages=4, requested=False)
+        CrawlTarget.objects.filter(page=2).update(last_crawled_at=hour_ago)
+        CrawlTarget.objects.filter(page=3).update(
+            last_crawled_at=hour_ago, change_rate=0.5, popularity=10, last_requested_at=now - timedelta(days=3)
+        )
+        CrawlTarget.objects.filter(page=4).update(
+            last_crawled_at=hour_ago, failures=2, last_attempt_at=now
+        )
+        scheduler = CrawlScheduler(client=None, min_interval=0, min_priority=0)
+
+        selected = scheduler.select(limit=2, now=now)
+
+        # Страница 4 ждет после ошибок, новая страница 1 идет первой
+        self.assertEqual([target.page for target in selected], [1, 3])
+
+    def test_parse_job_and_crawl_write_same_search_term(self):
+        server = WBStubServer(config=StubConfig(total_products=100)).start()
+        self.addCleanup(server.stop)
+        job, _ = ParseJob.objects.enqueue(' Ноутбук', pages=1)
+        with self.settings(WB_SEARCH_URL=server.search_url, WB_CARD_DETAIL_URL=server.card_detail_url), \
+                mock.patch('parser.management.commands.run_parse_worker.close_old_connections'):
+            call_command('run_parse_worker', once=True, stdout=StringIO())
+
+        self.make_scheduler(server, RequestBudget(per_hour=0, burst=1)).run_once()
+
+        self.assertEqual(job.query, 'ноутбук')
+        self.assertEqual(list(SearchTerm.objects.values_list('text', 'product_count')), [('ноутбук', 100)])
+
+    def test_crawls_within_budget_and_tracks_changes(self):
+        server = WBStubServer(config=StubConfig(total_products=1000, price_change_rate=1.0)).start()
+        self.addCleanup(server.stop)
+        CrawlTarget.objects.register('ноутбук', pages=5)
+        scheduler = self.make_scheduler(server, RequestBudget(per_hour=0, burst=3))
+
+        report = scheduler.run_once()
+
+        self.assertEqual(report.pages, 3)
+        self.assertEqual(server.state.stats()['requests'], 3)
+        self.assertEqual(Product.objects.count(), 300)
+        self.assertEqual(scheduler.run_once().pages, 0)
+
+        scheduler.budget = RequestBudget(per_hour=0, burst=5)
+        scheduler.run_once()
+        crawled_twice = CrawlTarget.objects.filter(crawl_count=2)
+        self.assertEqual(crawled_twice.count(), 3)
+        # Цены на стенде меняются при каждом запросе - оценка частоты изменений растет
+        self.assertTrue(all(target.change_rate > 0.1 for target in crawled_twice))
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, products_table_view, ParseProductsView
+from .views import ProductViewSet, products_table_view, ParseProductsView, ParseJobView
 
 # Создаем роутер для ViewSet
 router = DefaultRouter()
@@ -15,4 +15,7 @@ urlpatterns = [
     
     # API для парсинга товаров
     path('parse-products/', ParseProductsView.as_view(), name='parse_products'),
+    
+    # Состояние задачи парсинга
+    path('parse-jobs/<int:pk>/', ParseJobView.as_view(), name='parse_job'),
 ] 
\ No newline at end of file
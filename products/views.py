@@ -3,17 +3,40 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views import View
 import json
-from .models import Product
-from .serializers import ProductSerializer, ProductListSerializer
-from .filters import ProductFilter
+from .models import PRICE_PERCENTILES, ParseJob, PriceObservation, Product, SearchTerm
+from .serializers import LIST_VALUES_FIELDS, ProductSerializer, ProductListSerializer, product_list_rows
+from .filters import ProductFilter, ProductSearchFilter
+from .pagination import EstimatedCountPagination, KeysetPagination
+from .caching import cache_response
+from .export import EXPORT_FORMATS, check_format, export_stream
+from .renderers import FastJSONRenderer
 from django.db import models
-from django.core.management import call_command
+from django.db.models.functions import Trunc
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
+
+
+# Ограничение размера задачи, поставленной через веб-интерфейс
+MAX_PARSE_PAGES = 50
+
+# Интервалы усреднения истории цен, от мелкого к крупному
+HISTORY_INTERVALS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+    'month': timedelta(days=31),
+}
+MAX_HISTORY_POINTS = 1000
+# Параметры, которые не меняют набор товаров для статистики
+STATS_IGNORED_PARAMS = {'page', 'page_size', 'ordering', 'format', 'pagination', 'cursor'}
 
 
 class ProductViewSet(viewsets.ReadOnlyModelViewSet):
@@ -21,13 +44,46 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     ViewSet для работы с товарами через API
     Поддерживает фильтрацию, поиск и сортировку
     """
-    queryset = Product.objects.all()
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    queryset = Product.objects.select_related('query')
+    # Поиск - последним: без параметра ordering он сортирует по релевантности
+    filter_backends = [DjangoFilterBackend, OrderingFilter, ProductSearchFilter]
     filterset_class = ProductFilter
-    search_fields = ['name', 'search_query']
-    ordering_fields = ['price', 'original_price', 'rating', 'review_count', 'created_at']
+    search_fields = ['name', 'query__text']
+    ordering_fields = ['price', 'original_price', 'rating', 'review_count', 'created_at', 'discount_percentage']
     ordering = ['-created_at']  # По умолчанию сортируем по дате создания (новые сначала)
+    renderer_classes = [FastJSONRenderer]
+    pagination_class = EstimatedCountPagination
     
+    @property
+    def paginator(self):
+        """
+        Постраничный вывод: по номеру страницы (EstimatedCountPagination) или,
+        с параметром pagination=cursor, по курсору (KeysetPagination)
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request is not None else {}
+            if params.get('pagination') == 'cursor' or params.get(KeysetPagination.cursor_query_param):
+                self._paginator = KeysetPagination()
+        return super().paginator
+
+    @cache_response()
+    def list(self, request, *args, **kwargs):
+        """
+        Список товаров в формате ProductListSerializer
+
+        Строки выбираются через .values() и представляются product_list_rows,
+        без создания экземпляров Product и полей сериализатора.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values(*LIST_VALUES_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(product_list_rows(page))
+        return Response(product_list_rows(queryset))
+
+    @cache_response()
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def get_serializer_class(self):
         """
         Выбираем сериализатор в зависимости от действия
@@ -37,29 +93,120 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         return ProductSerializer
     
     @action(detail=False, methods=['get'])
+    @cache_response(ignore=STATS_IGNORED_PARAMS)
     def stats(self, request):
         """
         Получение статистики по товарам
+
+        Без фильтров или только с фильтром search_query ответ берется из итогов
+        SearchTerm, которые поддерживает запись товаров. С остальными
+        фильтрами - один агрегирующий запрос по отфильтрованным товарам.
+        С параметром percentiles=true добавляются перцентили цены
+        (всегда по товарам).
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        stats = {
-            'total_products': queryset.count(),
-            'avg_price': queryset.aggregate(avg_price=models.Avg('price'))['avg_price'],
-            'avg_rating': queryset.aggregate(avg_rating=models.Avg('rating'))['avg_rating'],
-            'products_with_discount': queryset.filter(
-                original_price__gt=models.F('price')
-            ).count(),
+        params = {
+            name: value for name, value in request.query_params.items()
+            if value and name not in STATS_IGNORED_PARAMS
         }
-        
-        return Response(stats)
-    
+        percentiles = params.pop('percentiles', '').lower() in ('1', 'true', 'yes')
+        if not percentiles and set(params) <= {'search_query', 'search_query__icontains'} and len(params) <= 1:
+            search_query = params.get('search_query') or params.get('search_query__icontains')
+            return Response(SearchTerm.objects.summary(search_query))
+
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(queryset.stats(PRICE_PERCENTILES if percentiles else ()))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Выгрузка всех отфильтрованных товаров одним файлом
+
+        Принимает те же фильтры, поиск и сортировку, что и список, и параметр
+        file_format: csv (по умолчанию), ndjson или parquet (нужен pyarrow).
+        Файл отдается по частям по мере чтения товаров серверным курсором.
+        """
+        file_format = request.query_params.get('file_format', 'csv')
+        try:
+            check_format(file_format)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        content_type, extension = EXPORT_FORMATS[file_format]
+        response = StreamingHttpResponse(export_stream(queryset, file_format), content_type=content_type)
+        filename = f"products-{timezone.now():%Y%m%d-%H%M%S}.{extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Прокси (nginx) не должен копить ответ целиком перед отправкой
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        """
+        История цены товара
+
+        Параметры: since, until (ISO 8601), interval (raw, hour, day, week,
+        month или auto) и points - сколько точек вернуть не больше при
+        interval=auto. Для интервалов точки агрегируются на сервере:
+        минимальная, максимальная и средняя цена за период.
+        """
+        product = self.get_object()
+        observations = PriceObservation.objects.filter(wb_id=product.wb_id)
+        for param, lookup in (('since', 'observed_at__gte'), ('until', 'observed_at__lt')):
+            if request.query_params.get(param):
+                value = parse_datetime(request.query_params[param])
+                if value is None:
+                    return Response({'error': f'Некорректная дата {param}'}, status=status.HTTP_400_BAD_REQUEST)
+                observations = observations.filter(**{lookup: value})
+
+        interval = request.query_params.get('interval', 'auto')
+        if interval not in ('raw', 'auto', *HISTORY_INTERVALS):
+            return Response({'error': f'Неизвестный интервал {interval}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            points = min(max(int(request.query_params.get('points', 200)), 1), MAX_HISTORY_POINTS)
+        except ValueError:
+            return Response({'error': 'Некорректное количество точек'}, status=status.HTTP_400_BAD_REQUEST)
+        if interval == 'auto':
+            interval = self._history_interval(observations, points)
+
+        if interval == 'raw':
+            rows = observations.order_by('observed_at').values('observed_at', 'price', 'original_price')
+            return Response({'wb_id': product.wb_id, 'interval': interval, 'points': list(rows[:MAX_HISTORY_POINTS])})
+
+        rows = (
+            observations.annotate(period=Trunc('observed_at', interval))
+            .values('period')
+            .annotate(
+                min_price=models.Min('price'),
+                max_price=models.Max('price'),
+                avg_price=models.Avg('price'),
+                original_price=models.Max('original_price'),
+                observations=models.Count('id'),
+            )
+            .order_by('period')
+        )
+        return Response({'wb_id': product.wb_id, 'interval': interval, 'points': list(rows[:MAX_HISTORY_POINTS])})
+
+    @staticmethod
+    def _history_interval(observations, points):
+        # Самый мелкий интервал, при котором точек будет не больше points
+        bounds = observations.aggregate(
+            count=models.Count('id'), first=models.Min('observed_at'), last=models.Max('observed_at')
+        )
+        if bounds['count'] <= points:
+            return 'raw'
+        span = bounds['last'] - bounds['first']
+        for name, length in HISTORY_INTERVALS.items():
+            if span / length < points:
+                return name
+        return 'month'
+
     @action(detail=False, methods=['get'])
     def categories(self, request):
         """
         Получение списка всех категорий
         """
-        categories = Product.objects.values_list('search_query', flat=True).distinct()
+        categories = SearchTerm.objects.filter(product_count__gt=0).values_list('text', flat=True)
         return Response(list(categories))
 
 
@@ -74,17 +221,44 @@ def products_table_view(request):
 class ParseProductsView(View):
     """
     API endpoint для парсинга товаров
+
+    Парсинг выполняет воркер (manage.py run_parse_worker): view только ставит
+    задачу в очередь и сразу возвращает ее ID. Если такая же задача уже
+    ожидает или выполняется, возвращается она.
     """
     def post(self, request):
         try:
             data = json.loads(request.body)
-            query = data.get('query', '')
+            query = (data.get('query') or '').strip()
             if not query:
                 return JsonResponse({'error': 'Не указан поисковый запрос'}, status=400)
-            # Запускаем management-команду парсера через call_command
-            call_command('parse_wb_by', query, pages=1)
-            return JsonResponse({'success': True})
+            try:
+                pages = int(data.get('pages', 1))
+            except (TypeError, ValueError):
+                return JsonResponse({'error': 'Некорректное количество страниц'}, status=400)
+            if not 1 <= pages <= MAX_PARSE_PAGES:
+                return JsonResponse(
+                    {'error': f'Количество страниц должно быть от 1 до {MAX_PARSE_PAGES}'}, status=400
+                )
+
+            job, created = ParseJob.objects.enqueue(query, pages=pages, category=data.get('category') or '')
+            return JsonResponse(
+                {**job.as_dict(), 'job_id': job.pk, 'created': created,
+                 'status_url': reverse('parse_job', args=[job.pk])},
+                status=202,
+            )
         except json.JSONDecodeError:
             return JsonResponse({'error': 'Неверный формат JSON'}, status=400)
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
+
+
+class ParseJobView(View):
+    """
+    API endpoint состояния задачи парсинга
+    """
+    def get(self, request, pk):
+        job = ParseJob.objects.filter(pk=pk).first()
+        if job is None:
+            return JsonResponse({'error': 'Задача не найдена'}, status=404)
+        return JsonResponse(job.as_dict())
@@ -8,11 +8,20 @@ import django
 import requests
 import json
 
+# С WB_STUB=1 скрипт работает с локальным стендом API вместо search.wb.ru
+if os.getenv('WB_STUB'):
+    from parser.stub_server import WBStubServer
+    stub = WBStubServer().start()
+    os.environ['WB_SEARCH_URL'] = stub.search_url
+    os.environ['WB_CARD_DETAIL_URL'] = stub.card_detail_url
+
 # Настройка Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wildberries_parser.settings')
 django.setup()
 
-from products.wb_by_parser import parse_wb_by, save_products_to_db
+from parser.client import WildberriesClient
+from parser.normalize import normalize_product
+from products.models import Product
 
 def test_parser():
     """
@@ -23,7 +32,11 @@ def test_parser():
     try:
         # Парсим небольшое количество товаров для теста
         query = "ноутбук"
-        products = parse_wb_by(query, max_pages=1)
+        products = [
+            normalize_product(product_data, query)
+            for product_data in WildberriesClient().search(query, page=1)
+        ]
+        products = [product for product in products if product]
         
         if products:
             print(f"✅ Парсер работает! Найдено товаров: {len(products)}")
@@ -34,15 +47,20 @@ def test_parser():
                 print(f"📦 Пример товара:")
                 print(f"   Название: {product['name'][:50]}...")
                 print(f"   Цена: {product['price']} ₽")
-                if product['discount_price']:
-                    print(f"   Скидка: {product['discount_price']} ₽")
+                if product['original_price'] > product['price']:
+                    print(f"   Без скидки: {product['original_price']} ₽")
                 if product['rating']:
                     print(f"   Рейтинг: {product['rating']}")
-                print(f"   Отзывы: {product['reviews_count']}")
+                print(f"   Отзывы: {product['review_count']}")
             
             # Сохраняем в базу данных
-            saved_count = save_products_to_db(products)
-            print(f"💾 Сохранено в БД: {saved_count} товаров")
+            saved_count, updated_count, unchanged_count = Product.objects.bulk_upsert(
+                Product(**product) for product in products
+            )
+            print(
+                f"💾 Сохранено в БД: {saved_count} товаров, обновлено: {updated_count}, "
+                f"без изменений: {unchanged_count}"
+            )
             
         else:
             print("❌ Товары не найдены")
@@ -6,6 +6,13 @@ import os
 import sys
 import django
 
+# С WB_STUB=1 скрипт работает с локальным стендом API вместо search.wb.ru
+if os.getenv('WB_STUB'):
+    from parser.stub_server import WBStubServer
+    stub = WBStubServer().start()
+    os.environ['WB_SEARCH_URL'] = stub.search_url
+    os.environ['WB_CARD_DETAIL_URL'] = stub.card_detail_url
+
 # Настройка Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'wildberries_parser.settings')
 django.setup()
@@ -48,11 +55,11 @@ def test_parser():
                 parsed_products.append(parsed_product)
                 print(f"  ✅ {parsed_product['name'][:50]}...")
                 print(f"     💰 Цена: {parsed_product['price']}₽")
-                if parsed_product['discount_price']:
-                    print(f"     🎯 Скидка: {parsed_product['discount_price']}₽")
+                if parsed_product['original_price'] > parsed_product['price']:
+                    print(f"     🎯 Без скидки: {parsed_product['original_price']}₽")
                 if parsed_product['rating']:
                     print(f"     ⭐ Рейтинг: {parsed_product['rating']}")
-                print(f"     💬 Отзывы: {parsed_product['reviews_count']}")
+                print(f"     💬 Отзывы: {parsed_product['review_count']}")
                 print()
         
         print(f"✅ Обработано товаров: {len(parsed_products)}")
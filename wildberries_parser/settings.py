@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'products',
     'parser', 
@@ -81,6 +82,12 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Полнотекстовому поиску по-русски нужна база в UTF-8,
+        # даже если кластер по умолчанию создает базы в другой кодировке
+        'TEST': {
+            'CHARSET': 'UTF8',
+            'TEMPLATE': 'template0',
+        },
     }
 }
 
@@ -98,6 +105,29 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Адреса API Wildberries; для нагрузочных прогонов без сети их можно
+# направить на локальный стенд (manage.py run_wb_stub)
+WB_SEARCH_URL = os.getenv('WB_SEARCH_URL', 'https://search.wb.ru/exactmatch/ru/common/v4/search')
+WB_CARD_DETAIL_URL = os.getenv('WB_CARD_DETAIL_URL', 'https://card.wb.ru/cards/detail')
+
+# Дисковый кэш ответов API Wildberries (parse_wb_by --cache / --replay)
+WB_CACHE_DIR = os.getenv('WB_CACHE_DIR', BASE_DIR / '.wb_cache')
+WB_CACHE_MAX_BYTES = int(os.getenv('WB_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+# Кэш ответов API товаров (products.caching). По умолчанию - в памяти процесса;
+# при нескольких процессах сервера лучше общий бэкенд, например Redis или Memcached
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 600))
+
+# С какого количества строк (по оценке планировщика PostgreSQL) списки в API
+# и админке показывают оценку вместо точного COUNT(*) (products.pagination)
+ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ESTIMATED_COUNT_THRESHOLD', 100000))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 